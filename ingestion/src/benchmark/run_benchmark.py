@@ -0,0 +1,197 @@
+from concurrent.futures import ProcessPoolExecutor
+from benchmark.stub_servers import StubServer
+from database.postgres import PostgresDB
+from utility.config_loader import read_config
+import multiprocessing
+import datetime as dt
+import subprocess
+import importlib
+import resource
+import logging
+import json
+import time
+
+def _get_git_commit()->str:
+    """
+    Gets the commit being benchmarked
+
+    Returns the short commit hash, or None outside a git checkout
+    """
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _seed_cookie_cache(cache_path:str, url:str)->None:
+    """
+    Writes a fresh cookie to the cookie cache so the extract does not start a browser
+    - `cache_path`: the cookie cache file
+    - `url`: the products URL the cookie is for
+
+    Returns None
+    """
+
+    with open(cache_path, 'w') as cache_file:
+        json.dump({'url': url, 'cookie_name': '_abck', 'cookie': 'benchmark', 'fetched_at': time.time()}, cache_file)
+
+    return None
+
+def _create_retailer_config(retailer:dict, base_url:str, config:dict)->dict:
+    """
+    Creates a retailer config pointing the extract at the stub server and the load at the benchmark schema
+    - `retailer`: the retailer entry of the benchmark config
+    - `base_url`: the base URL of the stub server
+    - `config`: the benchmark config
+
+    Returns the retailer config as a dictionary
+    """
+
+    retailer_config = read_config(retailer['config_path'])
+
+    retailer_config['extract']['schema_name'] = f"benchmark_{retailer['name']}"
+    retailer_config['extract']['cache_mode'] = 'off'
+    # Registered in memory so every run starts from the same state
+    retailer_config['extract']['schema_registry_path'] = None
+    retailer_config['request_planner']['state_path'] = None
+    # The stub answers as fast as it can, pacing the requests would measure the rate limit rather than the pipeline
+    retailer_config['rate_limit']['enabled'] = False
+    retailer_config['load'].update(config['load'])
+
+    if retailer['name'] == 'woolworths':
+        retailer_config['extract']['category_url'] = f'{base_url}/api/ui/v2/bootstrap'
+        retailer_config['extract']['product_url'] = f'{base_url}/apis/ui/browse/category'
+        retailer_config['extract']['cookie_cache_path'] = config['benchmark']['cookie_cache_path']
+        _seed_cookie_cache(cache_path=config['benchmark']['cookie_cache_path'], url=retailer_config['extract']['product_url'])
+
+    elif retailer['name'] == 'coles':
+        retailer_config['extract']['category_url'] = f'{base_url}/api/bff/products/categories?storeId=4824'
+        retailer_config['extract']['product_url'] = f'{base_url}/_next/data/benchmark/en/browse/'
+        retailer_config['extract']['location_search_url2'] = f'{base_url}/api/bff/locations/search?longitude=115.931402&latitude=-31.950061&distance=5000&numberOfLocations=100'
+
+    return retailer_config
+
+def _run_retailer(pipeline_module:str, retailer_config:dict, database_config:dict)->dict:
+    """
+    Runs a retailer's extract and load, in its own process so the peak memory is the retailer's alone
+    - `pipeline_module`: the retailer pipeline module
+    - `retailer_config`: the retailer config
+    - `database_config`: the benchmark database config
+
+    Returns dictionary of wall time, peak memory and run metrics
+    """
+
+    logging.basicConfig(level=logging.WARNING, format="[%(levelname)s][%(asctime)s][%(processName)s]: %(message)s")
+
+    te = PostgresDB(
+        db_user=database_config['user'],
+        db_password=database_config['password'],
+        db_server_name=database_config['server_name'],
+        db_database_name=database_config['database_name'],
+        db_port=database_config['port'],
+        driver=database_config['driver']
+    )
+    target_engine = te.create_pg_engine()
+
+    module = importlib.import_module(pipeline_module)
+
+    start_time = time.perf_counter()
+    list_of_metrics = module.run_extract_load(config=retailer_config, target_engine=target_engine)
+    wall_seconds = time.perf_counter() - start_time
+
+    target_engine.dispose()
+
+    return {
+        'wall_seconds': wall_seconds,
+        # Kilobytes on Linux
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'metrics': list_of_metrics
+    }
+
+def _summarise(name:str, result:dict, stub_request_count:int)->dict:
+    """
+    Summarises a retailer run into throughput figures
+    - `name`: the retailer name
+    - `result`: the result of `_run_retailer`
+    - `stub_request_count`: the requests the stub server answered during the run
+
+    Returns dictionary of benchmark figures
+    """
+
+    extract_metrics = next(metric for metric in result['metrics'] if metric['stage'] == 'extract' and metric['category'] is None)
+    load_metrics = next(metric for metric in result['metrics'] if metric['stage'] == 'load' and metric['category'] is None)
+    # Every request but the categories request is a product page or page count request
+    pages = stub_request_count - 1
+
+    return {
+        'retailer': name,
+        'wall_seconds': round(result['wall_seconds'], 3),
+        'extract_seconds': extract_metrics['duration_seconds'],
+        'load_seconds': load_metrics['duration_seconds'],
+        'pages': pages,
+        'pages_per_second': round(pages / extract_metrics['duration_seconds'], 1),
+        'rows_parsed': extract_metrics['rows_parsed'],
+        'rows_loaded': load_metrics['rows_loaded'],
+        # Rows per second of the load stage itself, the wall time also counts starting the process and the extract
+        'rows_per_second': round(load_metrics['rows_loaded'] / load_metrics['duration_seconds'], 1) if load_metrics['duration_seconds'] > 0 else None,
+        'bytes_downloaded': extract_metrics['bytes_downloaded'],
+        'peak_rss_mb': round(result['peak_rss_mb'], 1)
+    }
+
+def run_benchmark():
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s][%(asctime)s]: %(message)s")
+
+    logging.info("Reading yaml config file")
+    config = read_config("config.yaml")
+
+    stub_server = StubServer(
+        categories=config['stub']['categories'],
+        products_per_category=config['stub']['products_per_category'],
+        latency_seconds=config['stub']['latency_seconds'],
+        error_rate=config['stub']['error_rate'],
+        seed=config['stub']['seed']
+    )
+    base_url = stub_server.start()
+
+    git_commit = _get_git_commit()
+    run_timestamp = dt.datetime.now().isoformat(timespec='seconds')
+    list_of_results = []
+
+    try:
+        for retailer in config['retailers']:
+            retailer_config = _create_retailer_config(retailer=retailer, base_url=base_url, config=config)
+            logging.info(f"Benchmarking [{retailer['name']}]")
+
+            stub_request_count = stub_server.request_count
+            stub_error_count = stub_server.error_count
+            # A fresh process per retailer keeps the peak memory of one retailer from hiding another's
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(_run_retailer, retailer['pipeline_module'], retailer_config, config['database']).result()
+
+            summary = _summarise(name=retailer['name'], result=result, stub_request_count=stub_server.request_count - stub_request_count)
+            summary.update({
+                'stub_errors': stub_server.error_count - stub_error_count,
+                'git_commit': git_commit,
+                'run_timestamp': run_timestamp,
+                'stub': config['stub'],
+                'load': config['load']
+            })
+            list_of_results.append(summary)
+
+            logging.info(f"Result [{retailer['name']}]: {summary['pages_per_second']} pages/sec, {summary['rows_per_second']} rows/sec, {summary['peak_rss_mb']} MB peak RSS, {summary['wall_seconds']} seconds")
+
+    finally:
+        stub_server.stop()
+
+    # One line per retailer run, appended so runs of different commits can be compared
+    with open(config['benchmark']['results_path'], 'a') as results_file:
+        for summary in list_of_results:
+            results_file.write(json.dumps(summary) + '\n')
+
+    logging.info(f"Results written to [{config['benchmark']['results_path']}]")
+
+    return list_of_results
+
+if __name__ == "__main__":
+    run_benchmark()
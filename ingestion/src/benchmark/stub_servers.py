@@ -0,0 +1,265 @@
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import threading
+import logging
+import random
+import re
+import json
+import time
+
+LIST_OF_BRANDS = ['Sunrise', 'Golden Fields', 'Harvest', 'Ocean Blue', 'Mountain Farm', 'Happy Hen', 'Red Rooster Mills', 'Urban Pantry']
+LIST_OF_ITEMS = ['Milk', 'Bread', 'Rolled Oats', 'Peanut Butter', 'Tomato Sauce', 'Free Range Eggs', 'Greek Yoghurt', 'Basmati Rice', 'Olive Oil', 'Coffee Beans', 'Dark Chocolate', 'Orange Juice']
+LIST_OF_VARIANTS = ['Original', 'Light', 'Organic', 'Extra Virgin', 'Wholemeal', 'No Added Sugar', 'Crunchy', 'Family Pack']
+LIST_OF_SIZES = [('g', 250), ('g', 500), ('kg', 1), ('mL', 600), ('L', 1), ('L', 2)]
+
+class StubServer():
+
+    def __init__(self, categories:int=4, products_per_category:int=500, latency_seconds:float=0.0, error_rate:float=0.0, seed:int=0, stores:int=3):
+        """
+        Local HTTP server standing in for the Woolworths and Coles product APIs
+        - `categories`: the number of product categories of each retailer
+        - `products_per_category`: the number of products in each category
+        - `latency_seconds`: the delay added to every response
+        - `error_rate`: the fraction of product page requests after the first page answered with a 503
+        - `seed`: the seed of the generated catalogue and errors
+        - `stores`: the number of Coles stores the location search finds
+        """
+
+        self.categories = categories
+        self.stores = stores
+        self.products_per_category = products_per_category
+        self.latency_seconds = latency_seconds
+        self.error_rate = error_rate
+        self.seed = seed
+        self.request_count = 0
+        self.error_count = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def _get_product(self, index:int)->dict:
+        """
+        Generates a product, the same index gives the same product for both retailers
+        - `index`: the product index in the catalogue
+
+        Returns product attributes as a dictionary
+        """
+
+        product_random = random.Random(self.seed * 1000003 + index)
+        unit, quantity = product_random.choice(LIST_OF_SIZES)
+        price = round(product_random.uniform(1, 25), 2)
+        grams = quantity * (1000 if unit in ('kg', 'L') else 1)
+
+        return {
+            'index': index,
+            'brand': product_random.choice(LIST_OF_BRANDS),
+            'name': f'{product_random.choice(LIST_OF_VARIANTS)} {product_random.choice(LIST_OF_ITEMS)}',
+            'size': f'{quantity}{unit}',
+            'price': price,
+            'was_price': price if product_random.random() < 0.8 else round(price * 1.25, 2),
+            'cup_price': round(price / grams * 100, 2),
+            'cup_measure': '100ML' if unit in ('mL', 'L') else '100G',
+            'barcode': f'93{index:011d}'
+        }
+
+    def _get_category_products(self, category:int, start:int, count:int)->list:
+        first_index = category * self.products_per_category
+        end = min(start + count, self.products_per_category)
+
+        return [self._get_product(first_index + position) for position in range(start, end)]
+
+    def _woolworths_categories(self)->dict:
+        list_of_categories = [
+            {'NodeId': f'1_{category}', 'UrlFriendlyName': f'category-{category}', 'Description': f'Category {category}'}
+            for category in range(self.categories)
+        ]
+
+        return {'ListTopLevelPiesCategories': {'Categories': list_of_categories}}
+
+    def _woolworths_products(self, payload:dict)->dict:
+        category = int(payload['categoryId'].split('_')[1])
+        page_size = payload['pageSize']
+        list_of_products = self._get_category_products(category=category, start=(payload['pageNumber'] - 1) * page_size, count=page_size)
+
+        list_of_bundles = [{
+            'Products': [{
+                'Stockcode': 100000 + product['index'],
+                'Barcode': product['barcode'],
+                'Name': f"{product['brand']} {product['name']} {product['size']}",
+                'DisplayName': f"{product['brand']} {product['name']} | {product['size']}",
+                'Brand': product['brand'].upper() if product['index'] % 3 == 0 else product['brand'].lower(),
+                'Price': product['price'],
+                'WasPrice': product['was_price'],
+                'IsOnSpecial': product['price'] < product['was_price'],
+                'CupPrice': product['cup_price'],
+                'CupMeasure': product['cup_measure'],
+                'CupString': f"${product['cup_price']:.2f} / {product['cup_measure']}",
+                'PackageSize': product['size'],
+                'Unit': 'Each',
+                'IsAvailable': True,
+                'AdditionalAttributes': {'sapcategoryname': payload['formatObject'], 'description': f"{product['name']} from {product['brand']}"}
+            }]
+        } for product in list_of_products]
+
+        return {'TotalRecordCount': self.products_per_category, 'Bundles': list_of_bundles}
+
+    def _coles_categories(self)->dict:
+        list_of_categories = [{'seoToken': f'category-{category}', 'name': f'Category {category}'} for category in range(self.categories)]
+
+        return {'catalogGroupView': list_of_categories}
+
+    def _coles_stores(self)->dict:
+        list_of_stores = [{'id': f'{4824 + store}', 'name': f'Store {store}'} for store in range(self.stores)]
+
+        return {'stores': list_of_stores}
+
+    def _get_store_price(self, product:dict, store:int)->dict:
+        """
+        Varies the price and availability of some products per store, the first store has the catalogue prices
+        - `product`: the generated product
+        - `store`: the store position
+
+        Returns the product with the store's price and availability
+        """
+
+        if store > 0 and (product['index'] + store) % 10 == 0:
+            return {**product, 'price': round(product['price'] * 0.9, 2), 'available': product['index'] % 20 != 0}
+
+        return {**product, 'available': True}
+
+    def _coles_products(self, seo_token:str, page:int, store:int=0)->dict:
+        category = int(seo_token.split('-')[1])
+        list_of_products = [self._get_store_price(product, store=store) for product in self._get_category_products(category=category, start=(page - 1) * 48, count=48)]
+
+        list_of_results = [{
+            '_type': 'PRODUCT',
+            'id': 2000000 + product['index'],
+            'name': product['name'],
+            'brand': product['brand'],
+            'description': f"{product['brand'].upper()} {product['name'].upper()} {product['size'].upper()}",
+            'size': product['size'],
+            'availability': product['available'],
+            'pricing': {
+                'now': product['price'],
+                'was': product['was_price'],
+                'comparable': f"${product['cup_price']:.2f} per {product['cup_measure'].lower()}",
+                'unit': {'price': product['cup_price'], 'ofMeasureQuantity': 100, 'ofMeasureUnits': product['cup_measure'][3:].lower()}
+            },
+            'merchandiseHeir': {'category': f'Category {category}'},
+            'imageUris': [{'uri': f"/{product['index']}.jpg"}]
+        } for product in list_of_products]
+
+        # The first page has an advertising tile the extract filters out
+        if page == 1:
+            list_of_results.insert(0, {'_type': 'SINGLE_TILE', 'adId': f'ad-{category}'})
+
+        return {'pageProps': {'searchResults': {'noOfResults': self.products_per_category, 'results': list_of_results}}}
+
+    def _is_error(self, page:int)->bool:
+        if page <= 1 or self.error_rate <= 0:
+            return False
+
+        with self._lock:
+            is_error = self._random.random() < self.error_rate
+            if is_error:
+                self.error_count += 1
+
+        return is_error
+
+    def handle(self, method:str, path:str, body:bytes, headers:dict=None)->tuple:
+        """
+        Answers a request to one of the stubbed endpoints
+        - `method`: the HTTP method
+        - `path`: the request path with the query string
+        - `body`: the request body
+        - `headers`: the request headers, the Coles store is selected by the `fulfillmentStoreId` cookie
+
+        Returns tuple of status code and response body
+        """
+
+        with self._lock:
+            self.request_count += 1
+
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        parsed_url = urlparse(path)
+
+        if method == 'GET' and parsed_url.path == '/api/ui/v2/bootstrap':
+            return 200, self._woolworths_categories()
+
+        if method == 'POST' and parsed_url.path == '/apis/ui/browse/category':
+            payload = json.loads(body)
+            if self._is_error(payload['pageNumber']):
+                return 503, {}
+            return 200, self._woolworths_products(payload)
+
+        if method == 'GET' and parsed_url.path == '/api/bff/products/categories':
+            return 200, self._coles_categories()
+
+        if method == 'GET' and parsed_url.path == '/api/bff/locations/search':
+            return 200, self._coles_stores()
+
+        if method == 'GET' and parsed_url.path.startswith('/_next/data/') and parsed_url.path.endswith('.json'):
+            seo_token = parsed_url.path.rsplit('/', 1)[1][:-len('.json')]
+            page = int(parse_qs(parsed_url.query).get('page', ['1'])[0])
+            store_cookie = re.search(r'fulfillmentStoreId=(\d+)', (headers or {}).get('cookie', ''))
+            store = int(store_cookie.group(1)) - 4824 if store_cookie else 0
+            if self._is_error(page):
+                return 503, {}
+            return 200, self._coles_products(seo_token=seo_token, page=page, store=store)
+
+        return 404, {}
+
+    def start(self)->str:
+        """
+        Starts the server on a free local port in a background thread
+
+        Returns the base URL of the server
+        """
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, as the retailer APIs
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately, without this delayed ACKs add 40ms to every response
+            disable_nagle_algorithm = True
+
+            def _respond(self):
+                body = self.rfile.read(int(self.headers.get('content-length', 0)))
+                status_code, response = stub.handle(method=self.command, path=self.path, body=body, headers={key.lower(): value for key, value in self.headers.items()})
+                response_body = json.dumps(response).encode('utf-8')
+
+                self.send_response(status_code)
+                self.send_header('content-type', 'application/json')
+                self.send_header('content-length', str(len(response_body)))
+                self.end_headers()
+                self.wfile.write(response_body)
+
+            def do_GET(self):
+                self._respond()
+
+            def do_POST(self):
+                self._respond()
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        base_url = f'http://127.0.0.1:{self._server.server_port}'
+        logging.info(f'Stub server listening on [{base_url}]')
+
+        return base_url
+
+    def stop(self)->None:
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+        return None
@@ -1,16 +1,79 @@
+from utility.async_fetch import AsyncFetcher
+from utility.checkpoint import Checkpoint
+from utility.http_session import HttpSession, request_tag
+from utility.json_decoder import ProjectedDecoder
+from utility.page_accumulator import PageAccumulator
+from utility.page_parser import PageParser
+from utility.request_planner import RequestPlanner
+from utility.schema_registry import SchemaRegistry
 import pandas as pd
 import numpy as np
+import json
 import math
-import requests
+import time
 import logging
 
 class Extract():
 
-    def __init__(self, category_url:str, product_url:str, subscription_key:str): 
+    def __init__(self, category_url:str, product_url:str, subscription_key:str, session:HttpSession=None, decoder:ProjectedDecoder=None, schema_registry_path:str=None, checkpoint:Checkpoint=None, store_mode:str='single', location_search_url:str=None, store_ids:list=None, max_stores:int=5, max_concurrent_stores:int=4, primary_key:str='id', primary_store_id:str=None, page_size:int=48, request_planner:RequestPlanner=None, parse_workers:int=None): 
         self.category_url = category_url  
         self.product_url = product_url
         self.subscription_key = subscription_key      
+        # In multi mode each category is extracted for several stores at once, from `store_ids` or the stores found by the location search
+        self.store_mode = store_mode
+        self.location_search_url = location_search_url
+        self.store_ids = store_ids or []
+        self.max_stores = max_stores
+        self.max_concurrent_stores = max_concurrent_stores
+        self.primary_key = primary_key
+        # The catalogue takes each product from this store when it lists it, the first of the stores when None
+        self.primary_store_id = primary_store_id
+        self.session = session if session is not None else HttpSession()
+        # Decodes only the declared fields when set, otherwise every field is flattened with json_normalize
+        self.decoder = decoder
+        # Pages are parsed on worker processes while the next pages are fetched, one per core besides the fetching core when `parse_workers` is None
+        # and on the fetching thread when it is 0
+        # The record filter removes items that are not products
+        self.page_parser = PageParser(max_workers=parse_workers, decoder=decoder, record_path=['pageProps', 'searchResults', 'results'], record_filter={'_type': 'PRODUCT'})
+        # Source field names are kept as column names
+        self.schema_registry = SchemaRegistry(registry_path=schema_registry_path)
+        # Pages already extracted by a failed run are read back instead of fetched when set
+        self.checkpoint = checkpoint
+        # The page size of the browse pages, which is set by the site rather than the request
+        self.page_size = page_size
+        # Categories whose first page is unchanged since the previous run are skipped when set
+        self.request_planner = request_planner
+        self.metrics = []
+        # The categories of the last run paged in full without failed pages in every store, only their missing products are delisted
+        self.list_of_complete_categories = []
         
+    def _record_metrics(self, category:str, start_time:float, rows_parsed:int=None)->None:
+        """
+        Records the duration, request, byte, row and retry counts of a category
+        - `category`: the category, None for the whole run
+        - `start_time`: `time.perf_counter()` when the category or run started
+        - `rows_parsed`: the rows parsed for the category, summed over the categories for the whole run
+
+        Returns None
+        """
+
+        if category is None:
+            rows_parsed = sum(metric['rows_parsed'] for metric in self.metrics)
+
+        stats = self.session.get_stats(tag=category)
+
+        self.metrics.append({
+            'stage': 'extract',
+            'category': category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'request_count': stats['request_count'],
+            'bytes_downloaded': stats['bytes_received'],
+            'rows_parsed': rows_parsed,
+            'retry_count': stats['retry_count']
+        })
+
+        return None
+
     def _get_categories(self, url:str, headers:dict)->pd.DataFrame:
         """
         Get list of product categories      
@@ -22,7 +85,7 @@ class Extract():
         
         category_df = pd.DataFrame()
 
-        response = requests.request("GET", url=url, headers=headers)
+        response = self.session.request("GET", url=url, headers=headers)
         
         if response.status_code == 200:            
             json_response = response.json()
@@ -33,6 +96,27 @@ class Extract():
         
         return category_df
     
+    def _get_stores(self, url:str, headers:dict)->list:
+        """
+        Get list of stores near the location of the location search
+        - `url`: the location search API URL
+        - `headers`: the request headers
+
+        Returns list of store IDs, nearest first
+        """
+
+        list_of_store_ids = []
+
+        response = self.session.request("GET", url=url, headers=headers)
+
+        if response.status_code == 200:
+            list_of_store_ids = [str(store['id']) for store in response.json()['stores']]
+
+        else:
+            logging.error(response)
+
+        return list_of_store_ids
+
     def _create_headers(self, headers_for:str, subscription_key:str=None)->dict:
         """
         Creates headers with the cookie added        
@@ -76,104 +160,269 @@ class Extract():
 
         return headers
      
-    def _get_products(self, url:str, headers:dict)->pd.DataFrame:
+    def _get_page_content(self, url:str, headers:dict, store_id:str=None)->bytes:
         """
-        Get list of products from API request
-        - `category`: the category        
+        Get a page of products from API request, left unparsed so the fetching thread moves on to the next request
         - `url`: the API URL
         - `headers`: the request headers
+        - `store_id`: the store the headers select, cached separately per store
 
-        Returns a dataframe of products
+        Returns the response body, None when the request failed
         """
 
-        products_df = pd.DataFrame()
-
-        response = requests.request("GET", url=url, headers=headers)
+        response = self.session.request("GET", url=url, headers=headers, cache_vary=store_id)
 
         if response.status_code == 200:            
-            json_response = response.json()
-            product_df = pd.json_normalize(json_response['pageProps']['searchResults'], 'results')
-            # Remove items that are not products
-            # product_df = product_df[product_df['_type'] != 'SINGLE_TILE']
-            product_df = product_df[product_df['_type'] == 'PRODUCT']
+            return response.content
         
-        else: 
-            logging.error(response)
+        logging.error(response)
 
-        return products_df
+        return None
     
-    def _get_page_count(self, url:str, headers:dict)->int:
+    def _get_first_page(self, url:str, headers:dict, store_id:str=None)->tuple:
         """
-        Gets the number of pages for a product category        
-        - `url`: the API URL
+        Gets the first page of a product category, which also gives the number of products in the category
+        - `url`: the API URL of the first page
         - `headers`: the request headers
+        - `store_id`: the store the headers select, cached separately per store
 
-        Returns the count of of pages as integer
+        Returns tuple of the count of products, the dataframe of products and the page fingerprint, 0, an empty dataframe and None when the request failed
         """  
 
-        pages_in_category = 0
+        content = self._get_page_content(url=url, headers=headers, store_id=store_id)
+        # The page count is needed before the other pages are requested
+        products_df, products_in_category = self.page_parser.submit(content, count_path=['pageProps', 'searchResults', 'noOfResults']).result()
+        fingerprint = self.request_planner.get_fingerprint(content) if self.request_planner is not None and content is not None else None
+        
+        return products_in_category, products_df, fingerprint
+    
+    def _extract_store_category(self, seo_token:str, category_name:str, category_count:int, product_headers:dict, store_id:str=None)->tuple:
+        """
+        Extracts all pages of a category of a store
+        - `seo_token`: the category token in the product URL
+        - `category_name`: the category name
+        - `category_count`: the position of the category in the run
+        - `product_headers`: the product request headers
+        - `store_id`: the store to extract, None for the store of the session
 
-        response = requests.request("GET", url=url, headers=headers)
+        Returns tuple of the dataframe of products for the category and whether every page was extracted
+        """
 
-        if(response.status_code == 200):            
-            json_response = response.json()['pageProps']['searchResults']  
-            products_in_category = json_response['noOfResults'] 
-            pages_in_category = math.ceil(products_in_category / 48)   
+        # The store is selected by cookie, the checkpoint of each store is kept apart
+        checkpoint_name = category_name
+        if store_id is not None:
+            product_headers = {**product_headers, 'cookie': f'fulfillmentStoreId={store_id}'}
+            checkpoint_name = f'{category_name}_{store_id}'
 
-        else: 
-            logging.error(response)
-        
-        return pages_in_category
-    
-    def run(self)->list:
+        # Get pages in category, the first page request also gives the page count
+        pages_in_category = self.checkpoint.get_page_count(category=checkpoint_name) if self.checkpoint is not None else None
+        page_accumulator = PageAccumulator(name=checkpoint_name)
+        first_page = 1
+        is_complete = True
+        if pages_in_category is None:
+            product_url = f"{self.product_url}{seo_token}.json?page=1&slug={seo_token}"
+            products_in_category, first_page_df, fingerprint = self._get_first_page(url=product_url, headers=product_headers, store_id=store_id)
+            pages_in_category = math.ceil(products_in_category / self.page_size)
+
+            # A store skipped in multi store mode would drop out of the catalogue of the category
+            if self.request_planner is not None and store_id is None and self.request_planner.is_unchanged(category=checkpoint_name, record_count=products_in_category, fingerprint=fingerprint, page_count=pages_in_category):
+                logging.info(f'Skipping unchanged category [{category_count}:{category_name}]')
+                return pd.DataFrame(), False
+
+            if self.checkpoint is not None and pages_in_category > 0:
+                self.checkpoint.save_page_count(category=checkpoint_name, page_count=pages_in_category)
+            if self.checkpoint is not None and not first_page_df.empty:
+                self.checkpoint.save_page(category=checkpoint_name, page=1, page_df=first_page_df)
+
+            if pages_in_category > 0:
+                page_accumulator.add(first_page_df)
+                first_page = 2
+                is_complete = not first_page_df.empty
+            else:
+                # The first page failed or the category has no products
+                is_complete = False
+
+        list_of_pages = []
+        for page in range(first_page, pages_in_category + 1):
+            logging.info(f'Extracting page [{page} / {pages_in_category}] of category [{category_count}:{category_name}] store [{store_id}]')
+            
+            # Alter URL with page number               
+            product_url = f"{self.product_url}{seo_token}.json?page={page}&slug={seo_token}"    
+
+            # Pages extracted by a failed run are read back, others are parsed on the page parser while the next page is fetched
+            page_df = self.checkpoint.get_page(category=checkpoint_name, page=page) if self.checkpoint is not None else None
+            future = self.page_parser.submit(self._get_page_content(url=product_url, headers=product_headers, store_id=store_id)) if page_df is None else None
+            list_of_pages.append((page, page_df, future))
+
+        # Pages are added in page order
+        for page, page_df, future in list_of_pages:
+            if future is not None:
+                page_df, _ = future.result()
+
+                # Failed requests give an empty page, which is fetched again when the run is resumed
+                if self.checkpoint is not None and not page_df.empty:
+                    self.checkpoint.save_page(category=checkpoint_name, page=page, page_df=page_df)
+
+            page_accumulator.add(page_df)
+            is_complete = is_complete and not page_df.empty
+
+        # Only a category paged in full without failed pages can be skipped by the next run
+        if self.request_planner is not None and store_id is None and first_page == 2 and is_complete:
+            self.request_planner.update(category=checkpoint_name, record_count=products_in_category, fingerprint=fingerprint)
+
+        return page_accumulator.to_frame(), is_complete
+
+    def _hash_rows(self, df:pd.DataFrame)->pd.Series:
         """
-        Run extract
+        Hashes the content of each row, with nested lists/dicts hashed as their JSON as they cannot be hashed themselves
+        - `df`: pandas dataframe
+
+        Returns series of row hashes
+        """
+
+        df = df.copy(deep=False)
+
+        for column in df.columns[df.dtypes == object]:
+            is_nested = df[column].map(lambda value: isinstance(value, (list, dict)))
+            if is_nested.any():
+                df[column] = df[column].mask(is_nested, df[column][is_nested].map(json.dumps))
+
+        return pd.util.hash_pandas_object(df, index=False)
+
+    def _deduplicate_stores(self, product_df:pd.DataFrame, primary_store_id:str)->tuple:
+        """
+        Keeps each product of the stores once, from the primary store when it lists the product and otherwise from the first store listing it,
+        with the whole product of each store where any of its columns differ
+        - `product_df`: the products of all stores, with the store ID as the first index level
+        - `primary_store_id`: the store the catalogue is taken from
+
+        Returns tuple of the catalogue dataframe and the store overrides dataframe
+        """
+
+        product_df = product_df.reset_index(level=0, names='store_id').reset_index(drop=True)
+        product_columns = [column for column in product_df.columns if column != 'store_id']
+
+        # Stores are in discovery order, nearest first, with the primary store moved to the front
+        store_order = (product_df['store_id'] != primary_store_id).to_numpy().argsort(kind='stable')
+        product_df = product_df.iloc[store_order].reset_index(drop=True)
+
+        row_hash = self._hash_rows(product_df[product_columns])
+        is_catalogue = ~product_df.duplicated(subset=[self.primary_key], keep='first')
+        catalogue_df = product_df[is_catalogue].reset_index(drop=True)
+
+        # Every row is compared with the catalogue row of its product, rows of the same content as the catalogue are not kept
+        catalogue_hash = pd.Series(row_hash[is_catalogue].to_numpy(), index=product_df.loc[is_catalogue, self.primary_key])
+        is_different = product_df[self.primary_key].map(catalogue_hash) != row_hash
+
+        override_df = product_df[is_different].reset_index(drop=True)
+
+        logging.info(f'Deduplicated [{len(product_df)}] store products to [{len(catalogue_df)}] products from store [{primary_store_id}] and [{len(override_df)}] store overrides')
+
+        return catalogue_df, override_df
+
+    def run_stream(self):
         """
+        Run extract, yielding each category dataframe as soon as it is extracted.
+        In multi store mode the store overrides of a category follow its catalogue, with `attrs['kind']` set to `store_overrides`
+
+        Returns a generator of product dataframes
+        """
+
+        self.metrics = []
+        self.list_of_complete_categories = []
+        run_start_time = time.perf_counter()
 
         category_headers = self._create_headers(headers_for='category', subscription_key=self.subscription_key)
         category_df = self._get_categories(url=self.category_url, headers=category_headers)
 
         # Prepare variables
         category_count = 0        
-        list_of_product_df = []
-        
-        for index, row in category_df.iterrows():
+        product_headers = self._create_headers(headers_for='product')
 
-            product_df = pd.DataFrame()
+        list_of_store_ids = []
+        primary_store_id = None
+        if self.store_mode == 'multi':
+            list_of_store_ids = [str(store_id) for store_id in self.store_ids] or self._get_stores(url=self.location_search_url, headers=category_headers)[:self.max_stores]
+            # The catalogue is taken from the same store every run, rather than whichever store happens to come first
+            primary_store_id = str(self.primary_store_id) if self.primary_store_id is not None else (list_of_store_ids[0] if list_of_store_ids else None)
+            if primary_store_id is not None and primary_store_id not in list_of_store_ids:
+                list_of_store_ids = [primary_store_id] + list_of_store_ids
+            logging.info(f'Extracting stores {list_of_store_ids}, catalogue from store [{primary_store_id}]')
+            # Stores of a category are extracted at the same time, the pages of each store one after the other
+            fetcher = AsyncFetcher(max_concurrent_requests=self.max_concurrent_stores, max_concurrent_requests_per_category=self.max_concurrent_stores)
+        
+        try:
+            for index, row in category_df.iterrows():
 
-            if not (row['seoToken'] == 'dropped-locked' or row['seoToken'] == 'back-to-school'):
+                if not (row['seoToken'] == 'dropped-locked' or row['seoToken'] == 'back-to-school'):
                 
-                product_url = f"{self.product_url}{row['seoToken']}.json?slug={row['seoToken']}" 
-                category_count += 1
-                category_name = row['seoToken'].replace('-',' ').title().replace(' ','')
+                    category_count += 1
+                    category_name = row['seoToken'].replace('-',' ').title().replace(' ','')
+                    start_time = time.perf_counter()
 
-                logging.info(f'Extracting products for category [{category_count}:{category_name}]')
+                    # Count this category's requests separately
+                    tag_token = request_tag.set(category_name)
 
-                # Get pages in category
-                product_headers = self._create_headers(headers_for='product')
-                pages_in_category = self._get_page_count(url=product_url, headers=product_headers)                   
+                    logging.info(f'Extracting products for category [{category_count}:{category_name}]')
 
-                for page in range(1, pages_in_category + 1):
-                    logging.info(f'Extracting page [{page} / {pages_in_category}] of category [{category_count}:{category_name}]')
-                    
-                    # Alter URL with page number               
-                    product_url = f"{self.product_url}{row['seoToken']}.json?page={page}&slug={row['seoToken']}"    
-                    product_headers = self._create_headers(headers_for='product')
+                    override_df = pd.DataFrame()
+
+                    if self.store_mode == 'multi':
+                        list_of_kwargs = [
+                            {'seo_token': row['seoToken'], 'category_name': category_name, 'category_count': category_count, 'product_headers': product_headers, 'store_id': store_id}
+                            for store_id in list_of_store_ids
+                        ]
+                        list_of_store_results = fetcher.run(fetcher.fetch_pages, self._extract_store_category, category=category_name, list_of_kwargs=list_of_kwargs)
+
+                        # Each store's products are keyed by the store ID
+                        dict_of_store_df = {store_id: store_df for store_id, (store_df, _) in zip(list_of_store_ids, list_of_store_results) if not store_df.empty}
+                        product_df = pd.concat(dict_of_store_df) if dict_of_store_df else pd.DataFrame()
+                        is_complete = bool(list_of_store_results) and all(is_store_complete for _, is_store_complete in list_of_store_results)
+
+                    else:
+                        product_df, is_complete = self._extract_store_category(seo_token=row['seoToken'], category_name=category_name, category_count=category_count, product_headers=product_headers)
+
+                    if is_complete:
+                        self.list_of_complete_categories.append(category_name)
 
-                    page_df = self._get_products(url=product_url, headers=product_headers)                      
-                    product_df = pd.concat((product_df, page_df), axis = 0) 
+                    self._record_metrics(category=category_name, start_time=start_time, rows_parsed=len(product_df))
+                    request_tag.reset(tag_token)
 
-                # Add product df to list of dataframes
-                if not product_df.empty:
-                    # Replace nan
-                    product_df = product_df.replace({np.nan: None})                    
+                    # Yield product df to the consumer
+                    if not product_df.empty:
+                        # Conform to the registered column names and types, shared by all categories
+                        product_df = self.schema_registry.conform(product_df)
+
+                        if self.store_mode == 'multi':
+                            product_df, override_df = self._deduplicate_stores(product_df, primary_store_id=primary_store_id)
+
+                        # Replace nan, projected columns are already typed
+                        if self.decoder is None:
+                            product_df = product_df.replace({np.nan: None})                    
+                            override_df = override_df.replace({np.nan: None})
                     
-                    # Name the df
-                    product_df.attrs['name'] = category_name
+                        # Name the df
+                        product_df.attrs['name'] = category_name
                                      
-                    list_of_product_df.append(product_df)
+                        yield product_df
+
+                        if not override_df.empty:
+                            override_df.attrs['name'] = category_name
+                            override_df.attrs['kind'] = 'store_overrides'
+
+                            yield override_df
+
+                    else:
+                        logging.info(f'{category_name} df is empty')
+        finally:
+            self.page_parser.close()
 
-                else:
-                    logging.info(f'{category_name} df is empty')
+        logging.info(f'HTTP session stats {self.session.get_stats()}')
+        self._record_metrics(category=None, start_time=run_start_time)
+
+    def run(self)->list:
+        """
+        Run extract
+        """
 
-        return list_of_product_df
\ No newline at end of file
+        return list(self.run_stream())
\ No newline at end of file
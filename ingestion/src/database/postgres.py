@@ -1,29 +1,101 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import URL
 
 class PostgresDB():
 
-    def __init__(self, db_user, db_password, db_server_name, db_database_name):
+    def __init__(self, db_user, db_password, db_server_name, db_database_name, db_port:int=5432, driver:str='pg8000', pool_size:int=5, max_overflow:int=10, pool_pre_ping:bool=True, pool_recycle:int=-1, statement_timeout_ms:int=None):
         self.db_user = db_user
         self.db_password = db_password
         self.db_server_name = db_server_name
         self.db_database_name = db_database_name        
+        self.db_port = db_port
+        self.driver = driver
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_pre_ping = pool_pre_ping
+        self.pool_recycle = pool_recycle
+        self.statement_timeout_ms = statement_timeout_ms
+
+    def _get_driver_options(self)->dict:
+        """
+        Gets the engine options specific to the driver
+
+        Returns options as dictionary
+        """
+
+        if self.driver in ('psycopg2', 'psycopg'):
+            # SQLAlchemy sends an executemany INSERT as multi-row INSERT statements, this sets the rows per statement.
+            # e.g. the metrics and the to_sql inserts of the overwrite load
+            return {'insertmanyvalues_page_size': 1000}
+
+        return {}
+
+    def _set_statement_timeout(self, dbapi_connection, connection_record)->None:
+        """
+        Sets the statement timeout on each new connection of the pool
+        - `dbapi_connection`: DBAPI connection
+        - `connection_record`: the pool's record of the connection
+
+        Returns None
+        """
+
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"SET statement_timeout = {int(self.statement_timeout_ms)}")
+        cursor.close()
+        # Commit so the setting is kept when the pool resets the connection
+        dbapi_connection.commit()
+
+        return None
 
     def create_pg_engine(self):
         """
         Create an engine to either `source` or `target`
         """
-        # drivername = "postgresql+pg8000", 
         # create connection to database self.
         connection_url = URL.create(
-            drivername = "postgresql+pg8000", 
+            drivername = f"postgresql+{self.driver}", 
             username = self.db_user,
             password = self.db_password,
             host = self.db_server_name, 
-            port = 5432,
+            port = self.db_port,
             database = self.db_database_name, 
         )
 
-        engine = create_engine(connection_url, echo=False)
+        engine = create_engine(
+            connection_url,
+            echo=False,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_pre_ping=self.pool_pre_ping,
+            pool_recycle=self.pool_recycle,
+            **self._get_driver_options()
+        )
+
+        if self.statement_timeout_ms:
+            event.listen(engine, 'connect', self._set_statement_timeout)
         
-        return engine 
\ No newline at end of file
+        return engine 
+
+def copy_from_buffer(cursor, statement:str, buffer)->None:
+    """
+    Runs a `COPY ... FROM STDIN` statement with the rows read from a file-like buffer, for whichever driver the cursor belongs to
+    - `cursor`: DBAPI cursor
+    - `statement`: the COPY statement
+    - `buffer`: file-like object with the encoded rows
+
+    Returns None
+    """
+
+    if hasattr(cursor, 'copy_expert'):
+        # psycopg2
+        cursor.copy_expert(statement, buffer)
+    elif hasattr(cursor, 'copy'):
+        # psycopg 3
+        with cursor.copy(statement) as copy:
+            while data := buffer.read(65536):
+                copy.write(data)
+    else:
+        # pg8000
+        cursor.execute(statement, stream=buffer)
+
+    return None
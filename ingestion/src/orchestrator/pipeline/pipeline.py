@@ -0,0 +1,174 @@
+from graphlib import TopologicalSorter
+from io import StringIO
+from database.postgres import PostgresDB
+from utility.config_loader import read_config
+from utility.dag_executor import DagExecutor
+from utility.metadata_logging import MetadataLogging
+from utility.product_matching import ProductMatching
+import datetime as dt
+import importlib
+import logging
+
+class RetailerPipeline():
+
+    def __init__(self, name:str, pipeline_module:str, config:dict, engine, run_id:int=None):
+        self.name = name
+        self.pipeline_module = pipeline_module
+        self.config = config
+        self.engine = engine
+        self.run_id = run_id
+        self.metrics = []
+
+    def __repr__(self)->str:
+        return f'RetailerPipeline({self.name})'
+
+    def run(self):
+        """
+        Run the retailer's extract and load
+        """
+
+        module = importlib.import_module(self.pipeline_module)
+        self.metrics = module.run_extract_load(config=self.config, target_engine=self.engine, run_id=self.run_id)
+
+def run_pipeline():
+
+    # set up logging 
+    run_log = StringIO()
+    logging.basicConfig(stream=run_log,level=logging.INFO, format="[%(levelname)s][%(asctime)s][%(threadName)s]: %(message)s")
+
+    logging.info("Reading yaml config file")
+    # get config variables
+    config = read_config("../config.yaml")
+
+    logging.info("Getting yaml config variables")
+    metadata_log_table = config["meta"]["log_table"]
+    metadata_metrics_table = config["meta"]["metrics_table"]
+    schema_name = config["meta"]["schema_name"]
+    resume_max_age_hours = config["meta"]["resume_max_age_hours"]
+    resume_max_count = config["meta"]["resume_max_count"]
+
+    # Each retailer is run with its own config, the combined config is logged with the run
+    run_config = {}
+    for retailer in config["retailers"]:
+        run_config[retailer["name"]] = read_config(retailer["config_path"])
+
+    # logging.info("Getting env variables")       
+    # target_db_user = os.environ.get("target_db_user")
+    # target_db_password = os.environ.get("target_db_password")
+    # target_db_server_name = os.environ.get("target_db_server_name")
+    # target_db_database_name = os.environ.get("target_db_database_name")
+    target_db_user = 'postgres'
+    target_db_password = 'postgres'
+    target_db_server_name = 'localhost'
+    target_db_database_name = 'smartshopper'   
+
+    logging.info("Creating target database engine")
+    # set up target db engine, its connection pool is shared by all retailers
+    te = PostgresDB(
+        db_user=target_db_user, 
+        db_password=target_db_password, 
+        db_server_name=target_db_server_name, 
+        db_database_name=target_db_database_name,
+        db_port=config['database']['port'],
+        driver=config['database']['driver'],
+        pool_size=config['database']['pool_size'],
+        max_overflow=config['database']['max_overflow'],
+        pool_pre_ping=config['database']['pool_pre_ping'],
+        pool_recycle=config['database']['pool_recycle'],
+        statement_timeout_ms=config['database']['statement_timeout_ms']
+    )
+    target_engine = te.create_pg_engine()
+
+    logging.info("Setting up metadata logger")
+    # set up metadata logger 
+    metadata_logger = MetadataLogging(engine=target_engine)    
+    # A failed run is run again under its run id, so the retailers only fetch the pages it did not extract
+    metadata_log_run_id = metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name=metadata_log_table, max_age_hours=resume_max_age_hours, max_resumes=resume_max_count)
+    if metadata_log_run_id is None:
+        metadata_log_run_id = metadata_logger.get_latest_run_id(schema_name=schema_name, table_name=metadata_log_table)
+    else:
+        logging.info(f"Resuming run [{metadata_log_run_id}]")
+
+    try:
+
+        metadata_logger.log(
+            run_timestamp=dt.datetime.now(),
+            run_status="Started",
+            run_id=metadata_log_run_id, 
+            run_config=run_config,
+            schema_name=schema_name,
+            table_name=metadata_log_table
+        )              
+
+        # Build dag, retailers are independent so they all run at the same time
+        dag = TopologicalSorter()
+
+        logging.info("Adding DAG nodes")
+        retailer_nodes = {}
+        for retailer in config["retailers"]:
+            retailer_nodes[retailer["name"]] = RetailerPipeline(name=retailer["name"], pipeline_module=retailer["pipeline_module"], config=run_config[retailer["name"]], engine=target_engine, run_id=metadata_log_run_id)
+            dag.add(retailer_nodes[retailer["name"]])
+
+        # Products are matched once both retailers are loaded
+        if config["matching"]["enabled"]:
+            list_of_matched_retailers = []
+            for retailer_name in [config["matching"]["left"], config["matching"]["right"]]:
+                retailer_config = run_config[retailer_name]
+                list_of_matched_retailers.append({
+                    'name': retailer_name,
+                    'schema_name': retailer_config['extract']['schema_name'],
+                    'load_method': retailer_config['load']['load_method'],
+                    'partition_table_name': retailer_config['load']['partition_table_name'],
+                    'columns': config["matching"]["columns"][retailer_name]
+                })
+
+            matching_node = ProductMatching(
+                engine=target_engine,
+                left=list_of_matched_retailers[0],
+                right=list_of_matched_retailers[1],
+                schema_name=schema_name,
+                table_name=config["matching"]["table_name"],
+                min_score=config["matching"]["min_score"]
+            )
+            dag.add(matching_node, retailer_nodes[config["matching"]["left"]], retailer_nodes[config["matching"]["right"]])
+
+        logging.info("Executing DAG")
+        dag_executor = DagExecutor(max_workers=len(config["retailers"]))
+        node_timings = dag_executor.run(dag)
+
+        for node, seconds in node_timings.items():
+            logging.info(f"Node [{node!r}] run time [{seconds:.2f}] seconds")
+
+            metadata_logger.record_metric(run_id=metadata_log_run_id, retailer=node.name, stage='pipeline', schema_name=schema_name, table_name=metadata_metrics_table, duration_seconds=round(seconds, 3))
+            for metric in node.metrics:
+                metadata_logger.record_metric(run_id=metadata_log_run_id, retailer=node.name, schema_name=schema_name, table_name=metadata_metrics_table, **metric)
+
+        metadata_logger.flush_metrics()
+
+        logging.info("Pipeline run successful")
+        metadata_logger.log(
+            run_timestamp=dt.datetime.now(),
+            run_status="Completed",
+            run_id=metadata_log_run_id, 
+            run_config=run_config,
+            run_log=run_log.getvalue(),
+            schema_name=schema_name,
+            table_name=metadata_log_table
+        )
+
+    except Exception as e: 
+        logging.exception(e)
+        metadata_logger.log(
+            run_timestamp=dt.datetime.now(),
+            run_status="Error",
+            run_id=metadata_log_run_id, 
+            run_config=run_config,
+            run_log=run_log.getvalue(),
+            schema_name=schema_name,
+            table_name=metadata_log_table
+        )
+
+    print(run_log.getvalue())
+
+if __name__ == "__main__":
+    run_pipeline()
@@ -0,0 +1,38 @@
+import sqlalchemy as sa
+import pytest
+import uuid
+import os
+
+@pytest.fixture(scope='session')
+def engine():
+    """
+    Engine to the test database in `TEST_DATABASE_URL`, the tests using it are skipped when it is not set or cannot be reached
+    """
+
+    database_url = os.environ.get('TEST_DATABASE_URL')
+    if not database_url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+
+    engine = sa.create_engine(database_url)
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql('SELECT 1')
+    except sa.exc.DBAPIError as e:
+        pytest.skip(f'Test database cannot be reached: {e}')
+
+    yield engine
+
+    engine.dispose()
+
+@pytest.fixture
+def schema_name(engine):
+    """
+    A schema of its own for the test, dropped afterwards
+    """
+
+    schema_name = f'test_{uuid.uuid4().hex[:12]}'
+
+    yield schema_name
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE')
@@ -0,0 +1,48 @@
+from utility.async_fetch import AsyncFetcher
+import threading
+import asyncio
+import time
+
+def test_busy_category_does_not_hold_global_slots():
+    fetcher = AsyncFetcher(max_concurrent_requests=2, max_concurrent_requests_per_category=1)
+    lock = threading.Lock()
+    list_of_started = []
+
+    def request(name:str, page:int)->None:
+        with lock:
+            list_of_started.append(name)
+        time.sleep(0.05)
+
+    async def fetch_all():
+        return await asyncio.gather(
+            fetcher.fetch_pages(request, 'busy', [{'name': 'busy', 'page': page} for page in range(3)]),
+            fetcher.fetch_pages(request, 'other', [{'name': 'other', 'page': 0}])
+        )
+
+    fetcher.run(fetch_all)
+
+    # The other category is started alongside the first request of the busy one, rather than behind its queued requests
+    assert 'other' in list_of_started[:2]
+
+def test_stream_holds_results_until_consumed():
+    fetcher = AsyncFetcher()
+    lock = threading.Lock()
+    in_memory = {'count': 0, 'max': 0}
+
+    async def produce(index:int)->int:
+        with lock:
+            in_memory['count'] += 1
+            in_memory['max'] = max(in_memory['max'], in_memory['count'])
+        await asyncio.sleep(0.01)
+        return index
+
+    list_of_results = []
+    for result in fetcher.stream(produce, [{'index': index} for index in range(10)], max_in_flight=2):
+        time.sleep(0.05)
+        list_of_results.append(result)
+        with lock:
+            in_memory['count'] -= 1
+
+    assert sorted(list_of_results) == list(range(10))
+    # Two being produced or waiting, and the one the consumer holds
+    assert in_memory['max'] <= 3
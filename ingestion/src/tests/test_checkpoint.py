@@ -0,0 +1,88 @@
+from utility.metadata_logging import MetadataLogging
+from utility.checkpoint import Checkpoint
+import datetime as dt
+import pandas as pd
+import json
+import os
+
+def _age_checkpoint(checkpoint:Checkpoint, hours:float)->None:
+    created_at = (dt.datetime.now() - dt.timedelta(hours=hours)).timestamp()
+    with open(os.path.join(checkpoint.run_dir, 'created_at.json'), 'w') as created_at_file:
+        json.dump({'created_at': created_at}, created_at_file)
+
+def test_checkpointed_pages_are_read_back_when_resumed(tmp_path):
+    checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1, max_age_hours=24)
+    checkpoint.save_page_count(category='Fruit', page_count=2)
+    checkpoint.save_page(category='Fruit', page=1, page_df=pd.DataFrame({'Stockcode': [1]}))
+
+    resumed_checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1, max_age_hours=24)
+
+    assert resumed_checkpoint.get_page_count(category='Fruit') == 2
+    assert resumed_checkpoint.get_page(category='Fruit', page=1)['Stockcode'].tolist() == [1]
+
+def test_expired_checkpoints_are_cleared(tmp_path):
+    checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1, max_age_hours=24)
+    checkpoint.save_page(category='Fruit', page=1, page_df=pd.DataFrame({'Stockcode': [1]}))
+    other_checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='coles', run_id=1, max_age_hours=24)
+    _age_checkpoint(checkpoint=checkpoint, hours=25)
+    _age_checkpoint(checkpoint=other_checkpoint, hours=25)
+
+    resumed_checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1, max_age_hours=24)
+
+    # The stale page is not read back, the other retailer's checkpoint is left to its own run
+    assert resumed_checkpoint.get_page(category='Fruit', page=1) is None
+    assert os.path.exists(other_checkpoint.run_dir)
+
+def test_checkpoints_are_kept_without_max_age(tmp_path):
+    checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1)
+    checkpoint.save_page(category='Fruit', page=1, page_df=pd.DataFrame({'Stockcode': [1]}))
+    _age_checkpoint(checkpoint=checkpoint, hours=1000)
+
+    resumed_checkpoint = Checkpoint(checkpoint_dir=str(tmp_path), name='woolworths', run_id=1)
+
+    assert resumed_checkpoint.get_page(category='Fruit', page=1) is not None
+
+def _log(metadata_logger:MetadataLogging, schema_name:str, run_status:str, hours_ago:float=0)->None:
+    metadata_logger.log(
+        run_timestamp=dt.datetime.now() - dt.timedelta(hours=hours_ago),
+        run_id=1,
+        run_config={},
+        schema_name=schema_name,
+        table_name='pipeline_logs',
+        run_status=run_status
+    )
+
+def test_failed_run_is_resumed(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Started', hours_ago=1)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Error', hours_ago=0.5)
+
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs', max_age_hours=24, max_resumes=3) == 1
+
+def test_completed_run_is_not_resumed(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Started', hours_ago=1)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Completed', hours_ago=0.5)
+
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs') is None
+
+def test_run_older_than_max_age_is_not_resumed(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine)
+    # Resumed recently, but first started beyond the limit
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Started', hours_ago=30)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Error', hours_ago=29)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Started', hours_ago=1)
+    _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Error', hours_ago=0.5)
+
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs', max_age_hours=24) is None
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs', max_age_hours=48) == 1
+
+def test_run_resumed_max_times_is_not_resumed(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine)
+    for hours_ago in [4, 3, 2, 1]:
+        _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Started', hours_ago=hours_ago)
+        _log(metadata_logger=metadata_logger, schema_name=schema_name, run_status='Error', hours_ago=hours_ago - 0.5)
+
+    # Started four times, resumed three
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs', max_resumes=3) is None
+    assert metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name='pipeline_logs', max_resumes=4) == 1
@@ -0,0 +1,23 @@
+from coles.etl.extract import Extract
+import pandas as pd
+
+def _create_store_df(prices:list, images:list)->pd.DataFrame:
+    return pd.DataFrame({'id': [1, 2, 3], 'name': ['a', 'b', 'c'], 'pricing.now': prices, 'imageUris': images})
+
+def test_deduplicate_stores_keeps_primary_store_and_every_differing_column():
+    extract = Extract(category_url=None, product_url=None, subscription_key=None, parse_workers=0)
+    images = [['a.jpg'], ['b.jpg'], ['c.jpg']]
+    product_df = pd.concat({
+        '100': _create_store_df(prices=[1.0, 2.0, 3.0], images=images),
+        '200': _create_store_df(prices=[1.5, 2.0, 3.0], images=[['a.jpg'], ['b2.jpg'], ['c.jpg']]),
+        '300': _create_store_df(prices=[1.0, 2.0, 3.0], images=images).iloc[:2]
+    })
+
+    catalogue_df, override_df = extract._deduplicate_stores(product_df, primary_store_id='200')
+
+    # The catalogue comes from the primary store, though it is not the first store
+    assert list(catalogue_df['store_id']) == ['200', '200', '200']
+    assert list(catalogue_df['pricing.now']) == [1.5, 2.0, 3.0]
+    # Store 100 differs in the price of product 1 and the images of product 2, store 300 the same, product 3 is the same everywhere
+    assert sorted(zip(override_df['store_id'], override_df['id'])) == [('100', 1), ('100', 2), ('300', 1), ('300', 2)]
+    assert list(override_df.columns) == list(catalogue_df.columns)
@@ -0,0 +1,26 @@
+from utility.cookie_manager import CookieManager
+
+def test_failed_fetch_is_not_retried_during_cooldown(tmp_path):
+    cookie_manager = CookieManager(url='https://example.com', cache_path=str(tmp_path / 'cookie_cache.json'), failure_cooldown_seconds=300)
+    list_of_fetches = []
+
+    def fetch_cookie()->str:
+        list_of_fetches.append(1)
+        return ''
+
+    cookie_manager._fetch_cookie = fetch_cookie
+
+    assert cookie_manager.get_cookie() == ''
+    assert cookie_manager.get_cookie() == ''
+    assert cookie_manager.refresh_cookie(stale_cookie='') == ''
+    # One browser launch for the run rather than one per request
+    assert len(list_of_fetches) == 1
+
+def test_fetch_is_retried_after_cooldown(tmp_path):
+    cookie_manager = CookieManager(url='https://example.com', cache_path=str(tmp_path / 'cookie_cache.json'), failure_cooldown_seconds=0)
+    list_of_cookies = ['', 'cookie']
+    cookie_manager._fetch_cookie = lambda: list_of_cookies.pop(0)
+
+    assert cookie_manager.get_cookie() == ''
+    assert cookie_manager.get_cookie() == 'cookie'
+    assert cookie_manager.get_cookie() == 'cookie'
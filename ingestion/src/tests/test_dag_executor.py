@@ -0,0 +1,81 @@
+from utility.dag_executor import DagExecutor
+from graphlib import TopologicalSorter
+import threading
+import pytest
+
+class _Node():
+
+    def __init__(self, name:str, list_of_runs:list, error:Exception=None, started:threading.Event=None, release:threading.Event=None):
+        self.name = name
+        self.list_of_runs = list_of_runs
+        self.error = error
+        self.started = started
+        self.release = release
+
+    def __repr__(self)->str:
+        return f'Node({self.name})'
+
+    def run(self)->None:
+        if self.started is not None:
+            self.started.set()
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        self.list_of_runs.append(self.name)
+
+def test_nodes_run_after_their_dependencies():
+    list_of_runs = []
+    extract, transform, load = (_Node(name, list_of_runs) for name in ['extract', 'transform', 'load'])
+    dag = TopologicalSorter()
+    dag.add(transform, extract)
+    dag.add(load, transform)
+
+    node_timings = DagExecutor(max_workers=2).run(dag)
+
+    assert list_of_runs == ['extract', 'transform', 'load']
+    assert set(node_timings) == {extract, transform, load}
+
+def test_failure_is_raised_and_skips_dependent_nodes():
+    list_of_runs = []
+    failing = _Node('failing', list_of_runs, error=ValueError('load failed'))
+    dependent = _Node('dependent', list_of_runs)
+    dag = TopologicalSorter()
+    dag.add(dependent, failing)
+
+    with pytest.raises(ValueError, match='load failed'):
+        DagExecutor(max_workers=2).run(dag)
+
+    assert list_of_runs == []
+
+def test_failure_finishes_running_nodes_and_starts_no_new_ones():
+    list_of_runs = []
+    started, release = threading.Event(), threading.Event()
+    running = _Node('running', list_of_runs, started=started, release=release)
+    # Fails once the running node has started
+    failing = _Node('failing', list_of_runs, error=RuntimeError('boom'), release=started)
+    not_started = _Node('not_started', list_of_runs)
+    dag = TopologicalSorter()
+    dag.add(running)
+    dag.add(failing)
+    # Ready once the running node is done, after the failure
+    dag.add(not_started, running)
+    threading.Timer(0.2, release.set).start()
+
+    with pytest.raises(RuntimeError, match='boom'):
+        DagExecutor(max_workers=2).run(dag)
+
+    assert list_of_runs == ['running']
+
+def test_first_failure_is_raised():
+    list_of_runs = []
+    release = threading.Event()
+    first = _Node('first', list_of_runs, error=KeyError('first'))
+    second = _Node('second', list_of_runs, error=KeyError('second'), release=release)
+    dag = TopologicalSorter()
+    dag.add(first)
+    dag.add(second)
+    threading.Timer(0.2, release.set).start()
+
+    with pytest.raises(KeyError, match='first'):
+        DagExecutor(max_workers=2).run(dag)
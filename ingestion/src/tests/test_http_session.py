@@ -0,0 +1,32 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utility.http_session import HttpSession
+from utility.rate_limiter import RateLimiter
+import threading
+import requests
+import pytest
+import time
+
+class _SlowHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        time.sleep(0.5)
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def test_stalled_request_times_out_and_is_retried():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        rate_limiter = RateLimiter(max_retries=1, backoff_base_seconds=0.01, backoff_max_seconds=0.01)
+        session = HttpSession(rate_limiter=rate_limiter, read_timeout_seconds=0.1)
+
+        with pytest.raises(requests.Timeout):
+            session.request('GET', url=f'http://127.0.0.1:{server.server_port}/')
+
+        assert session.get_stats()['retry_count'] == 1
+    finally:
+        server.shutdown()
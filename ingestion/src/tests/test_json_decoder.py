@@ -0,0 +1,59 @@
+from utility.json_decoder import ProjectedDecoder
+import json
+
+# A search response with products nested in bundles, as the woolworths category pages return them
+DOCUMENT = {
+    'TotalRecordCount': 3,
+    'Bundles': [
+        {'Products': [{'Stockcode': 1, 'Name': 'Apple', 'Price': 1.5, 'AdditionalAttributes': {'brand': 'Farm'}, 'ImageUris': ['a.jpg']}]},
+        {'Products': [{'Stockcode': 2, 'Name': 'Pear', 'Price': None, 'AdditionalAttributes': None, 'IsNew': True}]},
+        {'Products': []}
+    ]
+}
+
+FIELDS = {
+    'Stockcode': {'path': 'Stockcode', 'dtype': 'Int64'},
+    'Name': {'path': 'Name', 'dtype': 'string'},
+    'Price': {'path': 'Price', 'dtype': 'float64'},
+    'AdditionalAttributes.brand': {'path': 'AdditionalAttributes.brand', 'dtype': 'object'}
+}
+
+def test_record_path_flattens_lists_along_the_way():
+    decoder = ProjectedDecoder(fields=FIELDS, record_path=['Bundles', 'Products'])
+
+    df = decoder.decode(json.dumps(DOCUMENT).encode('utf-8'))
+
+    assert df['Stockcode'].tolist() == [1, 2]
+    assert df['Name'].tolist() == ['Apple', 'Pear']
+    assert str(df['Stockcode'].dtype) == 'Int64'
+    assert df['Price'][0] == 1.5 and df['Price'].isna()[1]
+    # Nested fields are read through missing parents
+    assert df['AdditionalAttributes.brand'].tolist() == ['Farm', None]
+
+def test_record_filter_keeps_matching_records():
+    document = {'results': [{'_type': 'PRODUCT', 'id': 1}, {'_type': 'AD', 'id': 2}, {'_type': 'PRODUCT', 'id': 3}]}
+    decoder = ProjectedDecoder(fields={'id': {'path': 'id', 'dtype': 'Int64'}}, record_path=['results'], record_filter={'_type': 'PRODUCT'})
+
+    assert decoder.decode_document(document)['id'].tolist() == [1, 3]
+
+def test_raw_column_holds_the_fields_that_are_not_projected():
+    decoder = ProjectedDecoder(fields=FIELDS, record_path=['Bundles', 'Products'], raw_column='raw')
+
+    df = decoder.decode_document(DOCUMENT)
+
+    # Top level fields only projected through a nested path are kept whole
+    assert json.loads(df['raw'][0]) == {'AdditionalAttributes': {'brand': 'Farm'}, 'ImageUris': ['a.jpg']}
+    assert json.loads(df['raw'][1]) == {'AdditionalAttributes': None, 'IsNew': True}
+
+def test_no_raw_column_by_default():
+    decoder = ProjectedDecoder(fields=FIELDS, record_path=['Bundles', 'Products'])
+
+    assert list(decoder.decode_document(DOCUMENT).columns) == list(FIELDS)
+
+def test_missing_record_path_is_an_empty_frame():
+    decoder = ProjectedDecoder(fields=FIELDS, record_path=['Bundles', 'Products'], raw_column='raw')
+
+    df = decoder.decode_document({'TotalRecordCount': 0})
+
+    assert df.empty
+    assert list(df.columns) == list(FIELDS) + ['raw']
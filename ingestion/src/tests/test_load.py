@@ -0,0 +1,43 @@
+from coles.etl.load import Load as ColesLoad
+from woolworths.etl.load import Load as WoolworthsLoad
+import pandas as pd
+import pytest
+
+@pytest.mark.parametrize('load_class', [ColesLoad, WoolworthsLoad])
+def test_hash_rows_with_list_column(load_class):
+    df = pd.DataFrame({'id': [1, 2, 3], 'imageUris': [['a.jpg'], ['b.jpg', 'c.jpg'], None], 'pricing': [{'now': 1.5}, {'now': 2.0}, None]})
+    df.attrs['name'] = 'Test'
+    load = load_class(df=df, engine=None, schema_name='test', table_name='test', load_method='merge', primary_key='id')
+
+    row_hash = load._hash_rows(df)
+
+    assert row_hash.dtype == 'int64'
+    assert len(set(row_hash)) == 3
+    # The same content hashes the same, a changed list changes the hash
+    assert (load._hash_rows(df.copy()) == row_hash).all()
+    changed_df = df.assign(imageUris=[['a.jpg'], ['b.jpg'], None])
+    assert load._hash_rows(changed_df)[1] != row_hash[1]
+    assert load._hash_rows(changed_df)[0] == row_hash[0]
+    # The frame being loaded keeps its lists
+    assert df['imageUris'][0] == ['a.jpg']
+
+@pytest.mark.parametrize('load_class', [ColesLoad, WoolworthsLoad])
+def test_merge_into_table_with_duplicate_keys(load_class, engine, schema_name):
+    copy_df = pd.DataFrame({'id': [1, 1, 2], 'name': ['old', 'older', 'b']})
+    load_class(df=copy_df, engine=engine, schema_name=schema_name, table_name='products', load_method='copy').run()
+
+    merge_df = pd.DataFrame({'id': [1, 2, 3], 'name': ['a', 'b', 'c']})
+    load_class(df=merge_df, engine=engine, schema_name=schema_name, table_name='products', load_method='merge', primary_key='id').run()
+
+    with engine.connect() as conn:
+        list_of_rows = conn.exec_driver_sql(f'SELECT id, name FROM "{schema_name}".products ORDER BY id').all()
+
+    assert [tuple(row) for row in list_of_rows] == [(1, 'a'), (2, 'b'), (3, 'c')]
+
+@pytest.mark.parametrize('load_class', [ColesLoad, WoolworthsLoad])
+def test_every_load_step_has_a_log_format(load_class):
+    list_of_steps = ['insert_chunk', 'overwrite', 'copy_chunk', 'copy', 'merge', 'partition']
+    values = {'rows': 1, 'lower_bound': 0, 'upper_bound': 1, 'max_length': 1, 'table_name': 'products', 'partition_name': 'products_20240501_fruit', 'rows_upserted': 1, 'rows_unchanged': 0, 'rows_deleted': 0, 'rows_per_second': 1}
+
+    for step in list_of_steps:
+        assert load_class.LOG_FORMATS[step].format(**values)
@@ -0,0 +1,49 @@
+from utility.metadata_logging import MetadataLogging
+import sqlalchemy as sa
+
+def _read_metrics(engine, schema_name:str, table_name:str='pipeline_metrics')->list:
+    with engine.connect() as conn:
+        if not sa.inspect(conn).has_table(table_name, schema=schema_name):
+            return []
+        return [dict(row) for row in conn.exec_driver_sql(f'SELECT run_id, retailer, stage, category, duration_seconds, rows_parsed, rows_loaded, request_count FROM "{schema_name}"."{table_name}" ORDER BY stage, category').mappings().all()]
+
+def test_metrics_are_buffered_until_flushed(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine, metrics_batch_size=10)
+
+    metadata_logger.record_metric(run_id=1, retailer='woolworths', stage='extract', schema_name=schema_name, table_name='pipeline_metrics', category='Fruit', duration_seconds=1.5, request_count=3, rows_parsed=100)
+    # Stages report different metrics, the others are left empty
+    metadata_logger.record_metric(run_id=1, retailer='woolworths', stage='load', schema_name=schema_name, table_name='pipeline_metrics', category=None, duration_seconds=0.5, rows_loaded=100)
+    assert _read_metrics(engine, schema_name) == []
+
+    metadata_logger.flush_metrics()
+
+    assert _read_metrics(engine, schema_name) == [
+        {'run_id': 1, 'retailer': 'woolworths', 'stage': 'extract', 'category': 'Fruit', 'duration_seconds': 1.5, 'rows_parsed': 100, 'rows_loaded': None, 'request_count': 3},
+        {'run_id': 1, 'retailer': 'woolworths', 'stage': 'load', 'category': None, 'duration_seconds': 0.5, 'rows_parsed': None, 'rows_loaded': 100, 'request_count': None}
+    ]
+
+def test_full_buffer_is_written(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine, metrics_batch_size=2)
+
+    for category in ['Bakery', 'Fruit', 'Meat']:
+        metadata_logger.record_metric(run_id=1, retailer='coles', stage='load', schema_name=schema_name, table_name='pipeline_metrics', category=category, rows_loaded=1)
+
+    # The third metric waits for the next batch
+    assert [metric['category'] for metric in _read_metrics(engine, schema_name)] == ['Bakery', 'Fruit']
+
+    metadata_logger.flush_metrics()
+    assert [metric['category'] for metric in _read_metrics(engine, schema_name)] == ['Bakery', 'Fruit', 'Meat']
+
+def test_metrics_are_written_to_their_own_tables(engine, schema_name):
+    metadata_logger = MetadataLogging(engine=engine)
+
+    metadata_logger.record_metric(run_id=1, retailer='coles', stage='load', schema_name=schema_name, table_name='coles_metrics', rows_loaded=1)
+    metadata_logger.record_metric(run_id=2, retailer='woolworths', stage='load', schema_name=schema_name, table_name='woolworths_metrics', rows_loaded=2)
+    metadata_logger.flush_metrics()
+
+    assert [metric['retailer'] for metric in _read_metrics(engine, schema_name, table_name='coles_metrics')] == ['coles']
+    assert [metric['retailer'] for metric in _read_metrics(engine, schema_name, table_name='woolworths_metrics')] == ['woolworths']
+
+    # Flushing an empty buffer writes nothing
+    metadata_logger.flush_metrics()
+    assert len(_read_metrics(engine, schema_name, table_name='coles_metrics')) == 1
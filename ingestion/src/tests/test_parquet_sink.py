@@ -0,0 +1,18 @@
+from utility.parquet_sink import ParquetReader, ParquetSink
+import datetime as dt
+import pandas as pd
+
+def _write_snapshot(root_dir:str, df:pd.DataFrame, snapshot_date:dt.date)->None:
+    df.attrs['name'] = 'Fruit'
+    ParquetSink(df=df, root_dir=str(root_dir), dataset_name='products', retailer='coles', snapshot_date=snapshot_date).run()
+
+def test_read_conflicting_column_types_as_string(tmp_path):
+    _write_snapshot(tmp_path, pd.DataFrame({'id': [1, 2], 'size': [1.5, 2.0], 'price': [1.0, 2.0]}), dt.date(2024, 1, 1))
+    # The schema registry widened the column to object, later snapshots write it as strings
+    _write_snapshot(tmp_path, pd.DataFrame({'id': [1, 2], 'size': ['1.5kg', '2kg'], 'price': [1, 2]}), dt.date(2024, 1, 2))
+
+    df = ParquetReader(root_dir=str(tmp_path), dataset_name='products').read(columns=['id', 'size', 'price', 'snapshot_date'])
+
+    assert len(df) == 4
+    assert sorted(df['size']) == ['1.5', '1.5kg', '2', '2kg']
+    assert df['price'].dtype == 'float64'
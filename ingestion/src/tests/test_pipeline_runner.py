@@ -0,0 +1,89 @@
+from utility.pipeline_runner import create_request_planner, run_load_stages
+import pandas as pd
+import pytest
+
+class _Extract():
+
+    def __init__(self, list_of_df:list):
+        self.list_of_df = list_of_df
+        self.metrics = [{'stage': 'extract', 'category': None}]
+        self.list_of_complete_categories = [df.attrs['name'] for df in list_of_df]
+
+    def run(self)->list:
+        return self.list_of_df
+
+    def run_stream(self, queue_depth:int=2):
+        yield from self.list_of_df
+
+class _Transform():
+
+    def __init__(self, df:pd.DataFrame):
+        self.df = df
+        self.metrics = {'stage': 'transform', 'category': df.attrs['name']}
+
+    def run(self)->None:
+        self.df['transformed'] = True
+
+class _Load():
+
+    def __init__(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, load_method:str, chunksize:int, primary_key:str, snapshot_date):
+        self.df = df
+        self.table_name = table_name
+        self.load_method = load_method
+        self.metrics = {}
+
+    def run(self)->None:
+        # The transform runs first, on the frame the load reads
+        assert self.df['transformed'].all()
+        self.metrics = {'stage': 'load', 'category': self.df.attrs['name'], 'table_name': self.table_name, 'rows_loaded': len(self.df)}
+
+def _get_load_target(df:pd.DataFrame, load_method:str, partition_table_name:str)->tuple:
+    return f"raw_{df.attrs['name']}", load_method
+
+def _create_config(stream:bool)->dict:
+    return {
+        'extract': {'schema_name': 'test', 'cache_mode': 'off'},
+        'load': {'load_method': 'merge', 'primary_key': 'id', 'stream': stream, 'stream_queue_depth': 2, 'max_workers': 2, 'partition_table_name': 'products'},
+        'price_history': {'enabled': False, 'table_name': 'price_history', 'price_columns': []},
+        'parquet': {'enabled': False, 'root_dir': None, 'compression': 'zstd', 'compression_level': None, 'row_group_size': 100000},
+        'request_planner': {'enabled': True, 'state_path': None, 'max_state_age_hours': 24}
+    }
+
+def _create_categories()->list:
+    list_of_df = []
+    for name, rows in [('Fruit', 2), ('Bakery', 3)]:
+        df = pd.DataFrame({'id': range(rows)})
+        df.attrs['name'] = name
+        list_of_df.append(df)
+    return list_of_df
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_categories_are_transformed_then_loaded(stream):
+    extract_object = _Extract(_create_categories())
+
+    list_of_metrics = run_load_stages(
+        config=_create_config(stream=stream),
+        target_engine=None,
+        extract_object=extract_object,
+        load_class=_Load,
+        get_load_target=_get_load_target,
+        iterate_stream=extract_object.run_stream,
+        create_transform_node=_Transform
+    )
+
+    list_of_load_metrics = sorted([metric for metric in list_of_metrics if metric['stage'] == 'load' and metric['category'] is not None], key=lambda metric: metric['category'])
+    assert [(metric['table_name'], metric['rows_loaded']) for metric in list_of_load_metrics] == [('raw_Bakery', 3), ('raw_Fruit', 2)]
+    assert sorted(metric['category'] for metric in list_of_metrics if metric['stage'] == 'transform') == ['Bakery', 'Fruit']
+    # The run total follows the per category metrics
+    assert list_of_metrics[-1]['category'] is None and list_of_metrics[-1]['rows_loaded'] == 5
+
+def test_request_planner_keeps_every_category_for_snapshots():
+    config = _create_config(stream=False)
+    assert create_request_planner(config=config).skip_unchanged
+
+    config['load']['load_method'] = 'partition'
+    assert not create_request_planner(config=config).skip_unchanged
+
+    config = _create_config(stream=False)
+    config['request_planner']['enabled'] = False
+    assert create_request_planner(config=config) is None
@@ -0,0 +1,69 @@
+from benchmark.run_benchmark import _seed_cookie_cache
+from benchmark.stub_servers import StubServer
+from utility.config_loader import read_config
+from woolworths.etl.extract import Extract
+from woolworths.pipeline import pipeline
+import json
+import os
+import pytest
+
+@pytest.fixture
+def stub_url():
+    stub = StubServer(categories=2, products_per_category=100)
+    yield stub.start()
+    stub.stop()
+
+def _fail_page(monkeypatch, category_id:str, page:int)->None:
+    """
+    Makes the request of a page of a category fail
+    """
+
+    get_page_content = Extract._get_page_content
+
+    def failing_get_page_content(self, url:str, headers:dict, payload:str)->bytes:
+        request = json.loads(payload)
+        if request['categoryId'] == category_id and request['pageNumber'] == page:
+            return None
+        return get_page_content(self, url=url, headers=headers, payload=payload)
+
+    monkeypatch.setattr(Extract, '_get_page_content', failing_get_page_content)
+
+def _create_config(stub_url:str, tmp_path, schema_name:str)->dict:
+    config = read_config(os.path.join(os.path.dirname(__file__), '..', 'woolworths', 'config.yaml'))
+    config['extract']['category_url'] = f'{stub_url}/api/ui/v2/bootstrap'
+    config['extract']['product_url'] = f'{stub_url}/apis/ui/browse/category'
+    config['extract']['schema_name'] = schema_name
+    config['extract']['schema_registry_path'] = None
+    config['extract']['parse_workers'] = 0
+    config['extract']['cookie_cache_path'] = str(tmp_path / 'cookie_cache.json')
+    config['rate_limit']['enabled'] = False
+    config['request_planner']['enabled'] = False
+    config['price_history']['enabled'] = True
+    _seed_cookie_cache(cache_path=config['extract']['cookie_cache_path'], url=config['extract']['product_url'])
+
+    return config
+
+def test_failed_page_is_not_a_complete_category(stub_url, tmp_path, monkeypatch):
+    _fail_page(monkeypatch, category_id='1_0', page=2)
+    config = _create_config(stub_url, tmp_path, schema_name='test')
+    extract = Extract(category_url=config['extract']['category_url'], product_url=config['extract']['product_url'], parse_workers=0, page_size=36)
+    extract.cookie_manager.cache_path = config['extract']['cookie_cache_path']
+
+    list_of_product_df = extract.run()
+
+    assert [product_df.attrs['name'] for product_df in list_of_product_df] == ['Category0', 'Category1']
+    assert len(list_of_product_df[0]) == 64
+    assert extract.list_of_complete_categories == ['Category1']
+
+def test_failed_page_does_not_delist_products(stub_url, tmp_path, monkeypatch, engine, schema_name):
+    config = _create_config(stub_url, tmp_path, schema_name=schema_name)
+    pipeline.run_extract_load(config=config, target_engine=engine)
+
+    # The products of the failed page are missing from the next run without being delisted
+    _fail_page(monkeypatch, category_id='1_0', page=2)
+    pipeline.run_extract_load(config=config, target_engine=engine)
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'SELECT "category", count(*), count("valid_to") FROM "{schema_name}"."price_history" GROUP BY 1 ORDER BY 1').all()
+
+    assert [tuple(row) for row in rows] == [('Category0', 100, 0), ('Category1', 100, 0)]
@@ -0,0 +1,103 @@
+from utility.product_matching import ProductMatching
+import pandas as pd
+
+def _create_matching(min_score:float=0.6)->ProductMatching:
+    retailer = {'name': 'retailer', 'schema_name': 'retailer', 'load_method': 'merge', 'partition_table_name': None, 'columns': {}}
+    return ProductMatching(engine=None, left=dict(retailer, name='left'), right=dict(retailer, name='right'), schema_name='test', table_name='product_matches', min_score=min_score)
+
+def _create_products(list_of_products:list)->pd.DataFrame:
+    return pd.DataFrame(list_of_products, columns=['key', 'barcode', 'brand', 'name', 'size'])
+
+def test_barcodes_match_across_padding():
+    matching = _create_matching()
+    left_df = matching._normalise(_create_products([('1', '0009300633604', 'Arnott', 'Tim Tam', '200g'), ('2', None, 'Arnott', 'Scotch Finger', '250g')]))
+    right_df = matching._normalise(_create_products([('a', '9300633604', 'Arnotts', 'Tim Tam Original', '200g'), ('b', '123', 'Arnott', 'Scotch Finger', '250g')]))
+
+    match_df = matching._match_barcodes(left_df=left_df, right_df=right_df)
+
+    assert match_df[['left_key', 'right_key', 'match_method', 'score']].values.tolist() == [['1', 'a', 'barcode', 1.0]]
+
+def test_barcode_matches_each_product_once():
+    matching = _create_matching()
+    left_df = matching._normalise(_create_products([('1', '930', None, 'A', None), ('2', '930', None, 'A', None)]))
+    right_df = matching._normalise(_create_products([('a', '930', None, 'A', None)]))
+
+    match_df = matching._match_barcodes(left_df=left_df, right_df=right_df)
+
+    assert match_df[['left_key', 'right_key']].values.tolist() == [['1', 'a']]
+
+def test_names_are_scored_on_jaccard_similarity_within_brand_and_size():
+    matching = _create_matching(min_score=0.5)
+    left_df = matching._normalise(_create_products([('1', None, 'Arnott', 'Arnott Tim Tam Original Biscuits 200g', '200g')]))
+    right_df = matching._normalise(_create_products([
+        # Tokens {tim, tam, original} against {tim, tam, original, biscuits}: 3 / 4
+        ('a', None, 'ARNOTT', 'Tim Tam Original', '0.2kg'),
+        # The same name in another size is another block
+        ('b', None, 'Arnott', 'Tim Tam Original Biscuits', '330g')
+    ]))
+
+    match_df = matching._match_names(left_df=left_df, right_df=right_df)
+
+    assert match_df.values.tolist() == [['1', 'a', 'name', 0.75]]
+
+def test_names_below_min_score_are_not_matched():
+    matching = _create_matching(min_score=0.8)
+    left_df = matching._normalise(_create_products([('1', None, 'Arnott', 'Tim Tam Original Biscuits', '200g')]))
+    right_df = matching._normalise(_create_products([('a', None, 'Arnott', 'Tim Tam Original', '200g')]))
+
+    assert matching._match_names(left_df=left_df, right_df=right_df).empty
+
+def test_products_without_brand_or_size_are_not_matched_on_name():
+    matching = _create_matching()
+    left_df = matching._normalise(_create_products([('1', None, None, 'Bananas', '1kg'), ('2', None, 'Cavendish', 'Bananas', None)]))
+    right_df = matching._normalise(_create_products([('a', None, None, 'Bananas', '1kg'), ('b', None, 'Cavendish', 'Bananas', None)]))
+
+    assert matching._match_names(left_df=left_df, right_df=right_df).empty
+
+def test_greedy_assignment_gives_each_product_to_its_best_match():
+    matching = _create_matching(min_score=0.5)
+    left_df = matching._normalise(_create_products([
+        ('1', None, 'Brand', 'apple juice cloudy', '1l'),
+        ('2', None, 'Brand', 'apple juice cloudy pressed', '1l')
+    ]))
+    right_df = matching._normalise(_create_products([
+        ('a', None, 'Brand', 'apple juice', '1l'),
+        ('b', None, 'Brand', 'apple juice cloudy pressed', '1000ml')
+    ]))
+
+    match_df = matching._match_names(left_df=left_df, right_df=right_df)
+
+    # Product 1 is closest to b (0.75), but b is an exact match of product 2 so product 1 is matched to a (0.6667)
+    assert sorted(match_df[['left_key', 'right_key', 'score']].values.tolist()) == [['1', 'a', 0.6667], ['2', 'b', 1.0]]
+
+def _write_products(engine, schema_name:str, list_of_products:list)->None:
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{schema_name}"')
+        conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{schema_name}"."raw_FruitProducts"')
+    _create_products(list_of_products).to_sql(name='raw_FruitProducts', con=engine, schema=schema_name, index=False)
+
+def _read_matches(engine, schema_name:str)->list:
+    with engine.connect() as conn:
+        return sorted(tuple(row) for row in conn.exec_driver_sql(f'SELECT left_key, right_key, match_method FROM "{schema_name}".product_matches').all())
+
+def test_matches_are_made_again_when_a_product_changes_or_is_delisted(engine, schema_name):
+    columns = {'key': 'key', 'barcode': 'barcode', 'brand': 'brand', 'name': 'name', 'size': 'size'}
+    left = {'name': 'left', 'schema_name': f'{schema_name}_left', 'load_method': 'merge', 'partition_table_name': None, 'columns': columns}
+    right = {'name': 'right', 'schema_name': f'{schema_name}_right', 'load_method': 'merge', 'partition_table_name': None, 'columns': columns}
+    matching = ProductMatching(engine=engine, left=left, right=right, schema_name=schema_name, table_name='product_matches', min_score=0.6)
+
+    try:
+        _write_products(engine, left['schema_name'], [('1', '930', 'Arnott', 'Tim Tam', '200g'), ('2', None, 'Arnott', 'Scotch Finger', '250g'), ('3', None, 'Kellogg', 'Corn Flakes', '500g')])
+        _write_products(engine, right['schema_name'], [('a', '930', 'Arnott', 'Tim Tam', '200g'), ('b', None, 'Arnott', 'Scotch Finger', '250g'), ('c', None, 'Kellogg', 'Corn Flakes', '500g')])
+        matching.run()
+        assert _read_matches(engine, schema_name) == [('1', 'a', 'barcode'), ('2', 'b', 'name'), ('3', 'c', 'name')]
+
+        # Product 2 changes size, c is delisted and d takes its place
+        _write_products(engine, left['schema_name'], [('1', '930', 'Arnott', 'Tim Tam', '200g'), ('2', None, 'Arnott', 'Scotch Finger', '500g'), ('3', None, 'Kellogg', 'Corn Flakes', '500g')])
+        _write_products(engine, right['schema_name'], [('a', '930', 'Arnott', 'Tim Tam', '200g'), ('b', None, 'Arnott', 'Scotch Finger', '250g'), ('d', None, 'Kellogg', 'Corn Flakes', '500g')])
+        matching.run()
+        assert _read_matches(engine, schema_name) == [('1', 'a', 'barcode'), ('3', 'd', 'name')]
+    finally:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{schema_name}_left" CASCADE')
+            conn.exec_driver_sql(f'DROP SCHEMA IF EXISTS "{schema_name}_right" CASCADE')
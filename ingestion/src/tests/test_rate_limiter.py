@@ -0,0 +1,98 @@
+from utility.rate_limiter import RateLimiter
+import utility.rate_limiter as rate_limiter_module
+import pytest
+
+URL = 'http://shop.test/api/products'
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    A monotonic clock that only moves when the test moves it
+    """
+
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(rate_limiter_module.time, 'monotonic', lambda: clock['now'])
+    monkeypatch.setattr(rate_limiter_module.time, 'sleep', lambda seconds: clock.update(now=clock['now'] + seconds))
+    return clock
+
+def _get_rate(rate_limiter:RateLimiter)->float:
+    return rate_limiter.get_stats()['shop.test']['rate']
+
+def test_rate_grows_additively_on_success(clock):
+    rate_limiter = RateLimiter(initial_rate=4.0, max_rate=5.0, increase_step=1.0)
+
+    # A rate's worth of responses grows the rate by one step
+    for _ in range(4):
+        rate_limiter.record(url=URL, status_code=200, latency_seconds=0.1)
+    assert 4.9 < _get_rate(rate_limiter) < 5.0
+
+    for _ in range(10):
+        rate_limiter.record(url=URL, status_code=200, latency_seconds=0.1)
+    assert _get_rate(rate_limiter) == 5.0
+
+def test_throttle_cuts_rate_multiplicatively_once_a_second(clock):
+    rate_limiter = RateLimiter(initial_rate=8.0, min_rate=1.5, decrease_factor=0.5)
+
+    rate_limiter.record(url=URL, status_code=429, latency_seconds=0.1)
+    # Responses to requests in flight when the rate was cut do not cut it again
+    rate_limiter.record(url=URL, status_code=429, latency_seconds=0.1)
+    assert _get_rate(rate_limiter) == 4.0
+
+    clock['now'] += 1
+    rate_limiter.record(url=URL, status_code=403, latency_seconds=0.1)
+    clock['now'] += 1
+    rate_limiter.record(url=URL, status_code=429, latency_seconds=0.1)
+    assert _get_rate(rate_limiter) == 1.5
+    assert rate_limiter.get_stats()['shop.test']['throttled_count'] == 4
+
+def test_errors_and_slow_responses_cut_rate_gently(clock):
+    rate_limiter = RateLimiter(initial_rate=10.0, error_decrease_factor=0.9, latency_target_seconds=2.0)
+
+    rate_limiter.record(url=URL, status_code=503, latency_seconds=0.1)
+    clock['now'] += 1
+    rate_limiter.record(url=URL, status_code=None, latency_seconds=0.1)
+    clock['now'] += 1
+    rate_limiter.record(url=URL, status_code=200, latency_seconds=3.0)
+
+    assert _get_rate(rate_limiter) == pytest.approx(7.29, abs=0.01)
+    assert rate_limiter.get_stats()['shop.test']['throttled_count'] == 0
+
+def test_client_errors_leave_rate_unchanged(clock):
+    rate_limiter = RateLimiter(initial_rate=8.0)
+
+    rate_limiter.record(url=URL, status_code=404, latency_seconds=0.1)
+
+    assert _get_rate(rate_limiter) == 8.0
+
+def test_hosts_have_their_own_rate(clock):
+    rate_limiter = RateLimiter(initial_rate=8.0, decrease_factor=0.5)
+
+    rate_limiter.record(url=URL, status_code=429, latency_seconds=0.1)
+    rate_limiter.record(url='http://other.test/api', status_code=200, latency_seconds=0.1)
+
+    assert rate_limiter.get_stats()['shop.test']['rate'] == 4.0
+    assert rate_limiter.get_stats()['other.test']['rate'] > 8.0
+
+def test_acquire_waits_for_a_token_after_the_burst(clock):
+    rate_limiter = RateLimiter(initial_rate=2.0, burst=2)
+
+    assert rate_limiter.acquire(URL) == 0.0
+    assert rate_limiter.acquire(URL) == 0.0
+    assert rate_limiter.acquire(URL) == pytest.approx(0.5)
+
+def test_throttle_stops_the_burst(clock):
+    rate_limiter = RateLimiter(initial_rate=4.0, burst=4, decrease_factor=0.5)
+    rate_limiter.acquire(URL)
+
+    rate_limiter.record(url=URL, status_code=429, latency_seconds=0.1)
+
+    # The remaining burst tokens are dropped, the next request waits for the cut rate
+    assert rate_limiter.acquire(URL) == pytest.approx(0.5)
+
+def test_backoff_respects_retry_after_and_maximum():
+    rate_limiter = RateLimiter(backoff_base_seconds=0.5, backoff_max_seconds=4.0)
+
+    assert 0 <= rate_limiter.get_backoff(attempt=0) <= 0.5
+    assert 0 <= rate_limiter.get_backoff(attempt=10) <= 4.0
+    assert rate_limiter.get_backoff(attempt=0, retry_after='3') >= 3.0
+    assert rate_limiter.get_backoff(attempt=0, retry_after='60') <= 4.0
@@ -0,0 +1,59 @@
+from utility.request_planner import RequestPlanner
+import json
+import time
+import os
+
+def _create_planner(tmp_path, **kwargs)->RequestPlanner:
+    planner = RequestPlanner(state_path=os.path.join(tmp_path, 'plan.json'), **kwargs)
+    planner.update(category='Fruit', record_count=120, fingerprint='abc')
+    planner.save()
+    # The next run reads the saved state
+    return RequestPlanner(state_path=os.path.join(tmp_path, 'plan.json'), **kwargs)
+
+def test_unchanged_category_is_skipped(tmp_path):
+    planner = _create_planner(tmp_path)
+
+    assert planner.is_unchanged(category='Fruit', record_count=120, fingerprint='abc', page_count=3)
+    # The first page was fetched to compare
+    assert planner.stats == {'categories_skipped': 1, 'pages_skipped': 2}
+
+def test_changed_category_is_paged(tmp_path):
+    planner = _create_planner(tmp_path)
+
+    assert not planner.is_unchanged(category='Fruit', record_count=121, fingerprint='abc', page_count=3)
+    assert not planner.is_unchanged(category='Fruit', record_count=120, fingerprint='abd', page_count=3)
+    assert not planner.is_unchanged(category='Fruit', record_count=120, fingerprint=None, page_count=3)
+    assert not planner.is_unchanged(category='Bakery', record_count=120, fingerprint='abc', page_count=3)
+    assert planner.stats == {'categories_skipped': 0, 'pages_skipped': 0}
+
+def test_category_is_paged_in_full_once_its_state_is_too_old(tmp_path):
+    planner = _create_planner(tmp_path, max_state_age_hours=1)
+
+    with open(os.path.join(tmp_path, 'plan.json')) as state_file:
+        state = json.load(state_file)
+    state['categories']['Fruit']['paged_at'] = time.time() - 2 * 3600
+    with open(os.path.join(tmp_path, 'plan.json'), 'w') as state_file:
+        json.dump(state, state_file)
+
+    planner = RequestPlanner(state_path=os.path.join(tmp_path, 'plan.json'), max_state_age_hours=1)
+
+    assert not planner.is_unchanged(category='Fruit', record_count=120, fingerprint='abc', page_count=3)
+
+def test_skipping_can_be_turned_off(tmp_path):
+    planner = _create_planner(tmp_path, skip_unchanged=False)
+
+    assert not planner.is_unchanged(category='Fruit', record_count=120, fingerprint='abc', page_count=3)
+
+def test_state_is_only_kept_once_saved(tmp_path):
+    planner = RequestPlanner(state_path=os.path.join(tmp_path, 'plan.json'))
+    planner.update(category='Fruit', record_count=120, fingerprint='abc')
+
+    # A run that fails before it is loaded does not save its state
+    assert not RequestPlanner(state_path=os.path.join(tmp_path, 'plan.json')).is_unchanged(category='Fruit', record_count=120, fingerprint='abc', page_count=1)
+    assert not planner.is_unchanged(category='Fruit', record_count=120, fingerprint='abc', page_count=1)
+
+def test_fingerprint_changes_with_content():
+    planner = RequestPlanner()
+
+    assert planner.get_fingerprint(b'{"a": 1}') == planner.get_fingerprint(b'{"a": 1}')
+    assert planner.get_fingerprint(b'{"a": 1}') != planner.get_fingerprint(b'{"a": 2}')
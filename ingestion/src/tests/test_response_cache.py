@@ -0,0 +1,66 @@
+from utility.response_cache import ResponseCache
+import requests
+import pytest
+
+def _create_response(content:bytes, status_code:int=200)->requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.url = 'http://test/products'
+    response.encoding = 'utf-8'
+    response.headers['Content-Type'] = 'application/json'
+    response._content = content
+    return response
+
+def _send_function(list_of_sent:list, content:bytes=b'{"a": 1}', status_code:int=200):
+    def send()->requests.Response:
+        list_of_sent.append(content)
+        return _create_response(content=content, status_code=status_code)
+    return send
+
+def test_replay_miss_is_a_504_without_sending(tmp_path):
+    response_cache = ResponseCache(cache_dir=str(tmp_path), mode='replay')
+    list_of_sent = []
+
+    response = response_cache.request(method='POST', url='http://test/products', data='{"page": 1}', send_function=_send_function(list_of_sent))
+
+    assert response.status_code == 504
+    assert response.content == b''
+    assert list_of_sent == []
+    assert response_cache.stats == {'hits': 0, 'misses': 1, 'writes': 0}
+
+def test_recorded_response_is_replayed(tmp_path):
+    list_of_sent = []
+    ResponseCache(cache_dir=str(tmp_path), mode='record').request(method='POST', url='http://test/products', data='{"page": 1, "size": 36}', send_function=_send_function(list_of_sent))
+
+    response_cache = ResponseCache(cache_dir=str(tmp_path), mode='replay')
+    # Key order of a JSON payload does not change the key
+    response = response_cache.request(method='POST', url='http://test/products', data='{"size": 36, "page": 1}', send_function=_send_function(list_of_sent))
+
+    assert response.status_code == 200
+    assert response.json() == {'a': 1}
+    assert response.headers['content-type'] == 'application/json'
+    assert len(list_of_sent) == 1
+    assert response_cache.stats['hits'] == 1
+
+def test_vary_value_is_part_of_the_key(tmp_path):
+    ResponseCache(cache_dir=str(tmp_path), mode='record').request(method='GET', url='http://test/products', data=None, send_function=_send_function([]), vary='store-1')
+
+    response_cache = ResponseCache(cache_dir=str(tmp_path), mode='replay')
+
+    assert response_cache.request(method='GET', url='http://test/products', data=None, send_function=_send_function([]), vary='store-1').status_code == 200
+    assert response_cache.request(method='GET', url='http://test/products', data=None, send_function=_send_function([]), vary='store-2').status_code == 504
+
+def test_failed_responses_are_not_recorded(tmp_path):
+    response_cache = ResponseCache(cache_dir=str(tmp_path), mode='record')
+    list_of_sent = []
+
+    for _ in range(2):
+        response = response_cache.request(method='GET', url='http://test/products', data=None, send_function=_send_function(list_of_sent, status_code=500))
+
+    assert response.status_code == 500
+    assert len(list_of_sent) == 2
+    assert response_cache.stats['writes'] == 0
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ResponseCache(cache_dir=str(tmp_path), mode='offline')
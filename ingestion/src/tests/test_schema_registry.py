@@ -0,0 +1,35 @@
+from utility.config_loader import read_config
+from utility.schema_registry import SchemaRegistry
+from woolworths.etl.extract import Extract
+import pandas as pd
+import os
+
+def _create_registry()->SchemaRegistry:
+    extract = Extract(category_url=None, product_url=None, parse_workers=0)
+    return SchemaRegistry(name_function=extract._shorten_column_name)
+
+def test_registered_column_names_are_the_same_field():
+    schema_registry = _create_registry()
+    schema_registry.conform(pd.DataFrame({'Stockcode': [1], 'DisplayName': ['a'], 'PackageSize': ['1kg']}))
+
+    # A frame decoded straight into the registered names fills the registered columns
+    df = schema_registry.conform(pd.DataFrame({'Stockcode': [2], 'DispName': ['b'], 'PackageSz': ['2kg']}))
+
+    assert list(df.columns) == ['Stockcode', 'DispName', 'PackageSz']
+    assert df['PackageSz'][0] == '2kg'
+
+def test_path_keyed_fields_are_named_as_normalized_fields():
+    schema_registry = _create_registry()
+    normalized_df = schema_registry.conform(pd.DataFrame({'Stockcode': [1], 'AdditionalAttributes.sapcategoryname': ['a']}))
+    projected_df = schema_registry.conform(pd.DataFrame({'AdditionalAttributes.sapcategoryname': ['b'], 'Stockcode': [2]}))
+
+    assert list(normalized_df.columns) == list(projected_df.columns) == ['Stockcode', 'AddAttrsapcategoryname']
+
+def test_config_paths_are_relative_to_the_config_file():
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'woolworths', 'config.yaml')
+    config = read_config(config_path)
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+
+    assert config['extract']['checkpoint_dir'] == os.path.join(config_dir, '.checkpoints')
+    assert config['request_planner']['state_path'] == os.path.join(config_dir, '.woolworths_request_plan.json')
+    assert config['parquet']['root_dir'] == os.path.join(config_dir, '.snapshots')
@@ -0,0 +1,95 @@
+from woolworths.etl.load import Load
+import datetime as dt
+import pandas as pd
+
+def _create_load(df:pd.DataFrame=None, load_method:str='merge')->Load:
+    df = df if df is not None else pd.DataFrame({'id': [1]})
+    df.attrs['name'] = 'Fruit & Veg'
+    return Load(df=df, engine=None, schema_name='test', table_name='products', load_method=load_method, primary_key='id')
+
+def _normalize(statement:str)->str:
+    return ' '.join(statement.split())
+
+def test_staging_frame_has_one_row_per_key():
+    df = pd.DataFrame({'id': [1, 2, 1, None], 'name': ['a', 'b', 'c', 'd']})
+
+    staging_df = _create_load()._get_staging_frame(df=df, primary_key='id')
+
+    # The last row of a key is kept, rows without a key cannot be merged
+    assert staging_df['id'].tolist() == [2, 1]
+    assert staging_df['name'].tolist() == ['b', 'c']
+    assert staging_df['row_hash'].dtype == 'int64'
+
+def test_upsert_statement_skips_unchanged_rows():
+    load = _create_load()
+    staging_columns = {'id': 'bigint', 'name': 'text', 'row_hash': 'bigint'}
+    target_columns = {'id': 'bigint', 'name': 'text', 'row_hash': 'bigint', 'price': 'double precision'}
+
+    statement = load._get_upsert_statement(target='"test"."products"', staging='"test"."products_staging"', staging_columns=staging_columns, target_columns=target_columns, primary_key='id')
+
+    assert _normalize(statement) == _normalize("""
+        INSERT INTO "test"."products" ("id", "name", "row_hash")
+        SELECT "id"::bigint, "name"::text, "row_hash"::bigint FROM "test"."products_staging"
+        ON CONFLICT ("id") DO UPDATE SET "name" = EXCLUDED."name", "row_hash" = EXCLUDED."row_hash", "price" = NULL
+        WHERE "test"."products"."row_hash" IS DISTINCT FROM EXCLUDED."row_hash"
+    """)
+
+def test_upsert_statement_casts_to_target_types():
+    load = _create_load()
+    staging_columns = {'id': 'text', 'row_hash': 'bigint'}
+    target_columns = {'id': 'bigint', 'row_hash': 'bigint'}
+
+    statement = load._get_upsert_statement(target='t', staging='s', staging_columns=staging_columns, target_columns=target_columns, primary_key='id')
+    delete_statement = load._get_delete_statement(target='t', staging='s', target_columns=target_columns, primary_key='id')
+
+    assert 'SELECT "id"::bigint, "row_hash"::bigint FROM s' in _normalize(statement)
+    assert 's."id"::bigint = t."id"' in _normalize(delete_statement)
+
+def test_quote_escapes_identifiers():
+    assert _create_load()._quote('say "hi"') == '"say ""hi"""'
+
+def test_partition_names_stay_within_identifier_length():
+    load = _create_load()
+    snapshot_date = dt.date(2024, 5, 1)
+
+    assert load._get_partition_name(table_name='products', snapshot_date=snapshot_date) == 'products_20240501'
+    assert load._get_partition_name(table_name='products', snapshot_date=snapshot_date, category='Fruit') == 'products_20240501_fruit'
+
+    # Long categories sharing a prefix are kept apart by a hash of the full name
+    long_name = load._get_partition_name(table_name='products', snapshot_date=snapshot_date, category='a' * 60 + 'x')
+    other_long_name = load._get_partition_name(table_name='products', snapshot_date=snapshot_date, category='a' * 60 + 'y')
+    assert len(long_name) == 63
+    assert long_name != other_long_name
+
+def test_wider_type():
+    load = _create_load()
+
+    assert load._get_wider_type('bigint', 'bigint') == 'bigint'
+    assert load._get_wider_type('bigint', 'double precision') == 'double precision'
+    assert load._get_wider_type('bigint', 'text') == 'text'
+    assert load._get_wider_type('boolean', 'bigint') == 'text'
+
+def test_csv_encodes_nulls_and_nested_values():
+    df = pd.DataFrame({'id': [1, 2], 'tags': [['a', 'b'], None], 'price': [1.5, None]})
+
+    buffer = _create_load()._encode_csv(df)
+
+    assert buffer.read().splitlines() == ['1,"[""a"", ""b""]",1.5', '2,\\N,\\N']
+
+def test_partition_load_replaces_category_partition(engine, schema_name):
+    snapshot_date = dt.date(2024, 5, 1)
+
+    for names in [['a', 'b'], ['c']]:
+        df = pd.DataFrame({'id': list(range(len(names))), 'name': names})
+        df.attrs['name'] = 'Fruit'
+        Load(df=df, engine=engine, schema_name=schema_name, table_name='products', load_method='partition', primary_key='id', snapshot_date=snapshot_date).run()
+
+    # A later load of a category has a new column, the table is widened to it
+    df = pd.DataFrame({'id': [0], 'name': ['d'], 'price': [1.5]})
+    df.attrs['name'] = 'Bakery'
+    Load(df=df, engine=engine, schema_name=schema_name, table_name='products', load_method='partition', primary_key='id', snapshot_date=snapshot_date).run()
+
+    with engine.connect() as conn:
+        list_of_rows = conn.exec_driver_sql(f'SELECT category, name, price FROM "{schema_name}".products ORDER BY category, name').all()
+
+    assert [tuple(row) for row in list_of_rows] == [('Bakery', 'd', 1.5), ('Fruit', 'c', None)]
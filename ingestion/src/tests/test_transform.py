@@ -0,0 +1,47 @@
+from woolworths.etl.transform import Transform
+import pandas as pd
+import numpy as np
+
+def _run_transform(df:pd.DataFrame)->pd.DataFrame:
+    df.attrs['name'] = 'Test'
+    Transform(df=df).run()
+    return df
+
+def test_cup_prices_compare_per_100_of_the_unit():
+    df = _run_transform(pd.DataFrame({'CupString': ['$1.20 / 100G', '$12.00 / 1KG', '$3.50 / 1L', '$0.45 / 1EA', '$0.45 / EA', '$2 per 10 sheets', None, 'n/a']}))
+
+    assert df['CupPriceNorm'].tolist()[:6] == [1.2, 1.2, 0.35, 0.45, 0.45, 0.2]
+    assert df['CupUnitNorm'].tolist()[:6] == ['100g', '100g', '100ml', '1each', '1each', '1each']
+    assert df['CupPriceNorm'][6:].isna().all()
+    assert df['CupUnitNorm'][6:].isna().all()
+
+def test_unknown_cup_unit_has_no_cup_price():
+    df = _run_transform(pd.DataFrame({'CupString': ['$1.00 / 1 bunch']}))
+
+    assert np.isnan(df['CupPriceNorm'][0])
+    assert pd.isna(df['CupUnitNorm'][0])
+
+def test_package_sizes_in_base_units():
+    df = _run_transform(pd.DataFrame({'PackageSz': ['500g', '2 L', '6 x 375mL', '12 pack', '1.5kg', 'each', None]}))
+
+    assert df['PackageQuantity'].tolist()[:5] == [500.0, 2000.0, 2250.0, 12.0, 1500.0]
+    assert df['PackageUnit'].tolist()[:5] == ['g', 'ml', 'ml', 'each', 'g']
+    assert df['PackageQuantity'][5:].isna().all()
+
+def test_prices_are_numbers_and_saving_is_not_negative():
+    df = _run_transform(pd.DataFrame({'Price': ['$1.20', '3', None], 'WasPrice': [2.0, 2.5, 1.0]}))
+
+    assert df['Price'].dtype == 'float64'
+    assert df['Price'].tolist()[:2] == [1.2, 3.0]
+    assert df['Saving'].tolist()[:2] == [0.8, 0.0]
+    assert np.isnan(df['Saving'][2])
+
+def test_single_case_brands_are_title_cased():
+    df = _run_transform(pd.DataFrame({'Brand': ['WOOLWORTHS', 'coca-cola', 'McCain', None]}))
+
+    assert df['Brand'].tolist() == ['Woolworths', 'Coca-Cola', 'McCain', None]
+
+def test_missing_fields_are_passed_through():
+    df = _run_transform(pd.DataFrame({'Stockcode': [1], 'Price': [1.0]}))
+
+    assert list(df.columns) == ['Stockcode', 'Price']
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from utility.streaming import stream_in_background
+import contextvars
+import functools
+import asyncio
+
+class AsyncFetcher():
+
+    def __init__(self, max_concurrent_requests:int=8, max_concurrent_requests_per_category:int=4):
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_concurrent_requests_per_category = max_concurrent_requests_per_category
+        self._executor = None
+        self._global_semaphore = None
+        self._category_semaphores = {}
+
+    def _get_category_semaphore(self, category:str)->asyncio.Semaphore:
+        """
+        Gets the semaphore bounding the in-flight requests of a category
+        - `category`: the category name
+
+        Returns asyncio semaphore
+        """
+
+        if category not in self._category_semaphores:
+            self._category_semaphores[category] = asyncio.Semaphore(self.max_concurrent_requests_per_category)
+
+        return self._category_semaphores[category]
+
+    async def fetch(self, function, category:str, **kwargs):
+        """
+        Runs a blocking request function on the worker pool once a category and a global slot are free
+        - `function`: the blocking function performing the request
+        - `category`: the category the request belongs to
+        - `kwargs`: keyword arguments passed to the function
+
+        Returns the result of the function
+        """
+
+        # The category slot is taken first, so requests waiting behind a busy category do not hold global slots other categories could use
+        async with self._get_category_semaphore(category), self._global_semaphore:
+            loop = asyncio.get_running_loop()
+            # Run in a copy of the task's context so context variables such as the request tag reach the worker
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, functools.partial(context.run, function, **kwargs))
+
+    async def fetch_pages(self, function, category:str, list_of_kwargs:list)->list:
+        """
+        Fetches the pages of a category concurrently
+        - `function`: the blocking function performing the request
+        - `category`: the category the pages belong to
+        - `list_of_kwargs`: keyword arguments for each page request
+
+        Returns list of results in the same order as `list_of_kwargs`
+        """
+
+        return await asyncio.gather(*(self.fetch(function, category, **kwargs) for kwargs in list_of_kwargs))
+
+    async def _run(self, coroutine_function, *args, **kwargs):
+        self._global_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        self._category_semaphores = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            self._executor = executor
+            try:
+                return await coroutine_function(*args, **kwargs)
+            finally:
+                self._executor = None
+
+    async def _stream(self, coroutine_function, list_of_kwargs:list, max_in_flight:int, put):
+        loop = asyncio.get_running_loop()
+        in_flight_semaphore = asyncio.Semaphore(max_in_flight)
+
+        def release()->None:
+            # Called from the consumer's thread, the loop has finished once the consumer takes the last results
+            try:
+                loop.call_soon_threadsafe(in_flight_semaphore.release)
+            except RuntimeError:
+                pass
+
+        async def run_one(kwargs:dict):
+            is_handed_over = False
+            try:
+                result = await coroutine_function(**kwargs)
+                # The slot is held until the consumer takes the result, so results waiting in the queue count towards `max_in_flight`
+                await loop.run_in_executor(None, put, (result, release))
+                is_handed_over = True
+            finally:
+                if not is_handed_over:
+                    in_flight_semaphore.release()
+
+        list_of_tasks = []
+        try:
+            for kwargs in list_of_kwargs:
+                await in_flight_semaphore.acquire()
+                list_of_tasks.append(asyncio.create_task(run_one(kwargs)))
+            await asyncio.gather(*list_of_tasks)
+        finally:
+            for task in list_of_tasks:
+                task.cancel()
+
+    def stream(self, coroutine_function, list_of_kwargs:list, max_in_flight:int=2):
+        """
+        Runs a coroutine function once per kwargs on a background event loop and yields each result as soon as it completes.
+        At most `max_in_flight` results are being produced or waiting, and one more is held by the consumer
+        - `coroutine_function`: the coroutine function to run
+        - `list_of_kwargs`: keyword arguments for each run of the coroutine function
+        - `max_in_flight`: the maximum number of results being produced or waiting to be consumed
+
+        Returns a generator of results in completion order
+        """
+
+        def produce(put)->None:
+            self.run(self._stream, coroutine_function, list_of_kwargs, max_in_flight, put)
+
+        # The slots bound the queue as well, so it never blocks the producer
+        for result, release in stream_in_background(produce_function=produce, queue_depth=max_in_flight):
+            # Taking a result frees its slot for the next coroutine
+            release()
+            yield result
+
+    def run(self, coroutine_function, *args, **kwargs):
+        """
+        Runs a coroutine function on a new event loop with the fetcher ready for use
+        - `coroutine_function`: the coroutine function to run
+        - `args`, `kwargs`: arguments passed to the coroutine function
+
+        Returns the result of the coroutine function
+        """
+
+        return asyncio.run(self._run(coroutine_function, *args, **kwargs))
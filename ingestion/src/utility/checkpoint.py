@@ -0,0 +1,191 @@
+import pandas as pd
+import threading
+import logging
+import shutil
+import json
+import time
+import os
+import re
+
+class Checkpoint():
+
+    def __init__(self, checkpoint_dir:str, name:str, run_id:int, max_age_hours:float=None):
+        """
+        Keeps the extracted pages of a run on disk, so a failed run resumed with the same run id only fetches the missing pages.
+        Checkpoints older than `max_age_hours` are cleared rather than read back, their prices would be loaded as current
+        - `checkpoint_dir`: the directory the checkpoints of all runs are kept in
+        - `name`: the retailer, so retailers sharing a directory and run id are kept apart
+        - `run_id`: the run id from the metadata log
+        - `max_age_hours`: the hours after which the checkpoints of the retailer are cleared, None to keep them until their run completes
+        """
+
+        self.checkpoint_dir = checkpoint_dir
+        self.name = name
+        self.run_id = run_id
+        self.max_age_hours = max_age_hours
+        self.run_dir = os.path.join(checkpoint_dir, f'{name}_{run_id}')
+        self.stats = {'pages_restored': 0, 'pages_saved': 0}
+        self._lock = threading.Lock()
+
+        self._clear_expired()
+        self._write_created_at()
+
+    def _get_created_at(self, run_dir:str)->float:
+        """
+        Gets the time the checkpoint of a run was created
+        - `run_dir`: the checkpoint directory of the run
+
+        Returns the creation time as a unix timestamp, the directory's modification time for checkpoints without one
+        """
+
+        try:
+            with open(os.path.join(run_dir, 'created_at.json')) as created_at_file:
+                return json.load(created_at_file)['created_at']
+        except (OSError, ValueError, KeyError):
+            return os.path.getmtime(run_dir)
+
+    def _write_created_at(self)->None:
+        """
+        Records when the checkpoint of the run was created, kept when the run is resumed so its age counts from the first attempt
+
+        Returns None
+        """
+
+        path = os.path.join(self.run_dir, 'created_at.json')
+
+        if os.path.exists(path):
+            return None
+
+        def write(path:str):
+            with open(path, 'w') as created_at_file:
+                json.dump({'created_at': time.time()}, created_at_file)
+
+        self._write(path=path, write_function=write)
+
+        return None
+
+    def _clear_expired(self)->None:
+        """
+        Removes the checkpoints of the retailer older than `max_age_hours`, including those of runs that will not be resumed
+
+        Returns None
+        """
+
+        if self.max_age_hours is None or not os.path.isdir(self.checkpoint_dir):
+            return None
+
+        for dir_name in os.listdir(self.checkpoint_dir):
+            run_dir = os.path.join(self.checkpoint_dir, dir_name)
+
+            if not re.fullmatch(rf'{re.escape(self.name)}_\d+', dir_name) or not os.path.isdir(run_dir):
+                continue
+
+            age_hours = (time.time() - self._get_created_at(run_dir)) / 3600
+            if age_hours > self.max_age_hours:
+                shutil.rmtree(run_dir, ignore_errors=True)
+                logging.info(f'Checkpoint [{run_dir}] cleared, it is [{age_hours:.1f}] hours old')
+
+        return None
+
+    def _get_category_dir(self, category:str)->str:
+        # Category names come from the API, only keep characters safe in a path
+        return os.path.join(self.run_dir, re.sub(r'[^A-Za-z0-9_-]', '_', category))
+
+    def _write(self, path:str, write_function)->None:
+        """
+        Writes a checkpoint file through a temporary file, so a run killed mid write never leaves a partial checkpoint
+        - `path`: the checkpoint file
+        - `write_function`: function writing to the path it is given
+
+        Returns None
+        """
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        write_function(temporary_path)
+        os.replace(temporary_path, path)
+
+        return None
+
+    def get_page_count(self, category:str)->int:
+        """
+        Gets the checkpointed page count of a category
+        - `category`: the category name
+
+        Returns the page count, None when it is not checkpointed
+        """
+
+        path = os.path.join(self._get_category_dir(category), 'page_count.json')
+
+        if not os.path.exists(path):
+            return None
+
+        with open(path) as page_count_file:
+            return json.load(page_count_file)['page_count']
+
+    def save_page_count(self, category:str, page_count:int)->None:
+        """
+        Checkpoints the page count of a category
+        - `category`: the category name
+        - `page_count`: the number of pages in the category
+
+        Returns None
+        """
+
+        def write(path:str):
+            with open(path, 'w') as page_count_file:
+                json.dump({'page_count': page_count}, page_count_file)
+
+        self._write(path=os.path.join(self._get_category_dir(category), 'page_count.json'), write_function=write)
+
+        return None
+
+    def get_page(self, category:str, page:int)->pd.DataFrame:
+        """
+        Gets a checkpointed page
+        - `category`: the category name
+        - `page`: the page number
+
+        Returns dataframe of the page, None when it is not checkpointed
+        """
+
+        path = os.path.join(self._get_category_dir(category), f'page_{page}.pkl')
+
+        if not os.path.exists(path):
+            return None
+
+        page_df = pd.read_pickle(path)
+
+        with self._lock:
+            self.stats['pages_restored'] += 1
+
+        return page_df
+
+    def save_page(self, category:str, page:int, page_df:pd.DataFrame)->None:
+        """
+        Checkpoints a page, pickled so the column types are kept as extracted
+        - `category`: the category name
+        - `page`: the page number
+        - `page_df`: the dataframe of the page
+
+        Returns None
+        """
+
+        self._write(path=os.path.join(self._get_category_dir(category), f'page_{page}.pkl'), write_function=page_df.to_pickle)
+
+        with self._lock:
+            self.stats['pages_saved'] += 1
+
+        return None
+
+    def clear(self)->None:
+        """
+        Removes the checkpoints of the run, once the run has completed
+
+        Returns None
+        """
+
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+        logging.info(f'Checkpoint [{self.run_dir}] cleared, stats {self.stats}')
+
+        return None
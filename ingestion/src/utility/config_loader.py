@@ -0,0 +1,37 @@
+import yaml
+import os
+
+# The config values holding file or directory paths, as (section, key)
+PATH_KEYS = [
+    ('extract', 'cache_dir'),
+    ('extract', 'schema_registry_path'),
+    ('extract', 'checkpoint_dir'),
+    ('extract', 'cookie_cache_path'),
+    ('request_planner', 'state_path'),
+    ('parquet', 'root_dir')
+]
+
+def read_config(config_path:str)->dict:
+    """
+    Reads a yaml config, resolving its relative paths against the directory of the config file so they do not depend on
+    the working directory the pipeline is started from
+    - `config_path`: the yaml config file
+
+    Returns the config as a dictionary
+    """
+
+    with open(config_path) as stream:
+        config = yaml.safe_load(stream)
+
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+
+    for section, key in PATH_KEYS:
+        if isinstance(config.get(section), dict) and config[section].get(key) is not None:
+            config[section][key] = os.path.normpath(os.path.join(config_dir, config[section][key]))
+
+    # The retailer configs listed by the orchestrator
+    for retailer in config.get('retailers') or []:
+        if retailer.get('config_path') is not None:
+            retailer['config_path'] = os.path.normpath(os.path.join(config_dir, retailer['config_path']))
+
+    return config
@@ -0,0 +1,149 @@
+from playwright.sync_api import sync_playwright
+import threading
+import logging
+import json
+import time
+import os
+
+class CookieManager():
+
+    def __init__(self, url:str, cookie_name:str='_abck', cache_path:str='.cookie_cache.json', ttl_seconds:int=1800, failure_cooldown_seconds:int=300):
+        self.url = url
+        self.cookie_name = cookie_name
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        # A browser is not launched again for this long after it failed to get the cookie
+        self.failure_cooldown_seconds = failure_cooldown_seconds
+        self._cookie = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._lock = threading.Lock()
+
+    def _fetch_cookie(self)->str:
+        """
+        Gets a cookie from the url with a headless browser
+
+        Returns the cookie as string, empty when the browser did not get it
+        """
+
+        cookie = ''
+
+        logging.info(f'Fetching cookie [{self.cookie_name}] with browser')
+
+        with sync_playwright() as p:
+            browser = p.chromium.launch()
+            context = browser.new_context()
+            page = context.new_page()
+            page.goto(self.url)
+
+            for item in context.cookies():
+                if item['name'] == self.cookie_name:
+                    cookie = item['value']
+                    break
+            else:
+                logging.error('Could not get cookie')
+
+            context.close()
+            browser.close()
+
+        return cookie
+
+    def _read_cache(self)->None:
+        """
+        Loads the cookie from the cache file if it is for the same url and cookie name
+
+        Returns None
+        """
+
+        if not os.path.exists(self.cache_path):
+            return None
+
+        try:
+            with open(self.cache_path) as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            logging.error(f'Could not read cookie cache [{self.cache_path}]')
+            return None
+
+        if cache.get('url') == self.url and cache.get('cookie_name') == self.cookie_name:
+            self._cookie = cache.get('cookie')
+            self._fetched_at = cache.get('fetched_at', 0.0)
+
+        return None
+
+    def _write_cache(self)->None:
+        """
+        Writes the cookie to the cache file
+
+        Returns None
+        """
+
+        cache = {
+            'url': self.url,
+            'cookie_name': self.cookie_name,
+            'cookie': self._cookie,
+            'fetched_at': self._fetched_at
+        }
+
+        # Write to a temporary file first so a concurrent reader never sees a partial file
+        temporary_path = f'{self.cache_path}.tmp'
+        with open(temporary_path, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(temporary_path, self.cache_path)
+
+        return None
+
+    def _is_expired(self)->bool:
+        return not self._cookie or time.time() - self._fetched_at > self.ttl_seconds
+
+    def _is_cooling_down(self)->bool:
+        return self._failed_at is not None and time.time() - self._failed_at < self.failure_cooldown_seconds
+
+    def _refresh(self)->None:
+        # Every request would otherwise launch a browser while the cookie cannot be fetched
+        if self._is_cooling_down():
+            return None
+
+        cookie = self._fetch_cookie()
+
+        if not cookie:
+            self._failed_at = time.time()
+            logging.error(f'Could not get cookie [{self.cookie_name}], not fetching it again for [{self.failure_cooldown_seconds}] seconds')
+            return None
+
+        self._cookie = cookie
+        self._fetched_at = time.time()
+        self._failed_at = None
+        self._write_cache()
+
+    def get_cookie(self)->str:
+        """
+        Gets the cookie from memory, then the cache file, and only fetches a new one when both have expired
+
+        Returns the cookie as string, the expired or empty cookie while a failed fetch is cooling down
+        """
+
+        with self._lock:
+            if self._is_expired():
+                self._read_cache()
+
+            if self._is_expired():
+                self._refresh()
+
+            return self._cookie or ''
+
+    def refresh_cookie(self, stale_cookie:str)->str:
+        """
+        Fetches a new cookie after a request with `stale_cookie` was rejected.
+        When another worker has already refreshed it, the current cookie is returned instead of fetching again
+        - `stale_cookie`: the cookie the rejected request was sent with
+
+        Returns the cookie as string
+        """
+
+        with self._lock:
+            if self._cookie == stale_cookie:
+                logging.info(f'Cookie [{self.cookie_name}] rejected, refreshing')
+                self._refresh()
+
+            return self._cookie or ''
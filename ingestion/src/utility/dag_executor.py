@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from graphlib import TopologicalSorter
+import logging
+import time
+
+class DagExecutor():
+
+    def __init__(self, max_workers:int=4):
+        self.max_workers = max_workers
+        self.node_timings = {}
+
+    def _run_node(self, node)->float:
+        """
+        Runs a node
+        - `node`: the DAG node, any object with a `run()` method
+
+        Returns the node run time in seconds
+        """
+
+        start_time = time.perf_counter()
+        node.run()
+
+        return time.perf_counter() - start_time
+
+    def run(self, dag:TopologicalSorter)->dict:
+        """
+        Runs the DAG nodes on a worker pool, starting each node as soon as its dependencies are done.
+        When a node fails no new nodes are started, the running nodes are finished and the first error is raised
+        - `dag`: the DAG of nodes, not yet prepared
+
+        Returns dictionary of node to run time in seconds
+        """
+
+        dag.prepare()
+
+        self.node_timings = {}
+        list_of_failures = []
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while dag.is_active():
+                if not list_of_failures:
+                    for node in dag.get_ready():
+                        logging.info(f'Starting node [{node!r}]')
+                        running[executor.submit(self._run_node, node)] = node
+
+                # Nothing left to wait for, the remaining nodes depend on a failed node
+                if not running:
+                    break
+
+                done, not_done = wait(running, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    node = running.pop(future)
+                    try:
+                        self.node_timings[node] = future.result()
+                    except Exception as e:
+                        logging.error(f'Node [{node!r}] failed: {e!r}')
+                        list_of_failures.append(e)
+                    else:
+                        logging.info(f'Finished node [{node!r}] in [{self.node_timings[node]:.2f}] seconds')
+                        dag.done(node)
+
+        if list_of_failures:
+            raise list_of_failures[0]
+
+        return self.node_timings
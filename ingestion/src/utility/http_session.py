@@ -0,0 +1,245 @@
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.request import ACCEPT_ENCODING
+from utility.rate_limiter import RateLimiter
+from utility.response_cache import ResponseCache
+import logging
+import contextvars
+import functools
+import threading
+import requests
+import time
+
+# Tags the requests made in the current context, e.g. with the category being extracted, so their counters can be read per tag
+request_tag = contextvars.ContextVar('request_tag', default=None)
+
+class _SessionStats():
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.bytes_received = 0
+        self.retry_count = 0
+        self.connections_opened = 0
+        self.handshake_seconds = 0.0
+
+    def record_request(self, bytes_received:int)->None:
+        with self._lock:
+            self.request_count += 1
+            self.bytes_received += bytes_received
+
+    def record_retry(self)->None:
+        with self._lock:
+            self.retry_count += 1
+
+    def record_connection(self, handshake_seconds:float)->None:
+        with self._lock:
+            self.connections_opened += 1
+            self.handshake_seconds += handshake_seconds
+
+    def as_dict(self)->dict:
+        with self._lock:
+            return {
+                'request_count': self.request_count,
+                'bytes_received': self.bytes_received,
+                'retry_count': self.retry_count,
+                'connections_opened': self.connections_opened,
+                'connections_reused': max(self.request_count - self.connections_opened, 0),
+                'handshake_seconds': round(self.handshake_seconds, 3)
+            }
+
+class _InstrumentedPoolMixin():
+    """
+    Times the TCP (and TLS) handshake of every connection the pool opens
+    """
+
+    def __init__(self, *args, stats:_SessionStats=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        connect = conn.connect
+        stats = self.stats
+
+        def timed_connect():
+            start = time.perf_counter()
+            connect()
+            stats.record_connection(handshake_seconds=time.perf_counter() - start)
+
+        conn.connect = timed_connect
+
+        return conn
+
+class _InstrumentedHTTPConnectionPool(_InstrumentedPoolMixin, HTTPConnectionPool):
+    pass
+
+class _InstrumentedHTTPSConnectionPool(_InstrumentedPoolMixin, HTTPSConnectionPool):
+    pass
+
+class _InstrumentedAdapter(HTTPAdapter):
+
+    def __init__(self, stats:_SessionStats, **kwargs):
+        # Set before the parent constructor as it creates the pool manager
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': functools.partial(_InstrumentedHTTPConnectionPool, stats=self.stats),
+            'https': functools.partial(_InstrumentedHTTPSConnectionPool, stats=self.stats)
+        }
+
+class HttpSession():
+
+    def __init__(self, pool_connections:int=4, pool_maxsize:int=8, response_cache:ResponseCache=None, rate_limiter:RateLimiter=None, connect_timeout_seconds:float=10, read_timeout_seconds:float=60):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        # A stalled connection raises a timeout, which is retried when rate limited, rather than holding its worker forever
+        self.timeout = (connect_timeout_seconds, read_timeout_seconds)
+        self.response_cache = response_cache
+        # Paces and retries the requests sent over the network when set
+        self.rate_limiter = rate_limiter
+        self._stats = _SessionStats()
+        self._tag_stats = {}
+        self._tag_stats_lock = threading.Lock()
+
+        # Keep-alive connections pooled per host, with compressed responses
+        self.session = requests.Session()
+        self.session.headers.update({'accept-encoding': ACCEPT_ENCODING, 'connection': 'keep-alive'})
+        adapter = _InstrumentedAdapter(stats=self._stats, pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _get_tag_stats(self)->_SessionStats:
+        tag = request_tag.get()
+
+        if tag is None:
+            return None
+
+        with self._tag_stats_lock:
+            if tag not in self._tag_stats:
+                self._tag_stats[tag] = _SessionStats()
+
+            return self._tag_stats[tag]
+
+    @property
+    def offline(self)->bool:
+        """
+        Whether responses are only replayed from the response cache, without touching the network
+        """
+
+        return self.response_cache is not None and self.response_cache.mode == 'replay'
+
+    def _send_once(self, method:str, url:str, headers:dict=None, data:str=None)->requests.Response:
+        response = self.session.request(method, url=url, headers=headers, data=data, timeout=self.timeout)
+        self._stats.record_request(bytes_received=len(response.content))
+
+        tag_stats = self._get_tag_stats()
+        if tag_stats is not None:
+            tag_stats.record_request(bytes_received=len(response.content))
+
+        return response
+
+    def _send(self, method:str, url:str, headers:dict=None, data:str=None)->requests.Response:
+        """
+        Sends a request once a rate limiter token is free, retrying retry statuses, connection errors and timeouts with jittered exponential backoff
+        - `method`: the HTTP method
+        - `url`: the request URL
+        - `headers`: the request headers
+        - `data`: the request body
+
+        Returns the last response, connection errors and timeouts are raised once the retries are used up
+        """
+
+        if self.rate_limiter is None:
+            return self._send_once(method, url=url, headers=headers, data=data)
+
+        attempt = 0
+
+        while True:
+            self.rate_limiter.acquire(url)
+            start_time = time.perf_counter()
+
+            try:
+                response = self._send_once(method, url=url, headers=headers, data=data)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.rate_limiter.record(url, status_code=None, latency_seconds=time.perf_counter() - start_time)
+                if attempt >= self.rate_limiter.max_retries:
+                    raise
+                retry_reason, retry_after = repr(e), None
+            else:
+                self.rate_limiter.record(url, status_code=response.status_code, latency_seconds=time.perf_counter() - start_time)
+                if response.status_code not in self.rate_limiter.retry_statuses or attempt >= self.rate_limiter.max_retries:
+                    return response
+                retry_reason, retry_after = f'status {response.status_code}', response.headers.get('retry-after')
+
+            backoff_seconds = self.rate_limiter.get_backoff(attempt=attempt, retry_after=retry_after)
+            logging.warning(f'Retrying [{method} {url}] after [{retry_reason}] in [{backoff_seconds:.2f}] seconds, attempt [{attempt + 1} / {self.rate_limiter.max_retries}]')
+            self.record_retry()
+            time.sleep(backoff_seconds)
+            attempt += 1
+
+    def request(self, method:str, url:str, headers:dict=None, data:str=None, cache_vary:str=None)->requests.Response:
+        """
+        Sends a request over a pooled connection, or serves it from the response cache.
+        Cached responses are not counted as requests
+        - `method`: the HTTP method
+        - `url`: the request URL
+        - `headers`: the request headers, not part of the cache key
+        - `data`: the request body
+        - `cache_vary`: a value the response depends on besides the URL and body, e.g. the store selected by a cookie header
+
+        Returns the response
+        """
+
+        send_function = functools.partial(self._send, method, url=url, headers=headers, data=data)
+
+        if self.response_cache is None:
+            return send_function()
+
+        return self.response_cache.request(method=method, url=url, data=data, send_function=send_function, vary=cache_vary)
+
+    def record_retry(self)->None:
+        """
+        Counts a request that is being retried
+
+        Returns None
+        """
+
+        self._stats.record_retry()
+
+        tag_stats = self._get_tag_stats()
+        if tag_stats is not None:
+            tag_stats.record_retry()
+
+        return None
+
+    def get_stats(self, tag:str=None)->dict:
+        """
+        Gets the request, retry, connection reuse and handshake time counters of the session
+        - `tag`: only count the requests made with this `request_tag`, connection, response cache and rate limiter counters are only kept for the whole session
+
+        Returns counters as a dictionary
+        """
+
+        if tag is None:
+            stats = self._stats.as_dict()
+            if self.response_cache is not None:
+                stats['response_cache'] = dict(self.response_cache.stats)
+            if self.rate_limiter is not None:
+                stats['rate_limiter'] = self.rate_limiter.get_stats()
+            return stats
+
+        with self._tag_stats_lock:
+            tag_stats = self._tag_stats.get(tag, _SessionStats())
+
+        stats = tag_stats.as_dict()
+
+        return {'request_count': stats['request_count'], 'bytes_received': stats['bytes_received'], 'retry_count': stats['retry_count']}
+
+    def close(self)->None:
+        self.session.close()
+
+        return None
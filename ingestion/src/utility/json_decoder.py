@@ -0,0 +1,137 @@
+import pandas as pd
+import numpy as np
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def loads(content:bytes):
+    """
+    Parses JSON with orjson when it is installed, falling back to the standard library
+    - `content`: the JSON document
+
+    Returns the parsed document
+    """
+
+    if orjson is not None:
+        return orjson.loads(content)
+
+    return json.loads(content)
+
+def dumps(value)->str:
+    """
+    Serialises a value to JSON with orjson when it is installed, falling back to the standard library
+    - `value`: the value to serialise
+
+    Returns the JSON document as string
+    """
+
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+
+    return json.dumps(value)
+
+class ProjectedDecoder():
+
+    def __init__(self, fields:dict, record_path:list, record_filter:dict=None, raw_column:str=None):
+        """
+        Decodes API responses straight into typed columns, only reading the declared fields
+        - `fields`: the projected columns, each with the dotted `path` of the field in a record and the pandas `dtype` of the column.
+          Columns named by their path are named by the schema registry as the same field flattened with json_normalize
+        - `record_path`: the keys leading from the document to the records, lists along the way are flattened
+        - `record_filter`: only keep records whose fields equal these values, e.g. `{'_type': 'PRODUCT'}`
+        - `raw_column`: the column holding the top-level fields that are not projected as JSON, None to drop them
+        """
+
+        self.fields = fields
+        self.record_path = record_path
+        self.record_filter = record_filter or {}
+        self.raw_column = raw_column
+
+        # Split the paths once rather than per record
+        self._field_paths = {column: tuple(field['path'].split('.')) for column, field in fields.items()}
+        self._field_dtypes = {column: field['dtype'] for column, field in fields.items()}
+        self._projected_keys = {path[0] for path in self._field_paths.values() if len(path) == 1}
+
+    def _get_records(self, document)->list:
+        """
+        Walks the record path of a document
+        - `document`: the parsed JSON document
+
+        Returns list of records
+        """
+
+        list_of_records = [document]
+
+        for key in self.record_path:
+            list_of_values = []
+            for record in list_of_records:
+                value = record.get(key) if isinstance(record, dict) else None
+                if isinstance(value, list):
+                    list_of_values.extend(value)
+                elif value is not None:
+                    list_of_values.append(value)
+            list_of_records = list_of_values
+
+        for key, value in self.record_filter.items():
+            list_of_records = [record for record in list_of_records if record.get(key) == value]
+
+        return list_of_records
+
+    def _get_column(self, list_of_records:list, path:tuple)->list:
+        if len(path) == 1:
+            key = path[0]
+            return [record.get(key) for record in list_of_records]
+
+        list_of_values = []
+        for record in list_of_records:
+            value = record
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            list_of_values.append(value)
+
+        return list_of_values
+
+    def _to_array(self, list_of_values:list, dtype:str):
+        # Nullable pandas types are only used where declared, they are slower to build than numpy arrays
+        if dtype in ('Int64', 'boolean', 'string'):
+            return pd.array(list_of_values, dtype=dtype)
+
+        # fromiter keeps nested lists as single values rather than adding a dimension
+        if dtype == 'object':
+            return np.fromiter(list_of_values, dtype=object, count=len(list_of_values))
+
+        # numpy converts None to NaN for floats
+        return np.array(list_of_values, dtype=dtype)
+
+    def decode(self, content:bytes)->pd.DataFrame:
+        """
+        Decodes a response into a dataframe with one typed column per projected field
+        - `content`: the raw response body
+
+        Returns dataframe of records
+        """
+
+        return self.decode_document(loads(content))
+
+    def decode_document(self, document)->pd.DataFrame:
+        """
+        Decodes a parsed response into a dataframe with one typed column per projected field
+        - `document`: the parsed JSON document
+
+        Returns dataframe of records
+        """
+
+        list_of_records = self._get_records(document)
+
+        columns = {column: self._to_array(self._get_column(list_of_records, path), dtype=self._field_dtypes[column]) for column, path in self._field_paths.items()}
+
+        if self.raw_column is not None:
+            columns[self.raw_column] = self._to_array([
+                dumps({key: value for key, value in record.items() if key not in self._projected_keys})
+                for record in list_of_records
+            ], dtype='object')
+
+        return pd.DataFrame(columns)
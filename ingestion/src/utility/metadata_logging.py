@@ -1,13 +1,21 @@
 from sqlalchemy.schema import CreateSchema
-from sqlalchemy import Table, Column, Integer, String, MetaData, JSON
+from sqlalchemy import Table, Column, Integer, BigInteger, Float, String, DateTime, MetaData, JSON
 from sqlalchemy import insert, select, func
 import datetime as dt 
+import threading
 import logging
 
+# Tables already created in this process, keyed by database url, schema and table name
+_table_cache = {}
+_table_cache_lock = threading.Lock()
+
 class MetadataLogging():
 
-    def __init__(self, engine):
+    def __init__(self, engine, metrics_batch_size:int=500):
         self.engine = engine
+        self.metrics_batch_size = metrics_batch_size
+        self._metrics_buffer = {}
+        self._metrics_lock = threading.Lock()
     
     def _create_schema(self, engine, schema_name:str)->None:
         """
@@ -26,23 +34,63 @@ class MetadataLogging():
         
         return None
     
+    def _get_table(self, schema_name:str, table_name:str, table_definition)->Table:
+        """
+        Gets a table, creating the schema and table only the first time it is used in the process
+        - `schema_name`: database schema
+        - `table_name`: the table
+        - `table_definition`: function returning the list of columns of the table
+
+        Returns the table
+        """
+
+        cache_key = (str(self.engine.url), schema_name, table_name)
+
+        with _table_cache_lock:
+            if cache_key not in _table_cache:
+                self._create_schema(engine=self.engine, schema_name=schema_name)
+
+                meta = MetaData()
+                target_table = Table(table_name, meta, *table_definition(), schema=schema_name)
+                meta.create_all(self.engine)
+
+                _table_cache[cache_key] = target_table
+
+            return _table_cache[cache_key]
+
     def _create_logging_table(self, schema_name:str, table_name:str)->Table:
         
-        self._create_schema(engine=self.engine, schema_name=schema_name)
-        
-        meta = MetaData()
-        target_table = Table(
-            table_name, 
-            meta,
-            Column("run_timestamp", String, primary_key=True),
-            Column("run_id", Integer, primary_key=True),
-            Column("run_status", String, primary_key=True),
-            Column("run_config", JSON),
-            Column("run_log", String),
-            schema=schema_name
+        return self._get_table(
+            schema_name=schema_name,
+            table_name=table_name,
+            table_definition=lambda: [
+                Column("run_timestamp", String, primary_key=True),
+                Column("run_id", Integer, primary_key=True),
+                Column("run_status", String, primary_key=True),
+                Column("run_config", JSON),
+                Column("run_log", String)
+            ]
+        )
+
+    def _create_metrics_table(self, schema_name:str, table_name:str)->Table:
+
+        return self._get_table(
+            schema_name=schema_name,
+            table_name=table_name,
+            table_definition=lambda: [
+                Column("run_id", Integer, index=True),
+                Column("retailer", String),
+                Column("stage", String),
+                Column("category", String),
+                Column("duration_seconds", Float),
+                Column("request_count", Integer),
+                Column("bytes_downloaded", BigInteger),
+                Column("rows_parsed", Integer),
+                Column("rows_loaded", Integer),
+                Column("retry_count", Integer),
+                Column("recorded_at", DateTime)
+            ]
         )
-        meta.create_all(self.engine)
-        return target_table 
     
     def get_latest_run_id(self, schema_name:str, table_name:str)->int:
         target_table = self._create_logging_table(schema_name=schema_name, table_name=table_name)
@@ -58,6 +106,49 @@ class MetadataLogging():
         else: 
             return response + 1 
 
+    def get_resumable_run_id(self, schema_name:str, table_name:str, max_age_hours:float=None, max_resumes:int=None)->int:
+        """
+        Gets the latest run when it did not complete, so it can be resumed from its checkpoints
+        - `schema_name`: database schema of the log table
+        - `table_name`: the log table
+        - `max_age_hours`: the hours after the run first started that it is no longer resumed, its pages would be loaded as current
+        - `max_resumes`: the times the run is resumed, a run failing every time is given up on
+
+        Returns the run id, None when the latest run completed, is beyond the limits or there are no runs
+        """
+
+        target_table = self._create_logging_table(schema_name=schema_name, table_name=table_name)
+        latest_run_id = select(func.max(target_table.c.run_id)).scalar_subquery()
+        statement = (
+            select(target_table.c.run_id, target_table.c.run_status, target_table.c.run_timestamp)
+            .where(target_table.c.run_id == latest_run_id)
+            .order_by(target_table.c.run_timestamp.desc())
+        )
+
+        with self.engine.connect() as conn:
+            list_of_rows = conn.execute(statement).all()
+
+        # A run killed before it could log its status is still "Started"
+        if not list_of_rows or list_of_rows[0].run_status == 'Completed':
+            return None
+
+        run_id = list_of_rows[0].run_id
+        # Each attempt logs its start, the first is not a resume
+        resume_count = sum(1 for row in list_of_rows if row.run_status == 'Started') - 1
+        # The timestamps are stored as text
+        started_at = dt.datetime.fromisoformat(min(str(row.run_timestamp) for row in list_of_rows))
+        age_hours = (dt.datetime.now() - started_at).total_seconds() / 3600
+
+        if max_resumes is not None and resume_count >= max_resumes:
+            logging.info(f'Not resuming run [{run_id}], it was already resumed [{resume_count}] times')
+            return None
+
+        if max_age_hours is not None and age_hours > max_age_hours:
+            logging.info(f'Not resuming run [{run_id}], it started [{age_hours:.1f}] hours ago')
+            return None
+
+        return run_id
+
     def log(
         self,
         run_timestamp: dt.datetime,
@@ -81,4 +172,77 @@ class MetadataLogging():
             conn.execute(insert_statement)
             conn.commit()
 
-        return True 
\ No newline at end of file
+        return True
+
+    def record_metric(
+        self,
+        run_id: int,
+        retailer: str,
+        stage: str,
+        schema_name: str,
+        table_name: str,
+        category: str=None,
+        duration_seconds: float=None,
+        request_count: int=None,
+        bytes_downloaded: int=None,
+        rows_parsed: int=None,
+        rows_loaded: int=None,
+        retry_count: int=None,
+    )->None:
+        """
+        Buffers a metric row of a stage, or of a category within a stage, and writes the buffer once it is full
+        - `run_id`: the run the metric belongs to
+        - `retailer`: the retailer
+        - `stage`: the pipeline stage e.g. `extract` or `load`
+        - `schema_name`: database schema of the metrics table
+        - `table_name`: the metrics table
+        - `category`: the category, None for the whole stage
+
+        Returns None
+        """
+
+        metric = {
+            'run_id': run_id,
+            'retailer': retailer,
+            'stage': stage,
+            'category': category,
+            'duration_seconds': duration_seconds,
+            'request_count': request_count,
+            'bytes_downloaded': bytes_downloaded,
+            'rows_parsed': rows_parsed,
+            'rows_loaded': rows_loaded,
+            'retry_count': retry_count,
+            'recorded_at': dt.datetime.now()
+        }
+
+        with self._metrics_lock:
+            list_of_metrics = self._metrics_buffer.setdefault((schema_name, table_name), [])
+            list_of_metrics.append(metric)
+            is_full = len(list_of_metrics) >= self.metrics_batch_size
+
+        if is_full:
+            self.flush_metrics()
+
+        return None
+
+    def flush_metrics(self)->None:
+        """
+        Writes the buffered metric rows to their metrics tables, one batch insert per table
+
+        Returns None
+        """
+
+        with self._metrics_lock:
+            metrics_buffer = self._metrics_buffer
+            self._metrics_buffer = {}
+
+        for (schema_name, table_name), list_of_metrics in metrics_buffer.items():
+            target_table = self._create_metrics_table(schema_name=schema_name, table_name=table_name)
+
+            with self.engine.connect() as conn:
+                conn.execute(insert(target_table), list_of_metrics)
+                conn.commit()
+
+            logging.info(f'Wrote [{len(list_of_metrics)}] metrics to table [{table_name}]')
+
+        return None
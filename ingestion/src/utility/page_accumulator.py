@@ -0,0 +1,65 @@
+import pandas as pd
+import resource
+import logging
+import time
+
+class PageAccumulator():
+
+    def __init__(self, name:str):
+        self.name = name
+        self.stats = {}
+        self._list_of_page_df = []
+        self._row_count = 0
+        self._buffered_bytes = 0
+        self._start_time = time.perf_counter()
+
+    def add(self, page_df:pd.DataFrame)->None:
+        """
+        Collects a parsed page, the category frame is only built once in `to_frame`
+        - `page_df`: the dataframe of a page
+
+        Returns None
+        """
+
+        if not page_df.empty:
+            self._list_of_page_df.append(page_df)
+            self._row_count += len(page_df)
+            self._buffered_bytes += int(page_df.memory_usage(index=True, deep=False).sum())
+
+        return None
+
+    def to_frame(self)->pd.DataFrame:
+        """
+        Builds the category frame from the collected pages with a single concat and reports the time and memory it took
+
+        Returns a dataframe of all pages
+        """
+
+        build_start_time = time.perf_counter()
+
+        product_df = pd.DataFrame()
+
+        if self._list_of_page_df:
+            product_df = pd.concat(self._list_of_page_df, axis = 0)
+
+        build_seconds = time.perf_counter() - build_start_time
+        frame_bytes = int(product_df.memory_usage(index=True, deep=False).sum())
+
+        self.stats = {
+            'pages': len(self._list_of_page_df),
+            'rows': self._row_count,
+            'build_seconds': round(build_seconds, 3),
+            'elapsed_seconds': round(time.perf_counter() - self._start_time, 3),
+            # Pages and the built frame are both held while concatenating
+            'peak_frame_mb': round((self._buffered_bytes + frame_bytes) / 1024 ** 2, 2),
+            # ru_maxrss is reported in kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2)
+        }
+
+        logging.info(f'Built category [{self.name}] frame {self.stats}')
+
+        # Release the pages, the frame now owns the data
+        self._list_of_page_df = []
+        self._buffered_bytes = 0
+
+        return product_df
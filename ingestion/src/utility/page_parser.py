@@ -0,0 +1,99 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from utility.json_decoder import ProjectedDecoder, loads
+import multiprocessing
+import threading
+import pandas as pd
+import functools
+import logging
+import os
+
+def parse_page(content:bytes, decoder:ProjectedDecoder=None, record_path:list=None, record_filter:dict=None, count_path:list=None)->tuple:
+    """
+    Parses a product page, run in a worker process so it must stay a module-level function
+    - `content`: the raw response body, None for a failed request
+    - `decoder`: the projected decoder, None to flatten every field with json_normalize
+    - `record_path`: the keys leading from the document to the records list, the last key is the records list passed to json_normalize
+    - `record_filter`: only keep records whose fields equal these values, e.g. `{'_type': 'PRODUCT'}`
+    - `count_path`: the keys leading from the document to the record count of the category, None when the count is not needed
+
+    Returns tuple of the dataframe of records and the record count, 0 for a failed request and None when no count path is given
+    """
+
+    record_count = 0 if count_path is not None else None
+
+    if content is None:
+        return pd.DataFrame(), record_count
+
+    # Parsed once for both the count and the records
+    document = loads(content)
+
+    if count_path is not None:
+        record_count = functools.reduce(lambda value, key: value[key], count_path, document)
+
+    if decoder is not None:
+        return decoder.decode_document(document), record_count
+
+    records = functools.reduce(lambda value, key: value[key], record_path[:-1], document)
+    products_df = pd.json_normalize(records, record_path[-1])
+
+    for key, value in (record_filter or {}).items():
+        products_df = products_df[products_df[key] == value]
+
+    return products_df, record_count
+
+class PageParser():
+
+    def __init__(self, max_workers:int=None, decoder:ProjectedDecoder=None, record_path:list=None, record_filter:dict=None):
+        """
+        Parses product pages on a process pool, so parsing uses every core and does not hold up the threads fetching the pages
+        - `max_workers`: the worker processes, 0 to parse on the calling thread, None for one per core besides the core fetching the pages
+        - `decoder`: the projected decoder, None to flatten every field with json_normalize
+        - `record_path`: the keys leading from the document to the records list when flattening with json_normalize
+        - `record_filter`: only keep records whose fields equal these values when flattening with json_normalize
+        """
+
+        # On a single core the workers only add their start up and the pickling of pages
+        self.max_workers = max_workers if max_workers is not None else max((os.cpu_count() or 1) - 1, 0)
+        self.decoder = decoder
+        self.record_path = record_path
+        self.record_filter = record_filter
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, content:bytes, count_path:list=None)->Future:
+        """
+        Starts parsing a page
+        - `content`: the raw response body, None for a failed request
+        - `count_path`: the keys leading from the document to the record count of the category, None when the count is not needed
+
+        Returns future of the tuple returned by `parse_page`
+        """
+
+        function = functools.partial(parse_page, content, decoder=self.decoder, record_path=self.record_path, record_filter=self.record_filter, count_path=count_path)
+
+        if self.max_workers == 0 or content is None:
+            future = Future()
+            future.set_result(function())
+            return future
+
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned rather than forked, forking while the fetch threads hold locks can deadlock the workers
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+                logging.info(f'Started [{self.max_workers}] page parser processes')
+
+            return self._executor.submit(function)
+
+    def close(self)->None:
+        """
+        Stops the worker processes, they are started again by the next `submit`
+
+        Returns None
+        """
+
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+        return None
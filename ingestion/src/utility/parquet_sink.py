@@ -0,0 +1,232 @@
+from urllib.parse import quote
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow as pa
+import pandas as pd
+import datetime as dt
+import threading
+import logging
+import json
+import time
+import os
+
+# The partition fields of a snapshot, in directory order
+PARTITION_SCHEMA = pa.schema([('retailer', pa.string()), ('snapshot_date', pa.date32()), ('category', pa.string())])
+
+class ParquetSink():
+
+    def __init__(self, df:pd.DataFrame, root_dir:str, dataset_name:str, retailer:str, snapshot_date:dt.date=None, compression:str='zstd', compression_level:int=None, row_group_size:int=100000):
+        """
+        Writes a category frame as a Parquet snapshot, partitioned as `retailer=/snapshot_date=/category=` under the dataset directory.
+        A category written again on the same date replaces its snapshot
+        - `df`: the category dataframe
+        - `root_dir`: the directory of the datasets
+        - `dataset_name`: the dataset the frame belongs to, e.g. `products`
+        - `retailer`: the retailer
+        - `snapshot_date`: the snapshot date, today when None
+        - `compression`: the Parquet compression codec
+        - `compression_level`: the codec level, the codec default when None
+        - `row_group_size`: the rows per row group, each row group keeps min/max statistics of its columns for filtering
+        """
+
+        self.df = df
+        self.root_dir = root_dir
+        self.dataset_name = dataset_name
+        self.retailer = retailer
+        self.category = df.attrs.get('name')
+        self.snapshot_date = snapshot_date if snapshot_date is not None else dt.date.today()
+        self.compression = compression
+        self.compression_level = compression_level
+        self.row_group_size = row_group_size
+        self.metrics = {}
+
+    def __repr__(self)->str:
+        return f'ParquetSink({self.dataset_name}[{self.retailer}/{self.snapshot_date}/{self.category}])'
+
+    def _get_partition_dir(self)->str:
+        # Category names come from the API, they are encoded as the reader decodes them
+        return os.path.join(
+            self.root_dir,
+            self.dataset_name,
+            f'retailer={quote(self.retailer, safe="")}',
+            f'snapshot_date={self.snapshot_date.isoformat()}',
+            f'category={quote(self.category, safe="")}'
+        )
+
+    def _to_table(self, df:pd.DataFrame)->pa.Table:
+        """
+        Converts a dataframe to an Arrow table, with nested lists/dicts written as JSON as in the database load
+        - `df`: pandas dataframe
+
+        Returns Arrow table
+        """
+
+        df = df.copy(deep=False)
+
+        for column in df.columns[df.dtypes == object]:
+            is_nested = df[column].map(lambda value: isinstance(value, (list, dict)))
+            if is_nested.any():
+                df[column] = df[column].mask(is_nested, df[column][is_nested].map(json.dumps))
+
+        list_of_arrays = []
+        for column in df.columns:
+            try:
+                list_of_arrays.append(pa.array(df[column], from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                # Columns mixing numbers and strings are kept as strings
+                list_of_arrays.append(pa.array(df[column].astype('string'), from_pandas=True))
+
+        return pa.Table.from_arrays(list_of_arrays, names=[str(column) for column in df.columns])
+
+    def run(self):
+        """
+        Run Parquet write
+        """
+
+        start_time = time.perf_counter()
+
+        table = self._to_table(self.df)
+
+        partition_dir = self._get_partition_dir()
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, 'part-0.parquet')
+
+        # Written through a temporary file, so readers never see a partial snapshot. Files starting with a dot are not read as part of the dataset
+        temporary_path = os.path.join(partition_dir, f'.part-0.parquet.{threading.get_ident()}.tmp')
+        pq.write_table(table, temporary_path, compression=self.compression, compression_level=self.compression_level, row_group_size=self.row_group_size, write_statistics=True)
+        os.replace(temporary_path, path)
+
+        file_bytes = os.path.getsize(path)
+        logging.info(f'Wrote Parquet snapshot [{path}]: rows [{table.num_rows}], bytes [{file_bytes}]')
+
+        self.metrics = {
+            'stage': 'parquet',
+            'category': self.category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'rows_loaded': table.num_rows
+        }
+
+class ParquetReader():
+
+    def __init__(self, root_dir:str, dataset_name:str):
+        """
+        Scans the Parquet snapshots of a dataset without loading them into the database. Files are memory mapped, and the partition
+        and row group statistics filters skip the files and row groups that cannot match
+        - `root_dir`: the directory of the datasets
+        - `dataset_name`: the dataset to read, e.g. `products`
+        """
+
+        self.root_dir = root_dir
+        self.dataset_name = dataset_name
+
+    def get_dataset(self)->ds.Dataset:
+        """
+        Gets the dataset of all snapshots, with the columns of every snapshot so columns added by later runs are read as null from older ones
+
+        Returns Arrow dataset
+        """
+
+        dataset_dir = os.path.join(self.root_dir, self.dataset_name)
+        filesystem = pafs.LocalFileSystem(use_mmap=True)
+        partitioning = ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+
+        dataset = ds.dataset(dataset_dir, format='parquet', partitioning=partitioning, filesystem=filesystem)
+        # The schema is otherwise taken from the first file only, columns the schema registry widened since are read as the wider type
+        schema = self._unify_schemas([fragment.physical_schema for fragment in dataset.get_fragments()])
+
+        return ds.dataset(dataset_dir, format='parquet', partitioning=partitioning, filesystem=filesystem, schema=schema)
+
+    def _unify_schemas(self, list_of_schemas:list)->pa.Schema:
+        """
+        Unifies the schemas of the snapshot files, promoting each column to the widest of its types. A column whose types cannot be
+        promoted to one another, e.g. a numeric column widened to object by the schema registry and written as strings since, is read as strings
+        - `list_of_schemas`: the physical schemas of the files
+
+        Returns Arrow schema of the columns followed by the partition fields
+        """
+
+        try:
+            return pa.unify_schemas(list_of_schemas + [PARTITION_SCHEMA], promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            pass
+
+        list_of_fields = []
+        # Columns in the order they are first seen, as `unify_schemas` orders them
+        for name in dict.fromkeys(name for schema in list_of_schemas for name in schema.names):
+            list_of_column_schemas = [pa.schema([schema.field(name)]) for schema in list_of_schemas if name in schema.names]
+            try:
+                list_of_fields.append(pa.unify_schemas(list_of_column_schemas, promote_options='permissive').field(name))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                logging.info(f'Reading column [{name}] of dataset [{self.dataset_name}] as string, its snapshots have incompatible types')
+                list_of_fields.append(pa.field(name, pa.string()))
+
+        return pa.schema(list_of_fields + list(PARTITION_SCHEMA))
+
+    def _create_filter(self, retailer:str=None, start_date:dt.date=None, end_date:dt.date=None, categories:list=None, column_filter:ds.Expression=None)->ds.Expression:
+        """
+        Creates the scan filter from the partitions to read and a column filter
+        - `retailer`: the retailer, all retailers when None
+        - `start_date`: the first snapshot date, inclusive
+        - `end_date`: the last snapshot date, inclusive
+        - `categories`: the categories, all categories when None
+        - `column_filter`: a filter on the columns, e.g. `ds.field('Price') < 2`
+
+        Returns Arrow expression, None when nothing is filtered
+        """
+
+        list_of_expressions = []
+
+        if retailer is not None:
+            list_of_expressions.append(ds.field('retailer') == retailer)
+        if start_date is not None:
+            list_of_expressions.append(ds.field('snapshot_date') >= pa.scalar(start_date, type=pa.date32()))
+        if end_date is not None:
+            list_of_expressions.append(ds.field('snapshot_date') <= pa.scalar(end_date, type=pa.date32()))
+        if categories is not None:
+            list_of_expressions.append(ds.field('category').isin(categories))
+        if column_filter is not None:
+            list_of_expressions.append(column_filter)
+
+        expression = None
+        for partial_expression in list_of_expressions:
+            expression = partial_expression if expression is None else expression & partial_expression
+
+        return expression
+
+    def read(self, columns:list=None, retailer:str=None, start_date:dt.date=None, end_date:dt.date=None, categories:list=None, column_filter:ds.Expression=None)->pd.DataFrame:
+        """
+        Reads the matching rows of the snapshots into a dataframe
+        - `columns`: the columns to read, all columns when None
+        - `retailer`: the retailer, all retailers when None
+        - `start_date`: the first snapshot date, inclusive
+        - `end_date`: the last snapshot date, inclusive
+        - `categories`: the categories, all categories when None
+        - `column_filter`: a filter on the columns, e.g. `ds.field('Price') < 2`
+
+        Returns dataframe of the matching rows
+        """
+
+        expression = self._create_filter(retailer=retailer, start_date=start_date, end_date=end_date, categories=categories, column_filter=column_filter)
+
+        return self.get_dataset().to_table(columns=columns, filter=expression).to_pandas()
+
+    def iter_batches(self, columns:list=None, retailer:str=None, start_date:dt.date=None, end_date:dt.date=None, categories:list=None, column_filter:ds.Expression=None, batch_size:int=100000):
+        """
+        Reads the matching rows of the snapshots a batch at a time, so backfills over many snapshots hold one batch in memory
+        - `columns`: the columns to read, all columns when None
+        - `retailer`: the retailer, all retailers when None
+        - `start_date`: the first snapshot date, inclusive
+        - `end_date`: the last snapshot date, inclusive
+        - `categories`: the categories, all categories when None
+        - `column_filter`: a filter on the columns, e.g. `ds.field('Price') < 2`
+        - `batch_size`: the maximum rows per batch
+
+        Returns a generator of dataframes
+        """
+
+        expression = self._create_filter(retailer=retailer, start_date=start_date, end_date=end_date, categories=categories, column_filter=column_filter)
+
+        for record_batch in self.get_dataset().to_batches(columns=columns, filter=expression, batch_size=batch_size):
+            if record_batch.num_rows > 0:
+                yield record_batch.to_pandas()
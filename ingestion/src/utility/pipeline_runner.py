@@ -0,0 +1,161 @@
+from graphlib import TopologicalSorter
+from utility.dag_executor import DagExecutor
+from utility.parquet_sink import ParquetSink
+from utility.price_history import PriceHistory
+from utility.request_planner import RequestPlanner
+import datetime as dt
+import time
+import logging
+
+def create_request_planner(config:dict)->RequestPlanner:
+    """
+    Creates the request planner of a retailer
+    - `config`: the retailer config
+
+    Returns the request planner, None when it is not enabled
+    """
+
+    if not config['request_planner']['enabled']:
+        return None
+
+    # Unchanged categories are skipped, except where every category is needed in each run: partition loads and Parquet snapshots
+    # write a snapshot per day, and with the response cache on the cached first pages are always unchanged
+    return RequestPlanner(
+        state_path=config['request_planner']['state_path'],
+        skip_unchanged=config['load']['load_method'] != 'partition' and not config['parquet']['enabled'] and config['extract']['cache_mode'] == 'off',
+        max_state_age_hours=config['request_planner']['max_state_age_hours']
+    )
+
+def run_load_stages(config:dict, target_engine, extract_object, load_class, get_load_target, iterate_stream, create_transform_node=None, checkpoint=None, request_planner=None)->list:
+    """
+    Runs the extract of a retailer and the stages after it: transform, load, price history and Parquet snapshots.
+    In stream mode each category is processed as it is extracted, otherwise the categories are extracted first and run as a DAG.
+    Once every category is loaded, the checkpoints of the run are cleared and the request plan is saved
+    - `config`: the retailer config
+    - `target_engine`: connection engine to the target database
+    - `extract_object`: the retailer extract, with `run()`, `metrics` and `list_of_complete_categories`
+    - `load_class`: the retailer load node class
+    - `get_load_target`: function called with `df`, `load_method` and `partition_table_name`, returning the table and load method of a category frame
+    - `iterate_stream`: function called with `queue_depth`, returning an iterable of the category frames as they are extracted
+    - `create_transform_node`: function called with `df` returning the node transforming a category frame in place, None when there is no transform
+    - `checkpoint`: the checkpoint of the run, cleared once the run is loaded
+    - `request_planner`: the request planner, saved once the run is loaded
+
+    Returns list of extract, transform and load metrics
+    """
+
+    schema_name=config['extract']['schema_name']
+    load_method=config['load']['load_method']
+    primary_key=config['load']['primary_key']
+    stream=config['load']['stream']
+    stream_queue_depth=config['load']['stream_queue_depth']
+    max_workers=config['load']['max_workers']
+    partition_table_name=config['load']['partition_table_name']
+    price_history_enabled=config['price_history']['enabled']
+    price_history_table_name=config['price_history']['table_name']
+    price_columns=config['price_history']['price_columns']
+    parquet_enabled=config['parquet']['enabled']
+    parquet_root_dir=config['parquet']['root_dir']
+    parquet_compression=config['parquet']['compression']
+    parquet_compression_level=config['parquet']['compression_level']
+    parquet_row_group_size=config['parquet']['row_group_size']
+
+    # Every category of the run is loaded into the same snapshot, and its prices are valid from the same time
+    snapshot_date = dt.date.today()
+    run_timestamp = dt.datetime.now()
+
+    list_of_transform_nodes = []
+    list_of_load_nodes = []
+    list_of_price_history_nodes = []
+    list_of_parquet_nodes = []
+    # The nodes reading each category, run after its transform
+    dependencies = {}
+
+    def create_nodes(df)->list:
+        transform_node = create_transform_node(df=df) if create_transform_node is not None else None
+        if transform_node is not None:
+            list_of_transform_nodes.append(transform_node)
+
+        table_name, df_load_method = get_load_target(df=df, load_method=load_method, partition_table_name=partition_table_name)
+        list_of_nodes = [load_class(df=df, engine=target_engine, schema_name=schema_name, table_name=table_name, load_method=df_load_method, chunksize=2500, primary_key=primary_key, snapshot_date=snapshot_date)]
+        list_of_load_nodes.append(list_of_nodes[0])
+
+        # Prices are compared independently of the load. Frames of another kind, e.g. store overrides keyed by store and product,
+        # are not tracked
+        if price_history_enabled and df.attrs.get('kind') is None:
+            price_history_node = PriceHistory(df=df, engine=target_engine, schema_name=schema_name, table_name=price_history_table_name, primary_key=primary_key, price_columns=price_columns, run_timestamp=run_timestamp)
+            list_of_price_history_nodes.append(price_history_node)
+            list_of_nodes.append(price_history_node)
+
+        # Snapshots are written alongside the database load, frames of another kind have their own columns so they are kept in their own dataset
+        if parquet_enabled:
+            parquet_node = ParquetSink(df=df, root_dir=parquet_root_dir, dataset_name=df.attrs.get('kind', 'products'), retailer=schema_name, snapshot_date=snapshot_date, compression=parquet_compression, compression_level=parquet_compression_level, row_group_size=parquet_row_group_size)
+            list_of_parquet_nodes.append(parquet_node)
+            list_of_nodes.append(parquet_node)
+
+        for node in list_of_nodes:
+            dependencies[node] = [transform_node] if transform_node is not None else []
+
+        return [transform_node] + list_of_nodes if transform_node is not None else list_of_nodes
+
+    # In stream mode the load overlaps the extract
+    load_start_time = time.perf_counter()
+
+    if stream:
+        logging.info("Running extract and load as a stream")
+        # Extract runs in the background while each category is transformed and loaded
+        for df in iterate_stream(queue_depth=stream_queue_depth):
+            for node in create_nodes(df):
+                node.run()
+                # Only the metrics are kept, the dataframe is released
+                node.df = None
+
+    else:
+        list_of_product_df = extract_object.run()
+        load_start_time = time.perf_counter()
+
+        # Loop through list of product df and create the nodes of each category
+        for df in list_of_product_df:
+            create_nodes(df)
+
+        # Build dag
+        dag = TopologicalSorter()
+
+        logging.info("Adding DAG nodes")
+        # Adding load nodes after their transform
+        for node, list_of_dependencies in dependencies.items():
+            dag.add(node, *list_of_dependencies)
+
+        logging.info("Executing DAG")
+        # Run dag, loading independent nodes in parallel
+        dag_executor = DagExecutor(max_workers=max_workers)
+        node_timings = dag_executor.run(dag)
+
+        for node, seconds in node_timings.items():
+            logging.info(f"Node [{node!r}] run time [{seconds:.2f}] seconds")
+
+    # Metrics per category and per stage
+    list_of_metrics = extract_object.metrics + [node.metrics for node in list_of_transform_nodes + list_of_load_nodes + list_of_price_history_nodes + list_of_parquet_nodes]
+    list_of_metrics.append({
+        'stage': 'load',
+        'category': None,
+        'duration_seconds': round(time.perf_counter() - load_start_time, 3),
+        'rows_loaded': sum(load_node.metrics['rows_loaded'] for load_node in list_of_load_nodes)
+    })
+
+    # Products that are no longer listed in the categories of the run have their prices closed, only in categories without failed pages
+    # as the products of a failed page are missing without being delisted
+    list_of_complete_categories = [price_history_node.category for price_history_node in list_of_price_history_nodes if price_history_node.category in extract_object.list_of_complete_categories]
+    if price_history_enabled and list_of_complete_categories:
+        price_history = PriceHistory(df=None, engine=target_engine, schema_name=schema_name, table_name=price_history_table_name, primary_key=primary_key, price_columns=price_columns, run_timestamp=run_timestamp)
+        price_history.close_delisted(list_of_categories=list_of_complete_categories)
+
+    # The run is loaded, it will not be resumed
+    if checkpoint is not None:
+        checkpoint.clear()
+
+    # The categories of the run are loaded, the next run can skip them if unchanged
+    if request_planner is not None:
+        request_planner.save()
+
+    return list_of_metrics
@@ -0,0 +1,246 @@
+from sqlalchemy.schema import CreateSchema
+from sqlalchemy import text
+from database.postgres import copy_from_buffer
+from io import StringIO
+import datetime as dt
+import pandas as pd
+import logging
+import time
+
+class PriceHistory():
+
+    def __init__(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, primary_key:str, price_columns:list, run_timestamp:dt.datetime=None):
+        """
+        Keeps one row per product per price change, valid from the run it was first seen in until the run it changed in
+        - `df`: the extracted products, None to only read the history or close delisted products
+        - `engine`: connection engine to database
+        - `schema_name`: database schema
+        - `table_name`: the price history table
+        - `primary_key`: the column identifying a product
+        - `price_columns`: the columns whose changes are tracked
+        - `run_timestamp`: the time of the run, shared by all categories of the run, None to only read the history
+        """
+
+        self.df = df
+        self.engine = engine
+        self.schema_name = schema_name
+        self.table_name = table_name
+        self.primary_key = primary_key
+        self.price_columns = price_columns
+        self.run_timestamp = run_timestamp
+        self.category = df.attrs.get('name') if df is not None else None
+        self.metrics = {}
+
+    def __repr__(self)->str:
+        return f'PriceHistory({self.schema_name}.{self.table_name}[{self.category}])'
+
+    def _quote(self, identifier:str)->str:
+        return '"' + str(identifier).replace('"', '""') + '"'
+
+    def _get_column_types(self, conn, table_name:str)->dict:
+        """
+        Gets the columns of the price history table with their formatted types
+        - `conn`: connection to database
+        - `table_name`: the table
+
+        Returns dictionary of column name to type, in column order
+        """
+
+        statement = text("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema_name AND c.relname = :table_name AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+        """)
+
+        return dict(conn.execute(statement, {'schema_name': self.schema_name, 'table_name': table_name}).all())
+
+    def _create_table(self, conn, staging_columns:dict)->dict:
+        """
+        Creates the price history table and its indexes if they do not exist
+        - `conn`: connection to database
+        - `staging_columns`: the staging table columns with their types
+
+        Returns dictionary of the price history column names to types
+        """
+
+        conn.execute(CreateSchema(self.schema_name, if_not_exists=True))
+
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+        key = self._quote(self.primary_key)
+        column_list = ', '.join(f'{self._quote(column)} {column_type}' for column, column_type in staging_columns.items())
+
+        conn.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {target} ({column_list}, "valid_from" timestamp NOT NULL, "valid_to" timestamp, "category" text, "seen_at" timestamp)')
+        # Tables created before products were tracked by category
+        conn.exec_driver_sql(f'ALTER TABLE {target} ADD COLUMN IF NOT EXISTS "category" text, ADD COLUMN IF NOT EXISTS "seen_at" timestamp')
+        # One current price per product, also used to find the current prices to compare against
+        conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self._quote(f"{self.table_name}_current_key")} ON {target} ({key}) WHERE "valid_to" IS NULL')
+        # The history of a product, and its price at a point in time
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {self._quote(f"{self.table_name}_key_valid_from_idx")} ON {target} ({key}, "valid_from")')
+        # The current prices of a category, to close those of products no longer listed
+        conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {self._quote(f"{self.table_name}_current_category_idx")} ON {target} ("category") WHERE "valid_to" IS NULL')
+
+        return self._get_column_types(conn=conn, table_name=self.table_name)
+
+    def _update_history(self, df:pd.DataFrame)->tuple:
+        """
+        Copies the prices into a temporary table and compares them with the current prices in bulk.
+        Current rows whose prices changed are closed and new current rows are added for changed and new products.
+        The current rows of the products are marked as seen in the category by the run
+        - `df`: the product keys and prices
+
+        Returns tuple of rows added and rows closed
+        """
+
+        staging_table_name = f'{self.table_name}_staging'
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+        staging = self._quote(staging_table_name)
+        key = self._quote(self.primary_key)
+
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
+
+        column_list = ', '.join(self._quote(column) for column in df.columns)
+
+        with self.engine.begin() as conn:
+            # Session local, so categories can be compared in parallel, and dropped with the transaction
+            create_statement = pd.io.sql.get_schema(df, staging_table_name, con=conn)
+            conn.exec_driver_sql(create_statement.replace('CREATE TABLE', 'CREATE TEMPORARY TABLE', 1) + ' ON COMMIT DROP')
+
+            cursor = conn.connection.cursor()
+            copy_from_buffer(cursor=cursor, statement=f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer=buffer)
+            cursor.close()
+
+            staging_columns = conn.execute(text("""
+                SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+                FROM pg_attribute a
+                WHERE a.attrelid = CAST(:table_name AS regclass) AND a.attnum > 0 AND NOT a.attisdropped
+                ORDER BY a.attnum
+            """), {'table_name': staging}).all()
+
+            # Products in several categories are compared by one category at a time
+            conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:lock_name))'), {'lock_name': f'{self.schema_name}.{self.table_name}'})
+
+            target_columns = self._get_column_types(conn=conn, table_name=self.table_name)
+            if 'seen_at' not in target_columns:
+                target_columns = self._create_table(conn=conn, staging_columns=dict(staging_columns))
+
+            target_prices = ', '.join(f'h.{self._quote(column)}' for column in self.price_columns)
+            staging_prices = ', '.join(f's.{self._quote(column)}::{target_columns[column]}' for column in self.price_columns)
+
+            close_result = conn.execute(text(f"""
+                UPDATE {target} AS h SET "valid_to" = :run_timestamp
+                FROM {staging} AS s
+                WHERE h.{key} = s.{key}::{target_columns[self.primary_key]} AND h."valid_to" IS NULL
+                AND ({target_prices}) IS DISTINCT FROM ({staging_prices})
+            """), {'run_timestamp': self.run_timestamp})
+
+            # Changed products no longer have a current row, so they are added along with new products
+            insert_result = conn.execute(text(f"""
+                INSERT INTO {target} ({column_list}, "valid_from", "category", "seen_at")
+                SELECT s.{key}::{target_columns[self.primary_key]}, {staging_prices}, :run_timestamp, :category, :run_timestamp
+                FROM {staging} AS s
+                WHERE NOT EXISTS (SELECT 1 FROM {target} AS h WHERE h.{key} = s.{key}::{target_columns[self.primary_key]} AND h."valid_to" IS NULL)
+            """), {'run_timestamp': self.run_timestamp, 'category': self.category})
+
+            # Unchanged products are still listed, products in several categories are kept by the first category of the run listing them
+            conn.execute(text(f"""
+                UPDATE {target} AS h SET "category" = :category, "seen_at" = :run_timestamp
+                FROM {staging} AS s
+                WHERE h.{key} = s.{key}::{target_columns[self.primary_key]} AND h."valid_to" IS NULL
+                AND h."seen_at" IS DISTINCT FROM :run_timestamp
+            """), {'run_timestamp': self.run_timestamp, 'category': self.category})
+
+        return insert_result.rowcount, close_result.rowcount
+
+    def close_delisted(self, list_of_categories:list)->int:
+        """
+        Closes the current prices of the products no longer listed, those last seen in one of the categories but not seen by the run.
+        Only the categories the run paged in full without failed pages can be passed, the products of skipped categories and failed pages were not seen
+        - `list_of_categories`: the categories paged in full without failed pages by the run
+
+        Returns rows closed
+        """
+
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+
+        with self.engine.begin() as conn:
+            conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:lock_name))'), {'lock_name': f'{self.schema_name}.{self.table_name}'})
+
+            if 'seen_at' not in self._get_column_types(conn=conn, table_name=self.table_name):
+                return 0
+
+            close_result = conn.execute(text(f"""
+                UPDATE {target} SET "valid_to" = :run_timestamp
+                WHERE "valid_to" IS NULL AND "category" = ANY(:categories) AND "seen_at" < :run_timestamp
+            """), {'run_timestamp': self.run_timestamp, 'categories': list(list_of_categories)})
+
+        logging.info(f'Price history [{self.table_name}]: closed prices of [{close_result.rowcount}] delisted products in [{len(list_of_categories)}] categories')
+
+        return close_result.rowcount
+
+    def get_price_at(self, product_key, at:dt.datetime)->dict:
+        """
+        Gets the prices of a product at a point in time
+        - `product_key`: the product's primary key value
+        - `at`: the point in time
+
+        Returns dictionary of price columns, or None when the product had no price then
+        """
+
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+        key = self._quote(self.primary_key)
+
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f"""
+                SELECT * FROM {target}
+                WHERE {key} = :product_key AND "valid_from" <= :at
+                ORDER BY "valid_from" DESC LIMIT 1
+            """), {'product_key': product_key, 'at': at}).mappings().first()
+
+        if row is None or (row['valid_to'] is not None and row['valid_to'] <= at):
+            return None
+
+        return dict(row)
+
+    def get_history(self, product_key)->pd.DataFrame:
+        """
+        Gets the price history of a product
+        - `product_key`: the product's primary key value
+
+        Returns dataframe of prices with their validity, oldest first
+        """
+
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+        key = self._quote(self.primary_key)
+
+        with self.engine.connect() as conn:
+            result = conn.execute(text(f'SELECT * FROM {target} WHERE {key} = :product_key ORDER BY "valid_from"'), {'product_key': product_key})
+            history_df = pd.DataFrame(result.all(), columns=list(result.keys()))
+
+        return history_df
+
+    def run(self):
+        """
+        Run price history update
+        """
+
+        start_time = time.perf_counter()
+
+        # A key can only have one current price
+        price_df = self.df.reindex(columns=[self.primary_key] + self.price_columns)
+        price_df = price_df[price_df[self.primary_key].notna()].drop_duplicates(subset=[self.primary_key], keep='last')
+
+        rows_added, rows_closed = self._update_history(df=price_df)
+
+        logging.info(f'Price history [{self.table_name}] of [{self.category}]: products [{len(price_df)}], prices added [{rows_added}], prices closed [{rows_closed}]')
+
+        self.metrics = {
+            'stage': 'price_history',
+            'category': self.category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'rows_loaded': rows_added
+        }
@@ -0,0 +1,300 @@
+from sqlalchemy.schema import CreateSchema
+from sqlalchemy import text
+from database.postgres import copy_from_buffer
+from collections import defaultdict
+from io import StringIO
+import datetime as dt
+import pandas as pd
+import numpy as np
+import logging
+import time
+
+# Sizes are blocked on in grams, millilitres or count, so "1kg" and "1000g" fall in the same block
+SIZE_UNITS = {
+    'g': ('g', 1), 'gm': ('g', 1), 'kg': ('g', 1000),
+    'ml': ('ml', 1), 'l': ('ml', 1000), 'lt': ('ml', 1000),
+    'ea': ('ea', 1), 'each': ('ea', 1), 'pk': ('ea', 1), 'pack': ('ea', 1)
+}
+SIZE_PATTERN = r'(?P<quantity>\d+(?:\.\d+)?)\s*(?P<unit>kg|gm|g|ml|lt|l|each|ea|pk|pack)\b'
+MATCH_COLUMNS = ['left_key', 'right_key', 'match_method', 'score', 'matched_at', 'left_hash', 'right_hash']
+# The product fields a match is made on, a match is made again when any of them changes
+MATCH_INPUTS = ['barcode', 'brand', 'name', 'size']
+
+class ProductMatching():
+
+    def __init__(self, engine, left:dict, right:dict, schema_name:str, table_name:str, min_score:float=0.6):
+        """
+        Matches the products of two retailers, first on barcode and then on brand, size and name, keeping the matches in a table
+        - `engine`: connection engine to database
+        - `left`: the first retailer, with its `name`, `schema_name`, `load_method`, `partition_table_name` and the product `columns`
+        (`key`, `barcode`, `brand`, `name`, `size`, None when the retailer does not have the field)
+        - `right`: the second retailer, as `left`
+        - `schema_name`: database schema of the match table
+        - `table_name`: the match table
+        - `min_score`: the lowest name similarity, from 0 to 1, kept as a match
+        """
+
+        self.name = 'matching'
+        self.engine = engine
+        self.left = left
+        self.right = right
+        self.schema_name = schema_name
+        self.table_name = table_name
+        self.min_score = min_score
+        self.metrics = []
+
+    def __repr__(self)->str:
+        return f"ProductMatching({self.left['name']}, {self.right['name']})"
+
+    def _quote(self, identifier:str)->str:
+        return '"' + str(identifier).replace('"', '""') + '"'
+
+    def _read_products(self, conn, retailer:dict)->pd.DataFrame:
+        """
+        Reads the latest products of a retailer, from the partitioned table or from the category tables
+        - `conn`: connection to database
+        - `retailer`: the retailer
+
+        Returns dataframe with one row per product and the columns `key`, `barcode`, `brand`, `name` and `size`
+        """
+
+        columns = {field: column for field, column in retailer['columns'].items() if column is not None}
+        # Keys and barcodes are compared as text, cast by the database so a key stored as a float reads `2000008` rather than `2000008.0`
+        column_list = ', '.join(
+            f'{self._quote(column)}::text AS {field}' if field in ('key', 'barcode') else f'{self._quote(column)} AS {field}'
+            for field, column in columns.items()
+        )
+        schema = self._quote(retailer['schema_name'])
+
+        if retailer['load_method'] == 'partition':
+            table = f"{schema}.{self._quote(retailer['partition_table_name'])}"
+            product_df = pd.DataFrame(conn.execute(text(f'SELECT {column_list} FROM {table} WHERE "snapshot_date" = (SELECT max("snapshot_date") FROM {table})')).mappings().all())
+        else:
+            # Category tables that do not have every column, e.g. of an older layout, are skipped
+            list_of_tables = conn.execute(text("""
+                SELECT table_name FROM information_schema.columns
+                WHERE table_schema = :schema_name AND table_name LIKE 'raw\\_%Products' AND column_name = ANY(:column_names)
+                GROUP BY table_name HAVING count(*) = :column_count
+            """), {'schema_name': retailer['schema_name'], 'column_names': list(columns.values()), 'column_count': len(columns)}).scalars().all()
+
+            if not list_of_tables:
+                return pd.DataFrame(columns=['key', 'barcode', 'brand', 'name', 'size'])
+
+            statement = ' UNION ALL '.join(f'SELECT {column_list} FROM {schema}.{self._quote(table)}' for table in list_of_tables)
+            product_df = pd.DataFrame(conn.execute(text(statement)).mappings().all())
+
+        product_df = product_df.reindex(columns=['key', 'barcode', 'brand', 'name', 'size'])
+        # Products are listed in each of their categories
+        product_df = product_df[product_df['key'].notna()]
+        product_df['key'] = product_df['key'].astype(str)
+
+        return product_df.drop_duplicates(subset=['key']).reset_index(drop=True)
+
+    def _hash_inputs(self, product_df:pd.DataFrame)->pd.Series:
+        """
+        Hashes the fields each product is matched on
+        - `product_df`: the products
+
+        Returns series of hashes as signed 64 bit integers
+        """
+
+        # Nullable so the hashes of products that are not found stay exact rather than becoming floats
+        return pd.Series(pd.util.hash_pandas_object(product_df[MATCH_INPUTS].astype('string'), index=False).values.view('int64'), index=product_df.index, dtype='Int64')
+
+    def _get_invalid_matches(self, existing_df:pd.DataFrame, left_df:pd.DataFrame, right_df:pd.DataFrame)->pd.Series:
+        """
+        Finds the matches whose products are no longer listed or whose match fields changed since they were matched
+        - `existing_df`: the matches with the `left_hash` and `right_hash` they were made on
+        - `left_df`: the products of the first retailer with their `inputs_hash`
+        - `right_df`: the products of the second retailer with their `inputs_hash`
+
+        Returns boolean series aligned to the matches, True for the matches to make again
+        """
+
+        is_invalid = pd.Series(False, index=existing_df.index)
+
+        for side, product_df in (('left', left_df), ('right', right_df)):
+            # A retailer without any products was not read rather than delisted everything
+            if product_df.empty:
+                continue
+
+            current_hash = existing_df[f'{side}_key'].map(product_df.set_index('key')['inputs_hash'])
+            # Matches made before the hashes were kept have none, they are made again once
+            is_invalid |= (current_hash != existing_df[f'{side}_hash']).fillna(True).astype(bool)
+
+        return is_invalid
+
+    def _normalise(self, product_df:pd.DataFrame)->pd.DataFrame:
+        """
+        Adds the normalised barcode, brand, size and name tokens the products are matched on
+        - `product_df`: the products
+
+        Returns dataframe of products with the `barcode_norm`, `block` and `tokens` columns
+        """
+
+        # GTINs are padded to different lengths by different retailers
+        product_df['barcode_norm'] = product_df['barcode'].astype('string').str.replace(r'\D', '', regex=True).str.lstrip('0').replace('', pd.NA)
+
+        brand = product_df['brand'].astype('string').str.lower().str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+
+        size_parts = product_df['size'].astype('string').str.lower().str.extract(SIZE_PATTERN)
+        quantity = pd.to_numeric(size_parts['quantity'], errors='coerce')
+        unit = size_parts['unit'].map({unit_name: size_unit[0] for unit_name, size_unit in SIZE_UNITS.items()})
+        factor = size_parts['unit'].map({unit_name: size_unit[1] for unit_name, size_unit in SIZE_UNITS.items()}).astype('float64')
+        size = (quantity * factor).round(3).astype('string').str.replace(r'\.0$', '', regex=True) + unit.astype('string')
+
+        product_df['block'] = brand.fillna('') + '|' + size.fillna('')
+
+        # Brand and size words are left out of the name, one retailer has them in the name and the other does not
+        name = product_df['name'].astype('string').str.lower().str.replace(SIZE_PATTERN, ' ', regex=True).str.replace(r'[^a-z0-9]+', ' ', regex=True)
+        list_of_brand_tokens = brand.fillna('').str.split().tolist()
+        product_df['tokens'] = [
+            frozenset(token for token in tokens if token not in brand_tokens) if isinstance(tokens, list) else frozenset()
+            for tokens, brand_tokens in zip(name.str.split().tolist(), map(set, list_of_brand_tokens))
+        ]
+
+        return product_df
+
+    def _match_barcodes(self, left_df:pd.DataFrame, right_df:pd.DataFrame)->pd.DataFrame:
+        """
+        Matches products with the same barcode through a hash join
+        - `left_df`: the normalised products of the first retailer
+        - `right_df`: the normalised products of the second retailer
+
+        Returns dataframe of matches
+        """
+
+        left_barcodes = left_df.loc[left_df['barcode_norm'].notna(), ['key', 'barcode_norm']]
+        right_barcodes = right_df.loc[right_df['barcode_norm'].notna(), ['key', 'barcode_norm']]
+
+        match_df = left_barcodes.merge(right_barcodes, on='barcode_norm', suffixes=('_left', '_right'))
+        match_df = match_df.drop_duplicates(subset=['key_left']).drop_duplicates(subset=['key_right'])
+
+        return pd.DataFrame({'left_key': match_df['key_left'], 'right_key': match_df['key_right'], 'match_method': 'barcode', 'score': 1.0})
+
+    def _match_names(self, left_df:pd.DataFrame, right_df:pd.DataFrame)->pd.DataFrame:
+        """
+        Matches products of the same brand and size on the Jaccard similarity of their name tokens.
+        Candidates are found through an inverted index of the tokens within each block, so only products sharing a token are scored
+        - `left_df`: the normalised products of the first retailer
+        - `right_df`: the normalised products of the second retailer
+
+        Returns dataframe of matches, each product matched at most once
+        """
+
+        # Products without a brand or a size are not blocked tightly enough to be matched on name
+        left_df = left_df[~left_df['block'].str.startswith('|') & ~left_df['block'].str.endswith('|')]
+        right_df = right_df[right_df['block'].isin(set(left_df['block']))]
+
+        inverted_index = defaultdict(list)
+        for position, (block, tokens) in enumerate(zip(right_df['block'], right_df['tokens'])):
+            for token in tokens:
+                inverted_index[(block, token)].append(position)
+
+        right_sizes = np.fromiter((len(tokens) for tokens in right_df['tokens']), dtype=np.int64, count=len(right_df))
+
+        list_of_candidates = []
+        for left_key, block, tokens in zip(left_df['key'], left_df['block'], left_df['tokens']):
+            shared_counts = defaultdict(int)
+            for token in tokens:
+                for position in inverted_index.get((block, token), ()):
+                    shared_counts[position] += 1
+
+            for position, shared_count in shared_counts.items():
+                score = shared_count / (len(tokens) + right_sizes[position] - shared_count)
+                if score >= self.min_score:
+                    list_of_candidates.append((left_key, position, score))
+
+        candidate_df = pd.DataFrame(list_of_candidates, columns=['left_key', 'position', 'score'])
+        candidate_df['right_key'] = right_df['key'].to_numpy()[candidate_df['position'].to_numpy(dtype=np.int64)]
+
+        # Best scores first, so each product keeps its closest match
+        candidate_df = candidate_df.sort_values(['score', 'left_key', 'right_key'], ascending=[False, True, True], kind='stable')
+        list_of_matches = []
+        matched_left, matched_right = set(), set()
+        for left_key, right_key, score in zip(candidate_df['left_key'], candidate_df['right_key'], candidate_df['score']):
+            if left_key in matched_left or right_key in matched_right:
+                continue
+            matched_left.add(left_key)
+            matched_right.add(right_key)
+            list_of_matches.append((left_key, right_key, 'name', round(score, 4)))
+
+        return pd.DataFrame(list_of_matches, columns=['left_key', 'right_key', 'match_method', 'score'])
+
+    def _create_table(self, conn)->None:
+        """
+        Creates the match table, a product is matched to at most one product of the other retailer
+        - `conn`: connection to database
+
+        Returns None
+        """
+
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+
+        conn.execute(CreateSchema(self.schema_name, if_not_exists=True))
+        conn.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {target} ("left_key" text NOT NULL, "right_key" text NOT NULL, "match_method" text NOT NULL, "score" double precision, "matched_at" timestamp NOT NULL, "left_hash" bigint, "right_hash" bigint)')
+        # Tables created before the match fields were hashed
+        conn.exec_driver_sql(f'ALTER TABLE {target} ADD COLUMN IF NOT EXISTS "left_hash" bigint, ADD COLUMN IF NOT EXISTS "right_hash" bigint')
+        conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self._quote(f"{self.table_name}_left_key_idx")} ON {target} ("left_key")')
+        conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self._quote(f"{self.table_name}_right_key_idx")} ON {target} ("right_key")')
+
+        return None
+
+    def run(self):
+        """
+        Run product matching, only products that are not matched yet are matched and added to the match table.
+        Matches whose products are no longer listed or whose match fields changed are removed first, so their products are matched again
+        """
+
+        start_time = time.perf_counter()
+        target = f'{self._quote(self.schema_name)}.{self._quote(self.table_name)}'
+
+        with self.engine.begin() as conn:
+            self._create_table(conn=conn)
+            # One run matches at a time
+            conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:lock_name))'), {'lock_name': f'{self.schema_name}.{self.table_name}'})
+
+            existing_df = pd.DataFrame(conn.execute(text(f'SELECT "left_key", "right_key", "left_hash", "right_hash" FROM {target}')).all(), columns=['left_key', 'right_key', 'left_hash', 'right_hash'], dtype='object')
+            existing_df = existing_df.astype({'left_hash': 'Int64', 'right_hash': 'Int64'})
+
+            left_df = self._read_products(conn=conn, retailer=self.left)
+            right_df = self._read_products(conn=conn, retailer=self.right)
+            left_df['inputs_hash'] = self._hash_inputs(left_df)
+            right_df['inputs_hash'] = self._hash_inputs(right_df)
+
+            is_invalid = self._get_invalid_matches(existing_df=existing_df, left_df=left_df, right_df=right_df)
+            if is_invalid.any():
+                conn.execute(text(f'DELETE FROM {target} WHERE "left_key" = ANY(:left_keys)'), {'left_keys': existing_df.loc[is_invalid, 'left_key'].tolist()})
+            existing_df = existing_df[~is_invalid]
+
+            left_df = self._normalise(left_df[~left_df['key'].isin(existing_df['left_key'])].copy())
+            right_df = self._normalise(right_df[~right_df['key'].isin(existing_df['right_key'])].copy())
+
+            barcode_match_df = self._match_barcodes(left_df=left_df, right_df=right_df)
+            name_match_df = self._match_names(
+                left_df=left_df[~left_df['key'].isin(barcode_match_df['left_key'])],
+                right_df=right_df[~right_df['key'].isin(barcode_match_df['right_key'])]
+            )
+
+            match_df = pd.concat([barcode_match_df, name_match_df], ignore_index=True)
+            match_df['matched_at'] = dt.datetime.now()
+            match_df['left_hash'] = match_df['left_key'].map(left_df.set_index('key')['inputs_hash'])
+            match_df['right_hash'] = match_df['right_key'].map(right_df.set_index('key')['inputs_hash'])
+
+            buffer = StringIO()
+            match_df[MATCH_COLUMNS].to_csv(buffer, index=False, header=False)
+            buffer.seek(0)
+
+            cursor = conn.connection.cursor()
+            copy_from_buffer(cursor=cursor, statement=f'COPY {target} ({", ".join(self._quote(column) for column in MATCH_COLUMNS)}) FROM STDIN WITH (FORMAT csv)', buffer=buffer)
+            cursor.close()
+
+        logging.info(f'Matched [{self.left["name"]}] and [{self.right["name"]}]: unmatched products [{len(left_df)}] and [{len(right_df)}], barcode matches [{len(barcode_match_df)}], name matches [{len(name_match_df)}], existing matches [{len(existing_df)}], invalidated matches [{int(is_invalid.sum())}]')
+
+        self.metrics = [{
+            'stage': 'matching',
+            'category': None,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'rows_parsed': len(left_df) + len(right_df),
+            'rows_loaded': len(match_df)
+        }]
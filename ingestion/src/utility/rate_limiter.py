@@ -0,0 +1,172 @@
+from urllib.parse import urlparse
+import threading
+import logging
+import random
+import time
+
+class _HostBucket():
+
+    def __init__(self, rate:float, burst:int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.decreased_at = 0.0
+        self.throttled_count = 0
+        self.wait_seconds = 0.0
+
+    def refill(self, now:float)->None:
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+class RateLimiter():
+
+    def __init__(
+        self,
+        initial_rate:float=8.0,
+        min_rate:float=0.5,
+        max_rate:float=32.0,
+        burst:int=4,
+        increase_step:float=1.0,
+        decrease_factor:float=0.5,
+        error_decrease_factor:float=0.9,
+        latency_target_seconds:float=2.0,
+        max_retries:int=4,
+        backoff_base_seconds:float=0.5,
+        backoff_max_seconds:float=30.0,
+        throttle_statuses:tuple=(403, 429),
+        retry_statuses:tuple=(429, 500, 502, 503, 504)
+    ):
+        """
+        Token bucket per host whose rate adapts to the responses: it grows additively while responses are fast and successful,
+        and is cut multiplicatively when the host throttles, errors or slows down, at most once a second
+        - `initial_rate`: the requests per second a host starts at
+        - `min_rate`: the lowest requests per second
+        - `max_rate`: the highest requests per second
+        - `burst`: the requests that can be sent at once after an idle period
+        - `increase_step`: the requests per second the rate grows by for each second of successful responses
+        - `decrease_factor`: the factor the rate is multiplied by when the host throttles
+        - `error_decrease_factor`: the factor the rate is multiplied by on server errors, connection errors and slow responses, which
+        are often not caused by the request rate
+        - `latency_target_seconds`: responses slower than this count as the host slowing down
+        - `max_retries`: the retries of a request that failed with a retry status or a connection error
+        - `backoff_base_seconds`: the backoff of the first retry, doubled for each further retry
+        - `backoff_max_seconds`: the longest backoff
+        - `throttle_statuses`: the status codes of a host asking for fewer requests
+        - `retry_statuses`: the status codes that are retried
+        """
+
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.error_decrease_factor = error_decrease_factor
+        self.latency_target_seconds = latency_target_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.throttle_statuses = tuple(throttle_statuses)
+        self.retry_statuses = tuple(retry_statuses)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, url:str)->_HostBucket:
+        host = urlparse(url).netloc
+
+        if host not in self._buckets:
+            self._buckets[host] = _HostBucket(rate=self.initial_rate, burst=self.burst)
+
+        return self._buckets[host]
+
+    def acquire(self, url:str)->float:
+        """
+        Waits until the host of the URL has a token for the request
+        - `url`: the request URL
+
+        Returns the seconds waited
+        """
+
+        waited_seconds = 0.0
+
+        while True:
+            with self._lock:
+                bucket = self._get_bucket(url)
+                bucket.refill(now=time.monotonic())
+
+                if bucket.tokens >= 1:
+                    bucket.tokens -= 1
+                    bucket.wait_seconds += waited_seconds
+                    return waited_seconds
+
+                wait_seconds = (1 - bucket.tokens) / bucket.rate
+
+            # Sleep outside the lock so requests to other hosts are not held up
+            time.sleep(wait_seconds)
+            waited_seconds += wait_seconds
+
+    def record(self, url:str, status_code:int, latency_seconds:float)->None:
+        """
+        Adapts the rate of the host of the URL to a response
+        - `url`: the request URL
+        - `status_code`: the response status code, None for a connection error
+        - `latency_seconds`: the time the response took
+
+        Returns None
+        """
+
+        with self._lock:
+            bucket = self._get_bucket(url)
+            now = time.monotonic()
+
+            is_throttled = status_code in self.throttle_statuses
+            is_error = status_code is None or status_code >= 500 or latency_seconds > self.latency_target_seconds
+
+            if is_throttled or is_error:
+                # Responses to requests already in flight when the rate was cut do not cut it again
+                if now - bucket.decreased_at >= 1:
+                    old_rate = bucket.rate
+                    bucket.rate = max(self.min_rate, bucket.rate * (self.decrease_factor if is_throttled else self.error_decrease_factor))
+                    bucket.decreased_at = now
+                    logging.info(f'Rate of host [{urlparse(url).netloc}] cut from [{old_rate:.2f}] to [{bucket.rate:.2f}] requests/sec on status [{status_code}] latency [{latency_seconds:.2f}]')
+
+                if is_throttled:
+                    bucket.throttled_count += 1
+                    # Stop any burst the host is rejecting
+                    bucket.tokens = min(bucket.tokens, 0.0)
+
+            elif status_code < 400:
+                # A rate's worth of responses per second grows the rate by increase_step per second
+                bucket.rate = min(self.max_rate, bucket.rate + self.increase_step / bucket.rate)
+
+        return None
+
+    def get_backoff(self, attempt:int, retry_after:str=None)->float:
+        """
+        Gets the time to wait before a retry, with full jitter so retries of concurrent requests spread out
+        - `attempt`: the retry number, starting at 0
+        - `retry_after`: the Retry-After header of the response, in seconds, used when it is longer
+
+        Returns the backoff in seconds
+        """
+
+        backoff_seconds = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+        if retry_after is not None and retry_after.strip().isdigit():
+            backoff_seconds = max(backoff_seconds, min(float(retry_after), self.backoff_max_seconds))
+
+        return backoff_seconds
+
+    def get_stats(self)->dict:
+        """
+        Gets the current rate, throttled responses and time waited of each host
+
+        Returns dictionary of host to counters
+        """
+
+        with self._lock:
+            return {
+                host: {'rate': round(bucket.rate, 2), 'throttled_count': bucket.throttled_count, 'wait_seconds': round(bucket.wait_seconds, 3)}
+                for host, bucket in self._buckets.items()
+            }
@@ -0,0 +1,118 @@
+import threading
+import hashlib
+import logging
+import json
+import time
+import os
+
+class RequestPlanner():
+
+    def __init__(self, state_path:str=None, skip_unchanged:bool=True, max_state_age_hours:float=168):
+        """
+        Remembers the record count and first page fingerprint of each category, so a category whose first page is unchanged since the
+        previous run is not paged again. A changed first page is the usual sign of a changed category, but changes further down go unseen,
+        so each category is paged in full at least every `max_state_age_hours`
+        - `state_path`: the JSON file the state is persisted to, None to keep it in memory only
+        - `skip_unchanged`: skip the categories that are unchanged, when False the state is only recorded
+        - `max_state_age_hours`: the hours after which a category is paged in full even when unchanged
+        """
+
+        self.state_path = state_path
+        self.skip_unchanged = skip_unchanged
+        self.max_state_age_hours = max_state_age_hours
+        self.stats = {'categories_skipped': 0, 'pages_skipped': 0}
+        self._categories = {}
+        self._updated_categories = {}
+        self._lock = threading.Lock()
+
+        self._read()
+
+    def _read(self)->None:
+        """
+        Loads the state of the previous runs from the state file
+
+        Returns None
+        """
+
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return None
+
+        with open(self.state_path) as state_file:
+            self._categories = json.load(state_file)['categories']
+
+        return None
+
+    def get_fingerprint(self, content:bytes)->str:
+        """
+        Gets the fingerprint of a response, any change to the response changes it
+        - `content`: the response body
+
+        Returns the fingerprint as a hex string
+        """
+
+        return hashlib.sha1(content).hexdigest()
+
+    def is_unchanged(self, category:str, record_count:int, fingerprint:str, page_count:int)->bool:
+        """
+        Checks whether a category can be skipped, when its record count and first page match the last time it was paged in full
+        - `category`: the category name
+        - `record_count`: the record count of the first page
+        - `fingerprint`: the fingerprint of the first page
+        - `page_count`: the pages in the category, counted as skipped when it is unchanged
+
+        Returns True when the category is unchanged
+        """
+
+        state = self._categories.get(category)
+
+        if not self.skip_unchanged or state is None or fingerprint is None:
+            return False
+
+        if time.time() - state['paged_at'] > self.max_state_age_hours * 3600:
+            return False
+
+        if state['record_count'] != record_count or state['fingerprint'] != fingerprint:
+            return False
+
+        with self._lock:
+            self.stats['categories_skipped'] += 1
+            # The first page was requested to find out
+            self.stats['pages_skipped'] += max(page_count - 1, 0)
+
+        return True
+
+    def update(self, category:str, record_count:int, fingerprint:str)->None:
+        """
+        Records the state of a category paged in full, kept until `save` so a run that fails to load does not skip the category next time
+        - `category`: the category name
+        - `record_count`: the record count of the first page
+        - `fingerprint`: the fingerprint of the first page
+
+        Returns None
+        """
+
+        with self._lock:
+            self._updated_categories[category] = {'record_count': record_count, 'fingerprint': fingerprint, 'paged_at': time.time()}
+
+        return None
+
+    def save(self)->None:
+        """
+        Writes the state of the categories paged in full to the state file, once the run is loaded
+
+        Returns None
+        """
+
+        with self._lock:
+            self._categories.update(self._updated_categories)
+            self._updated_categories = {}
+
+            if self.state_path is not None:
+                temporary_path = f'{self.state_path}.tmp'
+                with open(temporary_path, 'w') as state_file:
+                    json.dump({'categories': self._categories}, state_file, indent=2)
+                os.replace(temporary_path, self.state_path)
+
+        logging.info(f'Request planner state saved, stats {self.stats}')
+
+        return None
@@ -0,0 +1,157 @@
+from requests.structures import CaseInsensitiveDict
+import threading
+import requests
+import hashlib
+import logging
+import json
+import gzip
+import os
+
+class ResponseCache():
+
+    def __init__(self, cache_dir:str, mode:str='off'):
+        """
+        On-disk cache of raw API responses
+        - `cache_dir`: the directory holding the cached responses
+        - `mode`: `off` sends every request, `record` serves cached responses and caches the rest,
+          `replay` only serves cached responses without touching the network, `refresh` sends every request and re-caches it
+        """
+
+        if mode not in ('off', 'record', 'replay', 'refresh'):
+            raise ValueError(f'Unknown response cache mode [{mode}]')
+
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+    def _get_key(self, method:str, url:str, data:str=None, vary:str=None)->str:
+        """
+        Creates the cache key of a request, JSON payloads are canonicalised so key order does not matter
+        - `method`: the HTTP method
+        - `url`: the request URL
+        - `data`: the request body
+        - `vary`: a value the response depends on besides the request, e.g. the store a cookie selects
+
+        Returns the key as a sha256 hex digest
+        """
+
+        payload = data or ''
+
+        try:
+            payload = json.dumps(json.loads(payload), sort_keys=True, separators=(',', ':'))
+        except ValueError:
+            pass
+
+        key = f'{method.upper()}\n{url}\n{payload}'
+        # Keys of requests without a vary value are unchanged, so existing caches still replay
+        if vary is not None:
+            key = f'{key}\n{vary}'
+
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _get_path(self, key:str)->str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.gz')
+
+    def _count(self, name:str)->None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _read(self, key:str)->requests.Response:
+        """
+        Reads a cached response
+        - `key`: the cache key
+
+        Returns the response, or None when it is not cached
+        """
+
+        path = self._get_path(key)
+
+        if not os.path.exists(path):
+            return None
+
+        with gzip.open(path, 'rb') as cache_file:
+            header = json.loads(cache_file.readline())
+            content = cache_file.read()
+
+        response = requests.Response()
+        response.status_code = header['status_code']
+        response.headers = CaseInsensitiveDict(header['headers'])
+        response.url = header['url']
+        response.encoding = header['encoding']
+        response._content = content
+
+        return response
+
+    def _write(self, key:str, response:requests.Response)->None:
+        """
+        Writes a response to the cache as a JSON header line followed by the body, gzip compressed
+        - `key`: the cache key
+        - `response`: the response
+
+        Returns None
+        """
+
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        header = {
+            'status_code': response.status_code,
+            'url': response.url,
+            'encoding': response.encoding,
+            # The body is stored decompressed, so content encoding headers no longer apply
+            'headers': {name: value for name, value in response.headers.items() if name.lower() == 'content-type'}
+        }
+
+        # Write to a temporary file first so a concurrent reader never sees a partial file
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with gzip.open(temporary_path, 'wb') as cache_file:
+            cache_file.write(json.dumps(header).encode('utf-8') + b'\n')
+            cache_file.write(response.content)
+        os.replace(temporary_path, path)
+
+        self._count('writes')
+
+        return None
+
+    def request(self, method:str, url:str, data:str, send_function, vary:str=None)->requests.Response:
+        """
+        Serves a request from the cache or sends it, depending on the mode
+        - `method`: the HTTP method
+        - `url`: the request URL
+        - `data`: the request body
+        - `send_function`: function sending the request over the network
+        - `vary`: a value the response depends on besides the request, part of the cache key
+
+        Returns the response
+        """
+
+        if self.mode == 'off':
+            return send_function()
+
+        key = self._get_key(method=method, url=url, data=data, vary=vary)
+
+        if self.mode in ('record', 'replay'):
+            response = self._read(key)
+
+            if response is not None:
+                self._count('hits')
+                return response
+
+            self._count('misses')
+
+            if self.mode == 'replay':
+                logging.error(f'Response not in cache for [{method} {url}]')
+                response = requests.Response()
+                response.status_code = 504
+                response.url = url
+                response._content = b''
+                return response
+
+        response = send_function()
+
+        # Only successful responses are worth replaying
+        if response.status_code == 200:
+            self._write(key=key, response=response)
+
+        return response
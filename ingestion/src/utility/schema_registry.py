@@ -0,0 +1,153 @@
+import pandas as pd
+import threading
+import logging
+import json
+import os
+
+# Postgres truncates longer identifiers
+MAX_COLUMN_LENGTH = 63
+
+# The type a registered column is widened to when a value does not fit, object fits everything
+WIDER_DTYPES = {'boolean': 'object', 'Int64': 'float64', 'float64': 'object', 'string': 'object'}
+
+class SchemaRegistry():
+
+    def __init__(self, registry_path:str=None, name_function=None):
+        """
+        Maps source fields to stable column names and types, so every category frame has the same layout
+        - `registry_path`: the JSON file the registry is persisted to, None to keep it in memory only
+        - `name_function`: function creating the column name of a new source field, the source name is kept when None
+        """
+
+        self.registry_path = registry_path
+        self.name_function = name_function
+        self.list_of_fields = []
+        self._columns_by_source = {}
+        self._lock = threading.Lock()
+
+        self._read()
+
+    def _read(self)->None:
+        """
+        Loads the registered fields from the registry file
+
+        Returns None
+        """
+
+        if self.registry_path is None or not os.path.exists(self.registry_path):
+            return None
+
+        with open(self.registry_path) as registry_file:
+            self.list_of_fields = json.load(registry_file)['fields']
+
+        self._columns_by_source = {field['source']: field['column'] for field in self.list_of_fields}
+
+        return None
+
+    def _write(self)->None:
+        """
+        Writes the registered fields to the registry file
+
+        Returns None
+        """
+
+        if self.registry_path is None:
+            return None
+
+        temporary_path = f'{self.registry_path}.tmp'
+        with open(temporary_path, 'w') as registry_file:
+            json.dump({'fields': self.list_of_fields}, registry_file, indent=2)
+        os.replace(temporary_path, self.registry_path)
+
+        return None
+
+    def _get_dtype(self, series:pd.Series)->str:
+        """
+        Gets the registered type of a column, integers and booleans are nullable as other categories may not have the field
+        - `series`: the source column
+
+        Returns the pandas dtype as string
+        """
+
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return 'boolean'
+
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return 'Int64'
+
+        if pd.api.types.is_float_dtype(series.dtype):
+            return 'float64'
+
+        return 'object'
+
+    def _register(self, df:pd.DataFrame, list_of_sources:list)->None:
+        """
+        Registers new source fields, named once and appended after the registered columns
+        - `df`: the frame with the new fields
+        - `list_of_sources`: the new source fields
+
+        Returns None
+        """
+
+        used_columns = {field['column'] for field in self.list_of_fields}
+
+        for source in list_of_sources:
+            column = self.name_function(source) if self.name_function is not None else source
+            column = column[:MAX_COLUMN_LENGTH]
+
+            # Different fields can shorten to the same name
+            suffix = 1
+            while column in used_columns:
+                suffix += 1
+                column = f'{column[:MAX_COLUMN_LENGTH - len(str(suffix))]}{suffix}'
+
+            used_columns.add(column)
+            self.list_of_fields.append({'source': source, 'column': column, 'dtype': self._get_dtype(df[source])})
+            self._columns_by_source[source] = column
+
+        logging.info(f'Registered [{len(list_of_sources)}] new fields in schema registry [{self.registry_path}]')
+
+        return None
+
+    def conform(self, df:pd.DataFrame)->pd.DataFrame:
+        """
+        Renames, orders and types the columns of a frame to the registered layout, registering any new fields first.
+        Columns that are not in the frame are added empty. When a value does not fit the registered type, the type is widened
+        - `df`: the source frame
+
+        Returns the conformed frame
+        """
+
+        with self._lock:
+            list_of_sources = [source for source in df.columns if source not in self._columns_by_source]
+
+            # A source already named as a registered column is that field, e.g. a frame decoded straight into the registered names.
+            # Registering it again would add a suffixed duplicate of the column
+            for field in self.list_of_fields:
+                if field['column'] in list_of_sources and field['source'] not in df.columns:
+                    self._columns_by_source[field['column']] = field['column']
+                    list_of_sources.remove(field['column'])
+
+            is_changed = bool(list_of_sources)
+
+            if list_of_sources:
+                self._register(df=df, list_of_sources=list_of_sources)
+
+            df = df.rename(columns=self._columns_by_source).reindex(columns=[field['column'] for field in self.list_of_fields])
+
+            for field in self.list_of_fields:
+                column = field['column']
+
+                while str(df[column].dtype) != field['dtype']:
+                    try:
+                        df[column] = df[column].astype(field['dtype'])
+                    except (TypeError, ValueError):
+                        dtype = WIDER_DTYPES[field['dtype']]
+                        logging.info(f"Widening registered type of column [{column}] from [{field['dtype']}] to [{dtype}]")
+                        field['dtype'] = dtype
+                        is_changed = True
+
+            if is_changed:
+                self._write()
+
+        return df
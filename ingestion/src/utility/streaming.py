@@ -0,0 +1,80 @@
+import threading
+import queue
+
+class StreamClosed(Exception):
+    """
+    Raised in the producer when the consumer has stopped reading the stream
+    """
+
+class _Failure():
+
+    def __init__(self, exception:BaseException):
+        self.exception = exception
+
+_END = object()
+
+def stream_in_background(produce_function, queue_depth:int=2):
+    """
+    Runs a producer on a background thread and yields what it produces, holding at most `queue_depth` items in the queue.
+    The item the producer is blocked putting and the item the consumer holds come on top, up to `queue_depth` + 2 items in memory
+    - `produce_function`: function called with a `put` function, it calls `put(item)` for each item and blocks while the queue is full
+    - `queue_depth`: the maximum number of produced items waiting to be consumed
+
+    Returns a generator of the produced items
+    """
+
+    buffer = queue.Queue(maxsize=queue_depth)
+    closed = threading.Event()
+
+    def put(item)->None:
+        while True:
+            if closed.is_set():
+                raise StreamClosed()
+            try:
+                buffer.put(item, timeout=0.1)
+                return None
+            except queue.Full:
+                continue
+
+    def produce()->None:
+        try:
+            produce_function(put)
+            put(_END)
+        except StreamClosed:
+            pass
+        except BaseException as e:
+            try:
+                put(_Failure(e))
+            except StreamClosed:
+                pass
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                break
+            if isinstance(item, _Failure):
+                raise item.exception
+            yield item
+    finally:
+        # Unblocks the producer if the consumer stopped early
+        closed.set()
+        producer.join()
+
+def iterate_in_background(iterable, queue_depth:int=2):
+    """
+    Iterates `iterable` on a background thread so the consumer's work overlaps with producing the next items
+    - `iterable`: the iterable to consume
+    - `queue_depth`: the maximum number of items waiting to be consumed
+
+    Returns a generator of the items
+    """
+
+    def produce(put)->None:
+        for item in iterable:
+            put(item)
+
+    return stream_in_background(produce_function=produce, queue_depth=queue_depth)
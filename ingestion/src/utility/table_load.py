@@ -0,0 +1,534 @@
+from sqlalchemy.schema import CreateSchema
+from sqlalchemy import text, Date
+from database.postgres import copy_from_buffer
+from io import StringIO
+import pandas as pd
+import numpy as np
+import datetime as dt
+import hashlib
+import logging
+import json
+import time
+
+class TableLoad():
+
+    # Log messages of the load steps, set by each retailer and formatted with the values of the step
+    LOG_FORMATS = {}
+
+    def __init__(self, df:pd.DataFrame, engine:str, schema_name:str, table_name:str, load_method:str, chunksize:int=1000, primary_key:str=None, snapshot_date:dt.date=None):
+        """
+        Loads a category frame into a database table by overwrite, copy, merge on the primary key or a snapshot date partition swap
+        - `df`: the category dataframe
+        - `engine`: connection engine to database
+        - `schema_name`: database schema
+        - `table_name`: target table
+        - `load_method`: one of `overwrite`, `copy`, `merge` or `partition`
+        - `chunksize`: the rows inserted or copied at a time
+        - `primary_key`: the column identifying a product, required by merge
+        - `snapshot_date`: the snapshot date of partition loads, today when None
+        """
+
+        self.df=df
+        self.engine=engine
+        self.schema_name=schema_name
+        self.table_name=table_name
+        self.chunksize = chunksize
+        self.load_method = load_method
+        self.primary_key = primary_key
+        self.category = df.attrs.get('name')
+        # Partition loads of one run share a snapshot date
+        self.snapshot_date = snapshot_date if snapshot_date is not None else dt.date.today()
+        self.rows_loaded = 0
+        self.metrics = {}
+
+    def __repr__(self)->str:
+        if self.load_method == 'partition':
+            return f'Load({self.schema_name}.{self.table_name}[{self.category}])'
+
+        return f'Load({self.schema_name}.{self.table_name})'
+
+    def _log(self, step:str, **values)->None:
+        logging.info(self.LOG_FORMATS[step].format(**values))
+
+        return None
+
+    def _create_schema(self, engine, schema_name:str)->None:
+        """
+        Creates a database schema to group tables together
+        - `engine`: connection engine to database 
+        - `schema_name`: database schema  
+        
+        Returns None
+        """
+
+        with engine.connect() as conn:            
+            if not conn.dialect.has_schema(conn, schema_name):
+                # Load nodes run in parallel, another node may create the schema first
+                conn.execute(CreateSchema(schema_name, if_not_exists=True))
+                conn.commit()
+                logging.info(f'Schema [{schema_name}] created')            
+        
+        return None
+    
+    def _insert_in_chunks(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, chunksize:int=1000)->None:
+        """
+        Performs the insert with several rows at a time (i.e. a chunk of rows)
+        - `df`: pandas dataframe 
+        - `engine`: connection engine to database 
+        - `schema_name: database schema
+        - `table_name`: target table        
+        - `chunksize`: if chunksize greater than 0 is specified, then the rows will be inserted in the specified chunksize. e.g. 1000 rows at a time
+
+        Returns None
+        """
+
+        logging.info(f'Inserting into table [{table_name}]')
+
+        max_length = len(df)
+
+        for i in range(0, max_length, chunksize):
+            if i + chunksize >= max_length: 
+                lower_bound = i
+                upper_bound = max_length 
+            else: 
+                lower_bound = i 
+                upper_bound = i + chunksize
+
+            chunk_df = df.iloc[lower_bound:upper_bound]
+
+            if i == 0:
+                chunk_df.to_sql(name=table_name, con=engine, if_exists="replace", index=False, schema=schema_name)
+            else:
+                chunk_df.to_sql(name=table_name, con=engine, if_exists="append", index=False, schema=schema_name)
+            
+            self._log('insert_chunk', rows=len(chunk_df), lower_bound=lower_bound, upper_bound=upper_bound, max_length=max_length)
+
+        return None 
+
+    def _overwrite_to_database(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, chunksize:int=1000)->None:
+        """
+        Insert dataframe to a database table 
+        - `df`: pandas dataframe 
+        - `engine`: connection engine to database 
+        - `schema_name: database schema
+        - `table_name`: target table        
+        - `chunksize`: if chunksize greater than 0 is specified, then the rows will be inserted in the specified chunksize. e.g. 1000 rows at a time
+
+        Returns None
+        """
+
+        start_time = time.perf_counter()
+        self.rows_loaded = len(df)
+
+        if chunksize > 0:
+            self._insert_in_chunks(df=df, engine=engine, schema_name=schema_name, table_name=table_name, chunksize=chunksize)
+        else: 
+            df.to_sql(con=engine, schema=schema_name, name=table_name, if_exists="replace", index=False)
+        
+        self._log('overwrite', table_name=table_name, rows=len(df), rows_per_second=self._rows_per_second(df, start_time))
+
+        return None
+
+    def _rows_per_second(self, df:pd.DataFrame, start_time:float)->int:
+        elapsed_seconds = time.perf_counter() - start_time
+
+        return round(len(df) / elapsed_seconds) if elapsed_seconds > 0 else 0
+
+    def _encode_nested(self, df:pd.DataFrame)->pd.DataFrame:
+        """
+        Encodes nested lists/dicts as JSON, leaving other values as they are
+        - `df`: pandas dataframe 
+
+        Returns dataframe with nested values as JSON strings
+        """
+
+        df = df.copy(deep=False)
+
+        for column in df.columns[df.dtypes == object]:
+            is_nested = df[column].map(lambda value: isinstance(value, (list, dict)))
+            if is_nested.any():
+                df[column] = df[column].mask(is_nested, df[column][is_nested].map(json.dumps))
+
+        return df
+
+    def _hash_rows(self, df:pd.DataFrame)->np.ndarray:
+        """
+        Hashes the content of each row, with nested lists/dicts hashed as their JSON as they cannot be hashed themselves
+        - `df`: pandas dataframe 
+
+        Returns array of row hashes as signed 64 bit integers
+        """
+
+        return pd.util.hash_pandas_object(self._encode_nested(df), index=False).values.view('int64')
+
+    def _encode_csv(self, df:pd.DataFrame)->StringIO:
+        """
+        Encodes a dataframe as CSV for COPY, with nulls written as \\N and nested lists/dicts as JSON
+        - `df`: pandas dataframe 
+
+        Returns an in-memory CSV buffer
+        """
+
+        df = self._encode_nested(df)
+
+        buffer = StringIO()
+        df.to_csv(buffer, index=False, header=False, na_rep='\\N')
+        buffer.seek(0)
+
+        return buffer
+
+    def _copy_to_database(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, chunksize:int=1000, unlogged:bool=False, dtype:dict=None)->None:
+        """
+        Replaces a database table with the dataframe using COPY ... FROM STDIN, in a single transaction
+        - `df`: pandas dataframe 
+        - `engine`: connection engine to database 
+        - `schema_name: database schema
+        - `table_name`: target table        
+        - `chunksize`: if chunksize greater than 0 is specified, then the rows will be encoded and copied in the specified chunksize. e.g. 1000 rows at a time
+        - `unlogged`: creates the table as UNLOGGED, skipping WAL for tables that are only used within a load
+        - `dtype`: SQLAlchemy types of columns whose type is not inferred from the dataframe
+
+        Returns None
+        """
+
+        logging.info(f'Copying into table [{table_name}]')
+
+        start_time = time.perf_counter()
+        self.rows_loaded = len(df)
+
+        max_length = len(df)
+        if chunksize <= 0:
+            chunksize = max(max_length, 1)
+
+        column_list = ', '.join(self._quote(column) for column in df.columns)
+        copy_statement = f"""COPY "{schema_name}"."{table_name}" ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"""
+
+        with engine.begin() as conn:
+            # Create the table with the same column types as to_sql would
+            conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{schema_name}"."{table_name}"')
+            create_statement = pd.io.sql.get_schema(df, table_name, con=conn, schema=schema_name, dtype=dtype)
+            if unlogged:
+                create_statement = create_statement.replace('CREATE TABLE', 'CREATE UNLOGGED TABLE', 1)
+            conn.exec_driver_sql(create_statement)
+
+            cursor = conn.connection.cursor()
+
+            for lower_bound in range(0, max_length, chunksize):
+                upper_bound = min(lower_bound + chunksize, max_length)
+                buffer = self._encode_csv(df=df.iloc[lower_bound:upper_bound])
+                copy_from_buffer(cursor=cursor, statement=copy_statement, buffer=buffer)
+
+                self._log('copy_chunk', rows=upper_bound - lower_bound, lower_bound=lower_bound, upper_bound=upper_bound, max_length=max_length)
+
+            cursor.close()
+
+        self._log('copy', table_name=table_name, rows=len(df), rows_per_second=self._rows_per_second(df, start_time))
+
+        return None
+
+    def _quote(self, identifier:str)->str:
+        return '"' + str(identifier).replace('"', '""') + '"'
+
+    def _get_column_types(self, conn, schema_name:str, table_name:str)->dict:
+        """
+        Gets the columns of a table with their formatted types
+        - `conn`: connection to database 
+        - `schema_name`: database schema
+        - `table_name`: the table
+
+        Returns dictionary of column name to type, in column order
+        """
+
+        statement = text("""
+            SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = :schema_name AND c.relname = :table_name AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+        """)
+
+        return dict(conn.execute(statement, {'schema_name': schema_name, 'table_name': table_name}).all())
+
+    def _get_staging_frame(self, df:pd.DataFrame, primary_key:str)->pd.DataFrame:
+        """
+        Prepares the rows of a merge, one row per product with the content hash of the row
+        - `df`: pandas dataframe 
+        - `primary_key`: the column identifying a product
+
+        Returns the dataframe with a `row_hash` column, rows without a key are dropped
+        """
+
+        # A key can only be upserted once per statement
+        df = df[df[primary_key].notna()].drop_duplicates(subset=[primary_key], keep='last')
+
+        # Content hash of each row, stored as signed bigint
+        return df.assign(row_hash=self._hash_rows(df))
+
+    def _get_upsert_statement(self, target:str, staging:str, staging_columns:dict, target_columns:dict, primary_key:str)->str:
+        """
+        Creates the statement upserting the staging rows into the target, rows with an unchanged content hash are not updated
+        - `target`: the quoted target table
+        - `staging`: the quoted staging table
+        - `staging_columns`: the columns of the staging table with their types
+        - `target_columns`: the columns of the target table with their types, including those of the staging table
+        - `primary_key`: the column identifying a product
+
+        Returns the SQL statement as string
+        """
+
+        column_list = ', '.join(self._quote(column) for column in staging_columns)
+        select_list = ', '.join(f'{self._quote(column)}::{target_columns[column]}' for column in staging_columns)
+        update_list = ', '.join(
+            [f'{self._quote(column)} = EXCLUDED.{self._quote(column)}' for column in staging_columns if column != primary_key]
+            # Columns missing from this run no longer describe the product
+            + [f'{self._quote(column)} = NULL' for column in target_columns if column not in staging_columns]
+        )
+
+        return f"""
+            INSERT INTO {target} ({column_list})
+            SELECT {select_list} FROM {staging}
+            ON CONFLICT ({self._quote(primary_key)}) DO UPDATE SET {update_list}
+            WHERE {target}."row_hash" IS DISTINCT FROM EXCLUDED."row_hash"
+        """
+
+    def _get_delete_statement(self, target:str, staging:str, target_columns:dict, primary_key:str)->str:
+        """
+        Creates the statement deleting the products of the target that are not in the staging table
+        - `target`: the quoted target table
+        - `staging`: the quoted staging table
+        - `target_columns`: the columns of the target table with their types
+        - `primary_key`: the column identifying a product
+
+        Returns the SQL statement as string
+        """
+
+        key = self._quote(primary_key)
+
+        return f"""
+            DELETE FROM {target} AS t
+            WHERE NOT EXISTS (SELECT 1 FROM {staging} AS s WHERE s.{key}::{target_columns[primary_key]} = t.{key})
+        """
+
+    def _merge_to_database(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, primary_key:str, chunksize:int=1000)->None:
+        """
+        Upserts the dataframe into a database table on the primary key through a staging table.
+        Rows whose content hash is unchanged are skipped and products no longer in the dataframe are deleted
+        - `df`: pandas dataframe 
+        - `engine`: connection engine to database 
+        - `schema_name: database schema
+        - `table_name`: target table        
+        - `primary_key`: the column identifying a product
+        - `chunksize`: if chunksize greater than 0 is specified, then the rows will be copied to the staging table in the specified chunksize. e.g. 1000 rows at a time
+
+        Returns None
+        """
+
+        start_time = time.perf_counter()
+
+        df = self._get_staging_frame(df=df, primary_key=primary_key)
+
+        staging_table_name = f'{table_name}_staging'
+        self._copy_to_database(df=df, engine=engine, schema_name=schema_name, table_name=staging_table_name, chunksize=chunksize, unlogged=True)
+
+        target = f'{self._quote(schema_name)}.{self._quote(table_name)}'
+        staging = f'{self._quote(schema_name)}.{self._quote(staging_table_name)}'
+        key = self._quote(primary_key)
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f'CREATE TABLE IF NOT EXISTS {target} (LIKE {staging})')
+            index_name = f'{table_name}_{primary_key}_key'
+            if conn.execute(text('SELECT to_regclass(:index_name)'), {'index_name': f'{self._quote(schema_name)}.{self._quote(index_name)}'}).scalar() is None:
+                # A table first loaded by overwrite or copy can hold a key more than once, which the index cannot be built over.
+                # The merge replaces the rows of a key anyway, so only the last row of each key is kept
+                duplicate_result = conn.exec_driver_sql(f'DELETE FROM {target} AS a USING {target} AS b WHERE a.{key} = b.{key} AND a.ctid < b.ctid')
+                if duplicate_result.rowcount > 0:
+                    logging.warning(f'Removed [{duplicate_result.rowcount}] rows with a duplicate [{primary_key}] from table [{schema_name}.{table_name}] before merging into it')
+                conn.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS {self._quote(index_name)} ON {target} ({key})')
+
+            staging_columns = self._get_column_types(conn=conn, schema_name=schema_name, table_name=staging_table_name)
+            target_columns = self._get_column_types(conn=conn, schema_name=schema_name, table_name=table_name)
+
+            # Columns new to this run are added to the target
+            for column, column_type in staging_columns.items():
+                if column not in target_columns:
+                    conn.exec_driver_sql(f'ALTER TABLE {target} ADD COLUMN {self._quote(column)} {column_type}')
+                    target_columns[column] = column_type
+
+            upsert_result = conn.exec_driver_sql(self._get_upsert_statement(target=target, staging=staging, staging_columns=staging_columns, target_columns=target_columns, primary_key=primary_key))
+            delete_result = conn.exec_driver_sql(self._get_delete_statement(target=target, staging=staging, target_columns=target_columns, primary_key=primary_key))
+
+            conn.exec_driver_sql(f'DROP TABLE {staging}')
+
+        # Unchanged rows are skipped, only the upserted rows are written
+        self.rows_loaded = upsert_result.rowcount
+
+        self._log('merge', table_name=table_name, rows=len(df), rows_upserted=upsert_result.rowcount, rows_unchanged=len(df) - upsert_result.rowcount, rows_deleted=delete_result.rowcount, rows_per_second=self._rows_per_second(df, start_time))
+
+        return None
+
+    def _get_partition_name(self, table_name:str, snapshot_date:dt.date, category:str=None)->str:
+        """
+        Creates the name of a snapshot date partition, or of its category sub-partition
+        - `table_name`: the partitioned table
+        - `snapshot_date`: the snapshot date
+        - `category`: the category, None for the snapshot date partition
+
+        Returns the partition name as string
+        """
+
+        partition_name = f'{table_name}_{snapshot_date:%Y%m%d}'
+        if category is not None:
+            partition_name = f'{partition_name}_{category.lower()}'
+
+        # Postgres truncates longer identifiers, a hash keeps truncated names apart
+        if len(partition_name) > 63:
+            partition_name = f'{partition_name[:54]}_{hashlib.md5(partition_name.encode("utf-8")).hexdigest()[:8]}'
+
+        return partition_name
+
+    def _get_wider_type(self, column_type:str, other_column_type:str)->str:
+        """
+        Gets a column type that holds the values of both types
+        - `column_type`: a formatted column type
+        - `other_column_type`: another formatted column type
+
+        Returns the formatted column type
+        """
+
+        if column_type == other_column_type:
+            return column_type
+
+        numeric_types = ['bigint', 'double precision']
+        if column_type in numeric_types and other_column_type in numeric_types:
+            return 'double precision'
+
+        return 'text'
+
+    def _partition_to_database(self, df:pd.DataFrame, engine, schema_name:str, table_name:str, category:str, snapshot_date:dt.date, primary_key:str=None, chunksize:int=1000)->None:
+        """
+        Replaces the category partition of a snapshot date in a table partitioned by snapshot date and sub-partitioned by category.
+        The partition is copied into a standalone table first, then swapped in by detaching the old partition and attaching the new one
+        - `df`: pandas dataframe 
+        - `engine`: connection engine to database 
+        - `schema_name: database schema
+        - `table_name`: the partitioned table
+        - `category`: the category of the dataframe
+        - `snapshot_date`: the snapshot date of the dataframe
+        - `primary_key`: the column identifying a product, indexed when set
+        - `chunksize`: if chunksize greater than 0 is specified, then the rows will be copied in the specified chunksize. e.g. 1000 rows at a time
+
+        Returns None
+        """
+
+        start_time = time.perf_counter()
+
+        date_partition_name = self._get_partition_name(table_name=table_name, snapshot_date=snapshot_date)
+        partition_name = self._get_partition_name(table_name=table_name, snapshot_date=snapshot_date, category=category)
+        new_partition_name = f'{partition_name[:59]}_new'
+
+        target = f'{self._quote(schema_name)}.{self._quote(table_name)}'
+        date_partition = f'{self._quote(schema_name)}.{self._quote(date_partition_name)}'
+        partition = f'{self._quote(schema_name)}.{self._quote(partition_name)}'
+        new_partition = f'{self._quote(schema_name)}.{self._quote(new_partition_name)}'
+        category_value = "'" + category.replace("'", "''") + "'"
+        date_from = f"'{snapshot_date.isoformat()}'"
+        date_to = f"'{(snapshot_date + dt.timedelta(days=1)).isoformat()}'"
+
+        # Copy into a standalone table, in parallel with the other categories
+        df = df.assign(snapshot_date=snapshot_date, category=category)
+        self._copy_to_database(df=df, engine=engine, schema_name=schema_name, table_name=new_partition_name, chunksize=chunksize, dtype={'snapshot_date': Date()})
+
+        with engine.begin() as conn:
+            if primary_key is not None:
+                # Built before the swap, the attach adopts it as the partition of the table's index
+                conn.exec_driver_sql(f'CREATE INDEX {self._quote(f"{new_partition_name}_{primary_key}_idx"[:63])} ON {new_partition} ({self._quote(primary_key)})')
+
+        # The table layout and partitions are changed by one category at a time
+        with engine.begin() as conn:
+            conn.execute(text('SELECT pg_advisory_xact_lock(hashtext(:lock_name))'), {'lock_name': f'{schema_name}.{table_name}'})
+
+            new_columns = self._get_column_types(conn=conn, schema_name=schema_name, table_name=new_partition_name)
+            target_columns = self._get_column_types(conn=conn, schema_name=schema_name, table_name=table_name)
+
+            if not target_columns:
+                column_list = ', '.join(f'{self._quote(column)} {column_type}' for column, column_type in new_columns.items())
+                conn.exec_driver_sql(f'CREATE TABLE {target} ({column_list}) PARTITION BY RANGE ("snapshot_date")')
+                target_columns = dict(new_columns)
+
+            if primary_key is not None:
+                conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {self._quote(f"{table_name}_{primary_key}_idx")} ON {target} ({self._quote(primary_key)})')
+
+            # Both tables need the same columns and types to attach, types are only ever widened
+            for column in list(new_columns) + [column for column in target_columns if column not in new_columns]:
+                if column not in target_columns:
+                    conn.exec_driver_sql(f'ALTER TABLE {target} ADD COLUMN {self._quote(column)} {new_columns[column]}')
+                    target_columns[column] = new_columns[column]
+
+                elif column not in new_columns:
+                    conn.exec_driver_sql(f'ALTER TABLE {new_partition} ADD COLUMN {self._quote(column)} {target_columns[column]}')
+
+                elif new_columns[column] != target_columns[column]:
+                    column_type = self._get_wider_type(new_columns[column], target_columns[column])
+                    for table, table_columns in ((target, target_columns), (new_partition, new_columns)):
+                        if table_columns[column] != column_type:
+                            conn.exec_driver_sql(f'ALTER TABLE {table} ALTER COLUMN {self._quote(column)} TYPE {column_type} USING {self._quote(column)}::{column_type}')
+                    logging.info(f'Column [{column}] of [{table_name}] widened to [{column_type}]')
+
+            conn.exec_driver_sql(f"""
+                CREATE TABLE IF NOT EXISTS {date_partition} PARTITION OF {target}
+                FOR VALUES FROM ({date_from}) TO ({date_to}) PARTITION BY LIST ("category")
+            """)
+
+            # Proves the rows are in the partition bounds, so the attach does not scan the table
+            bounds_constraint = self._quote(f'{new_partition_name[:57]}_bounds')
+            conn.exec_driver_sql(f"""
+                ALTER TABLE {new_partition} ADD CONSTRAINT {bounds_constraint}
+                CHECK ("snapshot_date" IS NOT NULL AND "snapshot_date" >= {date_from} AND "snapshot_date" < {date_to} AND "category" IS NOT NULL AND "category" = {category_value})
+            """)
+
+            if self._get_column_types(conn=conn, schema_name=schema_name, table_name=partition_name):
+                conn.exec_driver_sql(f'ALTER TABLE {date_partition} DETACH PARTITION {partition}')
+                conn.exec_driver_sql(f'DROP TABLE {partition}')
+
+            conn.exec_driver_sql(f'ALTER TABLE {new_partition} RENAME TO {self._quote(partition_name)}')
+            conn.exec_driver_sql(f'ALTER TABLE {date_partition} ATTACH PARTITION {partition} FOR VALUES IN ({category_value})')
+            conn.exec_driver_sql(f'ALTER TABLE {partition} DROP CONSTRAINT {bounds_constraint}')
+
+            if primary_key is not None:
+                conn.exec_driver_sql(f'ALTER INDEX {self._quote(schema_name)}.{self._quote(f"{new_partition_name}_{primary_key}_idx"[:63])} RENAME TO {self._quote(f"{partition_name}_{primary_key}_idx"[:63])}')
+
+        self.rows_loaded = len(df)
+
+        self._log('partition', table_name=table_name, partition_name=partition_name, rows=len(df), rows_per_second=self._rows_per_second(df, start_time))
+
+        return None
+
+    def run(self):
+        """
+        Run load
+        """
+        start_time = time.perf_counter()
+
+        # Create schema if not exists
+        self._create_schema(engine=self.engine, schema_name=self.schema_name)
+
+        if self.load_method == 'overwrite':
+            self._overwrite_to_database(df=self.df, engine=self.engine, schema_name=self.schema_name, table_name=self.table_name, chunksize=self.chunksize)
+
+        elif self.load_method == 'copy':
+            self._copy_to_database(df=self.df, engine=self.engine, schema_name=self.schema_name, table_name=self.table_name, chunksize=self.chunksize)
+
+        elif self.load_method == 'merge':
+            self._merge_to_database(df=self.df, engine=self.engine, schema_name=self.schema_name, table_name=self.table_name, primary_key=self.primary_key, chunksize=self.chunksize)
+
+        elif self.load_method == 'partition':
+            self._partition_to_database(df=self.df, engine=self.engine, schema_name=self.schema_name, table_name=self.table_name, category=self.category, snapshot_date=self.snapshot_date, primary_key=self.primary_key, chunksize=self.chunksize)
+
+        self.metrics = {
+            'stage': 'load',
+            'category': self.category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'rows_loaded': self.rows_loaded
+        }
+    
\ No newline at end of file
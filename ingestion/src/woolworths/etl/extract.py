@@ -1,18 +1,84 @@
-from playwright.sync_api import sync_playwright
+from utility.async_fetch import AsyncFetcher
+from utility.checkpoint import Checkpoint
+from utility.cookie_manager import CookieManager
+from utility.http_session import HttpSession, request_tag
+from utility.json_decoder import ProjectedDecoder
+from utility.page_accumulator import PageAccumulator
+from utility.page_parser import PageParser
+from utility.request_planner import RequestPlanner
+from utility.schema_registry import SchemaRegistry
 import pandas as pd
 import numpy as np
 import requests
 import logging
+import asyncio
 import json
 import math
-import logging 
+import time
 
 class Extract():
 
-    def __init__(self, category_url:str, product_url:str): 
+    def __init__(self, category_url:str, product_url:str, max_concurrent_requests:int=8, max_concurrent_requests_per_category:int=4, cookie_manager:CookieManager=None, session:HttpSession=None, decoder:ProjectedDecoder=None, schema_registry_path:str=None, checkpoint:Checkpoint=None, page_size:int=24, request_planner:RequestPlanner=None, parse_workers:int=None): 
         self.category_url = category_url  
         self.product_url = product_url      
+        self.cookie_manager = cookie_manager if cookie_manager is not None else CookieManager(url=product_url)
+        self.max_concurrent_requests = max_concurrent_requests
+        self.max_concurrent_requests_per_category = max_concurrent_requests_per_category
+        self.session = session if session is not None else HttpSession(pool_maxsize=max_concurrent_requests)
+        # Decodes only the declared fields when set, otherwise every field is flattened with json_normalize
+        self.decoder = decoder
+        # Pages are parsed on worker processes while the next pages are fetched, one per core besides the fetching core when `parse_workers` is None
+        # and on the fetching thread when it is 0
+        self.page_parser = PageParser(max_workers=parse_workers, decoder=decoder, record_path=['Bundles', 'Products'])
+        # Column names are shortened once per source field, when the field is first registered
+        self.schema_registry = SchemaRegistry(registry_path=schema_registry_path, name_function=self._shorten_column_name)
+        # Pages already extracted by a failed run are read back instead of fetched when set
+        self.checkpoint = checkpoint
+        # Fewer, larger pages need fewer requests, up to the largest page size the API accepts
+        self.page_size = page_size
+        # Categories whose first page is unchanged since the previous run are skipped when set
+        self.request_planner = request_planner
+        self.metrics = []
+        # The categories of the last run paged in full without failed pages, only their missing products are delisted
+        self.list_of_complete_categories = []
         
+    def _record_metrics(self, category:str, start_time:float, rows_parsed:int=None)->None:
+        """
+        Records the duration, request, byte, row and retry counts of a category
+        - `category`: the category, None for the whole run
+        - `start_time`: `time.perf_counter()` when the category or run started
+        - `rows_parsed`: the rows parsed for the category, summed over the categories for the whole run
+
+        Returns None
+        """
+
+        if category is None:
+            rows_parsed = sum(metric['rows_parsed'] for metric in self.metrics)
+
+        stats = self.session.get_stats(tag=category)
+
+        self.metrics.append({
+            'stage': 'extract',
+            'category': category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'request_count': stats['request_count'],
+            'bytes_downloaded': stats['bytes_received'],
+            'rows_parsed': rows_parsed,
+            'retry_count': stats['retry_count']
+        })
+
+        return None
+
+    def _shorten_column_name(self, column:str)->str:
+        """
+        Truncates a source field name to a column name
+        - `column`: the source field name
+
+        Returns the column name as string
+        """
+
+        return column.replace('.','').replace('_','').replace('Attributes','Attr').replace('Maximum','Max').replace('Minimum','Min').replace('ThirdPartyProductInfoThirdParty','ThirdPartyProduct').replace('Additional','Add').replace('Value','Val').replace('Position','Pos').replace('Option','Opt').replace('Childrens','Child').replace('Size','Sz').replace('Clothing','Cloth').replace('Display','Disp').replace('Colour','Col')
+
     def _get_categories(self, url:str, headers:dict)->pd.DataFrame:
         """
         Get list of product categories      
@@ -24,7 +90,7 @@ class Extract():
         
         category_df = pd.DataFrame()
 
-        response = requests.request("GET", url=url, headers=headers)
+        response = self.session.request("GET", url=url, headers=headers)
         
         if response.status_code == 200:            
             json_response = response.json()
@@ -35,38 +101,42 @@ class Extract():
         
         return category_df
     
-    def _get_cookie(self, url:str)->str:
+    def _get_cookie(self)->str:
         """
-        Gets a cookie from the url to authorise POST requests        
-        - `url`: the products API URL      
+        Gets the cookie that authorises POST requests from the cookie manager
 
-        Returns the cookie as string
+        Returns the cookie as string, empty when replaying cached responses as the cookie is not part of the cache key
         """
 
-        with sync_playwright() as p:            
-            browser = p.chromium.launch()
-            context = browser.new_context()
-            page = context.new_page()
-            page.goto(url)
-            cookies = context.cookies()
+        if self.session.offline:
+            return ''
+
+        return self.cookie_manager.get_cookie()
 
-            cookie = ''
+    def _post(self, url:str, headers:dict, payload:str)->requests.Response:
+        """
+        Sends a POST request with the current cookie, refreshing the cookie once if the request is rejected
+        - `url`: the API URL
+        - `headers`: the request headers
+        - `payload': the request payload
 
-            for cookie in cookies:
-                if cookie['name'] == '_abck':
-                    cookie = cookie['value']
-                    break
-            else:
-                logging.error('Could not get cookie')
+        Returns the response
+        """
+
+        cookie = self._get_cookie()
+        response = self.session.request("POST", url=url, headers={**headers, 'cookie': f"_abck={cookie}"}, data=payload)
 
-            context.close()
-            browser.close()
+        if response.status_code in (401, 403):
+            cookie = self.cookie_manager.refresh_cookie(stale_cookie=cookie)
+            self.session.record_retry()
+            response = self.session.request("POST", url=url, headers={**headers, 'cookie': f"_abck={cookie}"}, data=payload)
 
-        return cookie   
+        return response
 
     def _create_headers(self, headers_for:str, url:str=None)->dict:
         """
         Creates headers with the cookie added        
+        - `headers_for`: the API endpoint the headers is for
         - `url`: the products API URL
 
         Returns of headers as a dictionary
@@ -80,7 +150,7 @@ class Extract():
             
         elif headers_for == 'product':
             
-            cookie_string = f"_abck={self._get_cookie(url=url)}"
+            cookie_string = f"_abck={self._get_cookie()}"
 
             headers = {
             'content-type': 'application/json',
@@ -105,7 +175,7 @@ class Extract():
         payload = {
             "categoryId": category_id,
             "pageNumber": page_number,
-            "pageSize": 24,
+            "pageSize": self.page_size,
             "sortType": "CUPAsc",
             "url": f"/shop/browse/{url}",
             "location": f"/shop/browse/{location}",
@@ -121,31 +191,61 @@ class Extract():
 
         return payload  
      
-    def _get_page_count(self, url:str, headers:dict, payload:str)->int:
+    def _get_page_content(self, url:str, headers:dict, payload:str)->bytes:
         """
-        Gets the number of pages for a product category        
+        Get a page of products from API request, left unparsed so the fetching thread moves on to the next request
         - `url`: the API URL
         - `headers`: the request headers
         - `payload': the request payload
 
-        Returns the count of of pages as integer
-        """  
-
-        response = requests.request("POST", url=url, headers=headers, data=payload)
+        Returns the response body, None when the request failed
+        """
 
-        if(response.status_code == 200):            
-            json_response = response.json()            
-            products_in_category = json_response['TotalRecordCount']    
-            pages_in_category = math.ceil(products_in_category / 24)   
+        response = self._post(url=url, headers=headers, payload=payload)
 
-        else: 
-            logging.error(response)
+        if response.status_code == 200:            
+            return response.content
         
-        return pages_in_category
+        logging.error(response)
+
+        return None
+
+    async def _parse_products(self, content:bytes, count_path:list=None)->tuple:
+        """
+        Parses a page of products on the page parser
+        - `content`: the response body, None when the request failed
+        - `count_path`: the keys leading to the count of products in the category, None when the count is not needed
 
-    def _get_products(self, url:str, headers:dict, payload:str)->pd.DataFrame:
+        Returns tuple of the dataframe of products and the count of products
         """
-        Get list of products from API request        
+
+        return await asyncio.wrap_future(self.page_parser.submit(content, count_path=count_path))
+
+    async def _get_first_page(self, fetcher:AsyncFetcher, category_name:str, url:str, headers:dict, payload:str)->tuple:
+        """
+        Gets the first page of a product category, which also gives the number of products in the category
+        - `fetcher`: the async fetcher bounding in-flight requests
+        - `category_name`: the category name
+        - `url`: the API URL
+        - `headers`: the request headers
+        - `payload': the request payload of the first page
+
+        Returns tuple of the count of products, the dataframe of products and the page fingerprint, 0, an empty dataframe and None when the request failed
+        """
+
+        content = await fetcher.fetch(self._get_page_content, category=category_name, url=url, headers=headers, payload=payload)
+        products_df, products_in_category = await self._parse_products(content, count_path=['TotalRecordCount'])
+        fingerprint = self.request_planner.get_fingerprint(content) if self.request_planner is not None and content is not None else None
+
+        return products_in_category, products_df, fingerprint
+
+    async def _get_checkpointed_products(self, fetcher:AsyncFetcher, category_name:str, page:int, url:str, headers:dict, payload:str)->pd.DataFrame:
+        """
+        Gets a page from the checkpoint, or from the API and checkpoints it.
+        The page is parsed after its request slot is released, so the next request is sent while it is parsed
+        - `fetcher`: the async fetcher bounding in-flight requests
+        - `category_name`: the category name
+        - `page`: the page number
         - `url`: the API URL
         - `headers`: the request headers
         - `payload': the request payload
@@ -153,75 +253,193 @@ class Extract():
         Returns a dataframe of products
         """
 
-        products_df = pd.DataFrame()
+        if self.checkpoint is not None:
+            page_df = self.checkpoint.get_page(category=category_name, page=page)
+            if page_df is not None:
+                return page_df
 
-        response = requests.request("POST", url=url, headers=headers, data=payload)
+        content = await fetcher.fetch(self._get_page_content, category=category_name, url=url, headers=headers, payload=payload)
+        page_df, _ = await self._parse_products(content)
 
-        if response.status_code == 200:            
-            json_response = response.json()
-            products_df = pd.json_normalize(json_response['Bundles'],'Products')
-        
-        else: 
-            logging.error(response)
+        # Failed requests give an empty page, which is fetched again when the run is resumed
+        if self.checkpoint is not None and not page_df.empty:
+            self.checkpoint.save_page(category=category_name, page=page, page_df=page_df)
 
-        return products_df
-    
-    def run(self)->list:
+        return page_df
+
+    async def _extract_category(self, fetcher:AsyncFetcher, row:pd.Series, category_count:int, product_headers:dict)->pd.DataFrame:
         """
-        Run extract
+        Extracts all pages of a category, fetching the pages concurrently
+        - `fetcher`: the async fetcher bounding in-flight requests
+        - `row`: the category row from the categories dataframe
+        - `category_count`: the position of the category in the run
+        - `product_headers`: the product request headers
+
+        Returns a dataframe of products for the category
         """
 
-        category_headers = self._create_headers(headers_for='category')
-        category_df = self._get_categories(url=self.category_url, headers=category_headers)
+        category_name = row['UrlFriendlyName'].replace('-',' ').title().replace(' ','')
+        start_time = time.perf_counter()
 
-        # Prepare variables
-        category_count = 0        
-        list_of_product_df = []
+        # Count this category's requests separately, the tag only applies to this task
+        request_tag.set(category_name)
 
-        for index, row in category_df.iterrows():
-            
-            product_df = pd.DataFrame()
+        logging.info(f'Extracting products for category [{category_count}:{category_name}]')
+
+        # Get pages in category, the first page request also gives the page count
+        product_payload = self._create_payload(category_id=row['NodeId'], url=row['UrlFriendlyName'], location=row['UrlFriendlyName'], format_object=row['Description']) 
+        pages_in_category = self.checkpoint.get_page_count(category=category_name) if self.checkpoint is not None else None
+        list_of_page_df = []
+        fingerprint = None
+        if pages_in_category is None:
+            products_in_category, first_page_df, fingerprint = await self._get_first_page(fetcher=fetcher, category_name=category_name, url=self.product_url, headers=product_headers, payload=json.dumps(product_payload))
+            pages_in_category = math.ceil(products_in_category / self.page_size)
+
+            if self.request_planner is not None and self.request_planner.is_unchanged(category=category_name, record_count=products_in_category, fingerprint=fingerprint, page_count=pages_in_category):
+                logging.info(f'Skipping unchanged category [{category_count}:{category_name}]')
+                self._record_metrics(category=category_name, start_time=start_time, rows_parsed=0)
+                return pd.DataFrame()
 
+            if self.checkpoint is not None and pages_in_category > 0:
+                self.checkpoint.save_page_count(category=category_name, page_count=pages_in_category)
+            if self.checkpoint is not None and not first_page_df.empty:
+                self.checkpoint.save_page(category=category_name, page=1, page_df=first_page_df)
+
+            if pages_in_category > 0:
+                list_of_page_df.append(first_page_df)
+
+        logging.info(f'Extracting [{pages_in_category}] pages of category [{category_count}:{category_name}]')
+
+        # Alter payload with page number for each page request, the first page is reused when it was just fetched
+        list_of_kwargs = [
+            {'category_name': category_name, 'page': page, 'url': self.product_url, 'headers': product_headers, 'payload': json.dumps({**product_payload, 'pageNumber': page})}
+            for page in range(len(list_of_page_df) + 1, pages_in_category + 1)
+        ]
+        # Pages come back in page order
+        list_of_page_df += await asyncio.gather(*(self._get_checkpointed_products(fetcher=fetcher, **kwargs) for kwargs in list_of_kwargs))
+
+        # Failed requests give an empty page
+        is_complete = pages_in_category > 0 and all(not page_df.empty for page_df in list_of_page_df)
+
+        # Only a category paged in full without failed pages can be skipped by the next run
+        if self.request_planner is not None and fingerprint is not None and is_complete:
+            self.request_planner.update(category=category_name, record_count=products_in_category, fingerprint=fingerprint)
+
+        if is_complete:
+            self.list_of_complete_categories.append(category_name)
+
+        page_accumulator = PageAccumulator(name=category_name)
+        for page_df in list_of_page_df:
+            page_accumulator.add(page_df)
+
+        product_df = page_accumulator.to_frame()
+
+        # Add product df to list of dataframes
+        if not product_df.empty:
+            # Conform to the registered column names and types, shared by all categories
+            product_df = self.schema_registry.conform(product_df)
+
+            # Replace nan, projected columns are already typed
+            if self.decoder is None:
+                product_df = product_df.replace({np.nan: None})                    
+
+            # Name the df
+            product_df.attrs['name'] = category_name
+
+        else:
+            logging.info(f'{category_name} df is empty')
+
+        self._record_metrics(category=category_name, start_time=start_time, rows_parsed=len(product_df))
+
+        return product_df
+
+    def _list_category_kwargs(self, fetcher:AsyncFetcher, category_df:pd.DataFrame, product_headers:dict)->list:
+        """
+        Creates the `_extract_category` keyword arguments for each category to extract
+        - `fetcher`: the async fetcher bounding in-flight requests
+        - `category_df`: the categories dataframe
+        - `product_headers`: the product request headers
+
+        Returns list of keyword arguments in category order
+        """
+
+        list_of_kwargs = []
+        category_count = 0
+
+        for index, row in category_df.iterrows():
             if not (row['UrlFriendlyName'] == 'specials' or row['UrlFriendlyName'] == 'front-of-store' or row['UrlFriendlyName'] == 'mother-s-day'):
-            # if row['UrlFriendlyName'] == 'household':
                 category_count += 1
-                category_name = row['UrlFriendlyName'].replace('-',' ').title().replace(' ','')
+                list_of_kwargs.append({'fetcher': fetcher, 'row': row, 'category_count': category_count, 'product_headers': product_headers})
+
+        return list_of_kwargs
+
+    async def _extract_categories(self, list_of_kwargs:list)->list:
+        """
+        Extracts all categories concurrently
+        - `list_of_kwargs`: the `_extract_category` keyword arguments for each category
+
+        Returns list of product dataframes in category order
+        """
+
+        list_of_product_df = await asyncio.gather(*(self._extract_category(**kwargs) for kwargs in list_of_kwargs))
+
+        return [product_df for product_df in list_of_product_df if not product_df.empty]
+
+    def _prepare_run(self)->tuple:
+        """
+        Gets the categories and the product headers, and creates the fetcher for a run
+
+        Returns tuple of fetcher and list of `_extract_category` keyword arguments
+        """
+
+        self.metrics = []
+        self.list_of_complete_categories = []
+        self._run_start_time = time.perf_counter()
+
+        category_headers = self._create_headers(headers_for='category')
+        category_df = self._get_categories(url=self.category_url, headers=category_headers)
+
+        # Get the cookie once, it is shared by all categories
+        product_headers = self._create_headers(headers_for='product', url=self.product_url)
+
+        fetcher = AsyncFetcher(max_concurrent_requests=self.max_concurrent_requests, max_concurrent_requests_per_category=self.max_concurrent_requests_per_category)
+        list_of_kwargs = self._list_category_kwargs(fetcher=fetcher, category_df=category_df, product_headers=product_headers)
+
+        return fetcher, list_of_kwargs
+
+    def run(self)->list:
+        """
+        Run extract
+        """
+
+        fetcher, list_of_kwargs = self._prepare_run()
+        try:
+            list_of_product_df = fetcher.run(self._extract_categories, list_of_kwargs=list_of_kwargs)
+        finally:
+            self.page_parser.close()
+
+        logging.info(f'HTTP session stats {self.session.get_stats()}')
+        self._record_metrics(category=None, start_time=self._run_start_time)
                 
-                logging.info(f'Extracting products for category [{category_count}:{category_name}]')
-
-                # Get pages in category
-                product_headers = self._create_headers(headers_for='product', url=self.product_url)
-                product_payload = self._create_payload(category_id=row['NodeId'], url=row['UrlFriendlyName'], location=row['UrlFriendlyName'], format_object=row['Description']) 
-                pages_in_category = self._get_page_count(url=self.product_url, headers=product_headers, payload=json.dumps(product_payload))
-
-                for page in range(1, pages_in_category + 1):
-                    logging.info(f'Extracting page [{page} / {pages_in_category}] of category [{category_count}:{category_name}]')
-                    
-                    # Alter payload with page number
-                    product_payload.update({'pageNumber': page})
-                    
-                    page_df = self._get_products(url=self.product_url, headers=product_headers, payload=json.dumps(product_payload))                    
-                    product_df = pd.concat((product_df, page_df), axis = 0)
-
-                 # Add product df to list of dataframes
+        return list_of_product_df
+
+    def run_stream(self, queue_depth:int=2):
+        """
+        Run extract, yielding each category dataframe as soon as it is extracted.
+        At most `queue_depth` categories are extracted or waiting to be consumed at a time, besides the category the consumer is loading
+        - `queue_depth`: the maximum number of categories held in memory besides the one being loaded
+
+        Returns a generator of product dataframes in completion order
+        """
+
+        fetcher, list_of_kwargs = self._prepare_run()
+
+        try:
+            for product_df in fetcher.stream(self._extract_category, list_of_kwargs=list_of_kwargs, max_in_flight=queue_depth):
                 if not product_df.empty:
-                    # Replace nan
-                    product_df = product_df.replace({np.nan: None})                    
-                    
-                    # Truncate column names
-                    new_column_dict = {}
-                    for column in product_df.columns:
-                        new_column_dict[column] = column.replace('.','').replace('_','').replace('Attributes','Attr').replace('Maximum','Max').replace('Minimum','Min').replace('ThirdPartyProductInfoThirdParty','ThirdPartyProduct').replace('Additional','Add').replace('Value','Val').replace('Position','Pos').replace('Option','Opt').replace('Childrens','Child').replace('Size','Sz').replace('Clothing','Cloth').replace('Display','Disp').replace('Colour','Col')
-
-                    # Rename df with new columns
-                    product_df.rename(columns=new_column_dict, inplace=True)
-                    
-                    # Name the df
-                    product_df.attrs['name'] = category_name
-                  
-                    list_of_product_df.append(product_df)
-
-                else:
-                    logging.info(f'{category_name} df is empty')
-                
-        return list_of_product_df
\ No newline at end of file
+                    yield product_df
+        finally:
+            self.page_parser.close()
+
+        logging.info(f'HTTP session stats {self.session.get_stats()}')
+        self._record_metrics(category=None, start_time=self._run_start_time)
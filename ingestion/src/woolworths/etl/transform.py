@@ -0,0 +1,165 @@
+import pandas as pd
+import numpy as np
+import logging
+import time
+
+# Units are normalised to grams, millilitres or each, with the factor converting to the base unit
+UNIT_FACTORS = {
+    'g': ('g', 1.0), 'gm': ('g', 1.0), 'gram': ('g', 1.0), 'grams': ('g', 1.0), 'kg': ('g', 1000.0),
+    'ml': ('ml', 1.0), 'l': ('ml', 1000.0), 'lt': ('ml', 1000.0), 'litre': ('ml', 1000.0), 'litres': ('ml', 1000.0),
+    'ea': ('each', 1.0), 'each': ('each', 1.0), 'pk': ('each', 1.0), 'pack': ('each', 1.0), 'ss': ('each', 1.0), 'sheets': ('each', 1.0),
+    'm': ('m', 1.0), 'cm': ('m', 0.01)
+}
+
+# e.g. "$1.20 / 100G", "$0.45 / 1EA"
+CUP_STRING_PATTERN = r'^\s*\$?\s*(?P<price>\d+(?:\.\d+)?)\s*(?:/|per)\s*(?P<quantity>\d+(?:\.\d+)?)?\s*(?P<unit>[a-zA-Z]+)\s*$'
+# e.g. "500g", "2 L", "6 x 375mL", "12 pack"
+PACKAGE_SIZE_PATTERN = r'^\s*(?:(?P<count>\d+)\s*[xX]\s*)?(?P<quantity>\d+(?:\.\d+)?)\s*(?P<unit>[a-zA-Z]+)\b'
+
+class Transform():
+
+    def __init__(self, df:pd.DataFrame):
+        """
+        Normalises the prices, cup prices, package sizes and brands of a category, adding the normalised columns to the frame
+        - `df`: the extracted products of a category
+        """
+
+        self.df = df
+        self.category = df.attrs.get('name')
+        self.metrics = {}
+
+    def __repr__(self)->str:
+        return f'Transform({self.category})'
+
+    def _to_number(self, series:pd.Series)->pd.Series:
+        """
+        Converts prices that may be strings such as "$1.20" to floats, values that are not prices become NaN
+        - `series`: the price column
+
+        Returns float series
+        """
+
+        if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            return series.astype('float64')
+
+        return pd.to_numeric(series.astype('string').str.replace(r'[$,\s]', '', regex=True), errors='coerce').astype('float64')
+
+    def _extract(self, series:pd.Series, pattern:str)->pd.DataFrame:
+        """
+        Extracts the pattern groups of each value, matching each distinct value once as a catalogue repeats the same sizes
+        - `series`: the string column
+        - `pattern`: the regular expression with named groups
+
+        Returns dataframe of groups, aligned to the series
+        """
+
+        codes, uniques = pd.factorize(series)
+        unique_parts = pd.Series(uniques, dtype='string').str.extract(pattern)
+        # Missing values have code -1, which maps to an appended empty row
+        unique_parts.loc[len(unique_parts)] = pd.NA
+
+        return unique_parts.take(np.where(codes < 0, len(unique_parts) - 1, codes)).set_index(series.index)
+
+    def _normalise_units(self, quantity:pd.Series, unit:pd.Series)->tuple:
+        """
+        Converts quantities to the base unit of their measure
+        - `quantity`: the quantities, NaN when not given
+        - `unit`: the unit strings
+
+        Returns tuple of base unit quantities and base unit names
+        """
+
+        unit = unit.str.lower()
+        base_unit = unit.map({unit_name: factor[0] for unit_name, factor in UNIT_FACTORS.items()})
+        factor = unit.map({unit_name: factor[1] for unit_name, factor in UNIT_FACTORS.items()}).astype('float64')
+
+        return quantity * factor, base_unit.astype('object')
+
+    def _transform_cup_price(self, df:pd.DataFrame)->None:
+        """
+        Adds the cup price per 100g, 100ml, 1m or 1 each parsed from the cup string, so cup prices of different measures compare
+        - `df`: the products
+
+        Returns None
+        """
+
+        parts = self._extract(series=df['CupString'], pattern=CUP_STRING_PATTERN)
+        # "$0.45 / EA" has no quantity
+        quantity = pd.to_numeric(parts['quantity'], errors='coerce').astype('float64').fillna(1.0)
+        cup_price = pd.to_numeric(parts['price'], errors='coerce').astype('float64')
+        base_quantity, base_unit = self._normalise_units(quantity=quantity.where(parts['unit'].notna()), unit=parts['unit'])
+
+        # Weights and volumes are compared per 100 of the unit, others per 1
+        per_quantity = np.where(base_unit.isin(['g', 'ml']), 100.0, 1.0)
+
+        df['CupPriceNorm'] = (cup_price / base_quantity * per_quantity).round(4)
+        df['CupUnitNorm'] = base_unit.where(base_unit.isna(), pd.Series(per_quantity, index=df.index).astype(int).astype(str) + base_unit)
+
+        return None
+
+    def _transform_package_size(self, df:pd.DataFrame)->None:
+        """
+        Adds the package size in its base unit, multipacks are the total of the pack
+        - `df`: the products
+
+        Returns None
+        """
+
+        parts = self._extract(series=df['PackageSz'], pattern=PACKAGE_SIZE_PATTERN)
+        count = pd.to_numeric(parts['count'], errors='coerce').astype('float64').fillna(1.0)
+        quantity = pd.to_numeric(parts['quantity'], errors='coerce').astype('float64')
+        base_quantity, base_unit = self._normalise_units(quantity=quantity * count, unit=parts['unit'])
+
+        df['PackageQuantity'] = base_quantity.round(4)
+        df['PackageUnit'] = base_unit
+
+        return None
+
+    def _transform_brand(self, df:pd.DataFrame)->None:
+        """
+        Title cases brands that are all upper or all lower case, mixed case brands such as "McCain" are kept
+        - `df`: the products
+
+        Returns None
+        """
+
+        brand = df['Brand'].astype('string').str.strip()
+        is_single_case = (brand.str.isupper() | brand.str.islower()).fillna(False)
+        brand = brand.where(~is_single_case, brand.str.title()).astype('object')
+        df['Brand'] = brand.where(brand.notna(), None)
+
+        return None
+
+    def run(self):
+        """
+        Run transform
+        """
+
+        start_time = time.perf_counter()
+        df = self.df
+
+        for column in ['Price', 'WasPrice', 'CupPrice']:
+            if column in df.columns:
+                df[column] = self._to_number(df[column])
+
+        # Categories without a field are passed through
+        if 'Price' in df.columns and 'WasPrice' in df.columns:
+            df['Saving'] = (df['WasPrice'] - df['Price']).clip(lower=0).round(2)
+
+        if 'CupString' in df.columns:
+            self._transform_cup_price(df)
+
+        if 'PackageSz' in df.columns:
+            self._transform_package_size(df)
+
+        if 'Brand' in df.columns:
+            self._transform_brand(df)
+
+        logging.info(f'Transformed category [{self.category}]: rows [{len(df)}]')
+
+        self.metrics = {
+            'stage': 'transform',
+            'category': self.category,
+            'duration_seconds': round(time.perf_counter() - start_time, 3),
+            'rows_parsed': len(df)
+        }
@@ -1,12 +1,120 @@
-from graphlib import TopologicalSorter
 from io import StringIO
 from woolworths.etl.extract import Extract
+from woolworths.etl.transform import Transform
 from woolworths.etl.load import Load
 from database.postgres import PostgresDB
+from utility.checkpoint import Checkpoint
+from utility.config_loader import read_config
+from utility.cookie_manager import CookieManager
+from utility.http_session import HttpSession
+from utility.json_decoder import ProjectedDecoder
 from utility.metadata_logging import MetadataLogging
+from utility.pipeline_runner import create_request_planner, run_load_stages
+from utility.rate_limiter import RateLimiter
+from utility.response_cache import ResponseCache
+import pandas as pd
 import datetime as dt
 import logging
-import yaml
+
+def _get_load_target(df:pd.DataFrame, load_method:str, partition_table_name:str)->tuple:
+    """
+    Gets the table a category dataframe is loaded into and how
+    - `df`: the category dataframe
+    - `load_method`: the configured load method
+    - `partition_table_name`: the partitioned table of the partition load method
+
+    Returns tuple of table name and load method
+    """
+
+    # Partition loads write every category into one table
+    return partition_table_name if load_method == 'partition' else f"raw_{df.attrs['name']}Products", load_method
+
+def _create_transform_node(df:pd.DataFrame)->Transform:
+    # The transform adds its columns to the frame the load nodes read
+    return Transform(df=df)
+
+def run_extract_load(config:dict, target_engine, run_id:int=None)->list:
+    """
+    Runs extract, transform and load for the retailer
+    - `config`: the retailer config
+    - `target_engine`: connection engine to the target database
+    - `run_id`: the run id from the metadata log, extracted pages are checkpointed under it when set
+
+    Returns list of extract, transform and load metrics
+    """
+
+    logging.info("Getting yaml config variables")
+    category_url=config['extract']['category_url']
+    product_url=config['extract']['product_url']    
+    schema_name=config['extract']['schema_name']
+    cache_dir=config['extract']['cache_dir']
+    cache_mode=config['extract']['cache_mode']
+    connect_timeout_seconds=config['extract']['connect_timeout_seconds']
+    read_timeout_seconds=config['extract']['read_timeout_seconds']
+    schema_registry_path=config['extract']['schema_registry_path']
+    checkpoint_enabled=config['extract']['checkpoint_enabled']
+    checkpoint_dir=config['extract']['checkpoint_dir']
+    checkpoint_max_age_hours=config['extract']['checkpoint_max_age_hours']
+    page_size=config['extract']['page_size']
+    parse_workers=config['extract']['parse_workers']
+    max_concurrent_requests=config['extract']['max_concurrent_requests']
+    max_concurrent_requests_per_category=config['extract']['max_concurrent_requests_per_category']
+    cookie_cache_path=config['extract']['cookie_cache_path']
+    cookie_ttl_seconds=config['extract']['cookie_ttl_seconds']
+    cookie_failure_cooldown_seconds=config['extract']['cookie_failure_cooldown_seconds']
+    decode_mode=config['decode']['decode_mode']
+    transform_enabled=config['transform']['enabled']
+
+    logging.info("Running extract")
+    cookie_manager = CookieManager(url=product_url, cache_path=cookie_cache_path, ttl_seconds=cookie_ttl_seconds, failure_cooldown_seconds=cookie_failure_cooldown_seconds)
+    # Projected decoding only reads the declared fields of each product
+    decoder = None
+    if decode_mode == 'projected':
+        decoder = ProjectedDecoder(
+            fields=config['decode']['fields'],
+            record_path=config['decode']['record_path'],
+            record_filter=config['decode']['record_filter'],
+            raw_column=config['decode']['raw_column']
+        )
+    # A resumed run reads back the pages its failed attempt extracted
+    checkpoint = None
+    if checkpoint_enabled and run_id is not None:
+        checkpoint = Checkpoint(checkpoint_dir=checkpoint_dir, name=schema_name, run_id=run_id, max_age_hours=checkpoint_max_age_hours)
+    request_planner = create_request_planner(config=config)
+    # Responses can be recorded once and replayed offline when rerunning the later stages
+    response_cache = ResponseCache(cache_dir=cache_dir, mode=cache_mode)
+    # Requests are paced per host and retried with backoff when the host throttles or errors
+    rate_limiter = None
+    if config['rate_limit']['enabled']:
+        rate_limiter = RateLimiter(
+            initial_rate=config['rate_limit']['initial_rate'],
+            min_rate=config['rate_limit']['min_rate'],
+            max_rate=config['rate_limit']['max_rate'],
+            burst=config['rate_limit']['burst'],
+            increase_step=config['rate_limit']['increase_step'],
+            decrease_factor=config['rate_limit']['decrease_factor'],
+            error_decrease_factor=config['rate_limit']['error_decrease_factor'],
+            latency_target_seconds=config['rate_limit']['latency_target_seconds'],
+            max_retries=config['rate_limit']['max_retries'],
+            backoff_base_seconds=config['rate_limit']['backoff_base_seconds'],
+            backoff_max_seconds=config['rate_limit']['backoff_max_seconds']
+        )
+    session = HttpSession(pool_maxsize=max_concurrent_requests, response_cache=response_cache, rate_limiter=rate_limiter, connect_timeout_seconds=connect_timeout_seconds, read_timeout_seconds=read_timeout_seconds)
+    extract_object = Extract(category_url=category_url, product_url=product_url, max_concurrent_requests=max_concurrent_requests, max_concurrent_requests_per_category=max_concurrent_requests_per_category, cookie_manager=cookie_manager, session=session, decoder=decoder, schema_registry_path=schema_registry_path, checkpoint=checkpoint, page_size=page_size, request_planner=request_planner, parse_workers=parse_workers)
+
+    list_of_metrics = run_load_stages(
+        config=config,
+        target_engine=target_engine,
+        extract_object=extract_object,
+        load_class=Load,
+        get_load_target=_get_load_target,
+        iterate_stream=extract_object.run_stream,
+        create_transform_node=_create_transform_node if transform_enabled else None,
+        checkpoint=checkpoint,
+        request_planner=request_planner
+    )
+
+    return list_of_metrics
 
 def run_pipeline():
 
@@ -16,15 +124,12 @@ def run_pipeline():
 
     logging.info("Reading yaml config file")
     # get config variables
-    with open("../config.yaml") as stream:
-        config = yaml.safe_load(stream)
+    config = read_config("../config.yaml")
     
     logging.info("Getting yaml config variables")
     metadata_log_table = config["meta"]["log_table"]
-    category_url=config['extract']['category_url']
-    product_url=config['extract']['product_url']    
+    metadata_metrics_table = config["meta"]["metrics_table"]
     schema_name=config['extract']['schema_name']
-    load_method=config['load']['load_method']
 
     # logging.info("Getting env variables")       
     # target_db_user = os.environ.get("target_db_user")
@@ -39,13 +144,32 @@ def run_pipeline():
 
     logging.info("Creating target database engine")
     # set up target db engine     
-    te = PostgresDB(db_user=target_db_user, db_password=target_db_password, db_server_name=target_db_server_name, db_database_name=target_db_database_name)
+    te = PostgresDB(
+        db_user=target_db_user, 
+        db_password=target_db_password, 
+        db_server_name=target_db_server_name, 
+        db_database_name=target_db_database_name,
+        db_port=config['database']['port'],
+        driver=config['database']['driver'],
+        pool_size=config['database']['pool_size'],
+        max_overflow=config['database']['max_overflow'],
+        pool_pre_ping=config['database']['pool_pre_ping'],
+        pool_recycle=config['database']['pool_recycle'],
+        statement_timeout_ms=config['database']['statement_timeout_ms']
+    )
     target_engine = te.create_pg_engine()
 
     logging.info("Setting up metadata logger")
     # set up metadata logger 
     metadata_logger = MetadataLogging(engine=target_engine)    
-    metadata_log_run_id = metadata_logger.get_latest_run_id(schema_name=schema_name, table_name=metadata_log_table)
+    # A failed run is run again under its run id, so only the pages it did not extract are fetched
+    metadata_log_run_id = None
+    if config['extract']['checkpoint_enabled']:
+        metadata_log_run_id = metadata_logger.get_resumable_run_id(schema_name=schema_name, table_name=metadata_log_table, max_age_hours=config['extract']['checkpoint_max_age_hours'], max_resumes=config['extract']['checkpoint_max_resumes'])
+    if metadata_log_run_id is None:
+        metadata_log_run_id = metadata_logger.get_latest_run_id(schema_name=schema_name, table_name=metadata_log_table)
+    else:
+        logging.info(f"Resuming run [{metadata_log_run_id}]")
     
     try:
 
@@ -58,32 +182,11 @@ def run_pipeline():
             table_name=metadata_log_table
         )              
 
-        logging.info("Running extract")
-        extract_object = Extract(category_url=category_url, product_url=product_url)
-        list_of_product_df = extract_object.run()     
-
-        list_of_load_nodes  = []
-
-        # Loop through list of product df and create load nodes list
-        for df in list_of_product_df:
-            table_name = f"raw_{df.attrs['name']}Products"
-            list_of_load_nodes.append(Load(df=df, engine=target_engine, schema_name=schema_name, table_name=table_name, load_method=load_method, chunksize=2500))
-
-        # Build dag
-        dag = TopologicalSorter()
-
-        logging.info("Adding DAG nodes")
-        # Adding load nodes 
-        for node in list_of_load_nodes:
-            dag.add(node)
-        
-        logging.info("Executing DAG")
-        # Run dag 
-        dag_rendered = tuple(dag.static_order())
+        list_of_metrics = run_extract_load(config=config, target_engine=target_engine, run_id=metadata_log_run_id)
 
-        logging.info("Running load")
-        for node in dag_rendered: 
-            node.run()
+        for metric in list_of_metrics:
+            metadata_logger.record_metric(run_id=metadata_log_run_id, retailer=schema_name, schema_name=schema_name, table_name=metadata_metrics_table, **metric)
+        metadata_logger.flush_metrics()
 
         logging.info("Pipeline run successful")
         metadata_logger.log(
@@ -149,7 +149,6 @@ if __name__ == '__main__':
                 
                 # get only products
                 json_products = response.json()['Bundles']
-                print(json_products)
 
                 for product in json_products:
                     products.append(product)